@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from documents.models import ConversionJob, UploadSession
+
 User = get_user_model()
 
 
@@ -26,3 +28,62 @@ class HtmlToPdfConvertSerializer(serializers.Serializer):
         default='document',
         max_length=100,
     )
+
+
+class ConversionJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='uuid', read_only=True)
+    document = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
+    wait_time = serializers.FloatField(read_only=True)
+    run_time = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ConversionJob
+        fields = [
+            'job_id',
+            'mode',
+            'title',
+            'status',
+            'error',
+            'document',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'wait_time',
+            'run_time',
+        ]
+        read_only_fields = fields
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(required=False, allow_blank=True, default='', max_length=255)
+    title = serializers.CharField(required=False, allow_blank=True, default='', max_length=255)
+    target = serializers.ChoiceField(choices=UploadSession.TARGETS, default=UploadSession.TARGET_DOCUMENT)
+    mode = serializers.CharField(required=False, allow_blank=True, default='', max_length=50)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    upload_id = serializers.UUIDField(source='uuid', read_only=True)
+    offset = serializers.IntegerField(source='received', read_only=True)
+    document = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
+    job = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'upload_id',
+            'filename',
+            'title',
+            'size',
+            'offset',
+            'target',
+            'mode',
+            'status',
+            'sha256',
+            'document',
+            'job',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
@@ -1,3 +1,131 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from documents.models import UploadSession
+from documents.uploads import UploadError, create_upload_session, get_staging_path
+
+CONTENT = b'%PDF-1.4\n' + b'0123456789' * 10 + b'\n%%EOF'
+
+
+class UploadSessionApiTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user('uploader', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, filename='report.pdf', **data):
+        return self.client.post(
+            reverse('api_upload_create'),
+            {'filename': filename, 'size': len(CONTENT), 'content_type': 'application/pdf', **data},
+            format='json',
+        )
+
+    def put_chunk(self, upload_id, offset, data, checksum=None):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = f'sha256 {checksum}'
+        return self.client.put(
+            reverse('api_upload', args=[upload_id]),
+            data,
+            content_type='application/octet-stream',
+            **headers,
+        )
+
+    def finalize(self, upload_id, sha256=None):
+        return self.client.post(
+            reverse('api_upload_finalize', args=[upload_id]),
+            {'sha256': sha256} if sha256 else {},
+            format='json',
+        )
+
+    def upload(self):
+        upload_id = self.create().data['upload_id']
+        middle = len(CONTENT) // 2
+        for offset, chunk in ((0, CONTENT[:middle]), (middle, CONTENT[middle:])):
+            response = self.put_chunk(upload_id, offset, chunk, hashlib.sha256(chunk).hexdigest())
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Upload-Offset'], str(offset + len(chunk)))
+        return upload_id
+
+    def test_create(self):
+        response = self.create()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertIn('Upload-Chunk-Size', response)
+        self.assertEqual(response.data['title'], 'report')
+        session = UploadSession.objects.get(uuid=response.data['upload_id'])
+        self.assertEqual(os.path.getsize(get_staging_path(session)), 0)
+
+    def test_create_rejects_names_the_document_would_reject(self):
+        self.assertEqual(self.create('a' * 101 + '.pdf').status_code, 400)
+        with self.assertRaises(UploadError):
+            create_upload_session(self.user, 'report.pdf', len(CONTENT), title='   ')
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_chunks_and_finalize(self):
+        upload_id = self.upload()
+        response = self.finalize(upload_id, hashlib.sha256(CONTENT).hexdigest())
+
+        self.assertEqual(response.status_code, 200)
+        session = UploadSession.objects.get(uuid=upload_id)
+        self.assertEqual(session.status, UploadSession.STATUS_COMPLETE)
+        self.assertEqual(session.document.file_size, len(CONTENT))
+        with session.document.file.open('rb') as document_file:
+            self.assertEqual(document_file.read(), CONTENT)
+        self.assertFalse(os.path.exists(get_staging_path(session)))
+
+    def test_offset_mismatch(self):
+        upload_id = self.create().data['upload_id']
+        response = self.put_chunk(upload_id, 10, CONTENT[10:20])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertEqual(response.data['offset'], 0)
+
+    def test_chunk_checksum_mismatch(self):
+        upload_id = self.create().data['upload_id']
+        response = self.put_chunk(upload_id, 0, CONTENT[:10], hashlib.sha256(b'other').hexdigest())
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(uuid=upload_id).received, 0)
+
+    def test_finalize_incomplete_upload(self):
+        upload_id = self.create().data['upload_id']
+        self.put_chunk(upload_id, 0, CONTENT[:10])
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '10')
+
+    def test_finalize_checksum_mismatch(self):
+        upload_id = self.upload()
+        response = self.finalize(upload_id, hashlib.sha256(b'other').hexdigest())
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(uuid=upload_id).status, UploadSession.STATUS_ACTIVE)
+
+    def test_finalize_rejected_document(self):
+        upload_id = self.upload()
+        with mock.patch('documents.uploads.save_converted_document', side_effect=ValueError('Некорректный файл')):
+            response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, 400)
+        session = UploadSession.objects.get(uuid=upload_id)
+        self.assertEqual(session.status, UploadSession.STATUS_REJECTED)
+        self.assertFalse(os.path.exists(get_staging_path(session)))
+        self.assertEqual(self.finalize(upload_id).status_code, 400)
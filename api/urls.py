@@ -8,5 +8,15 @@ urlpatterns = [
     path('users/', views.UserListView.as_view(), name='user-list'),
     path('delete/<int:pk>', views.UserDeleteView.as_view(), name='user-delete'),
 
+    path('documents/<uuid:document_uuid>/download/', views.DocumentDownloadView.as_view(), name='api_document_download'),
+
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='api_upload_create'),
+    path('uploads/<uuid:upload_uuid>/', views.UploadSessionView.as_view(), name='api_upload'),
+    path('uploads/<uuid:upload_uuid>/finalize/', views.UploadSessionFinalizeView.as_view(), name='api_upload_finalize'),
+
     path('convert/html-to-pdf/', views.HtmlToPdfConvertView.as_view(), name='api_html_to_pdf'),
+    path('convert/batch/', views.BatchConvertView.as_view(), name='api_batch_convert'),
+    path('convert/jobs/', views.ConversionJobCreateView.as_view(), name='api_conversion_job_create'),
+    path('convert/cache/stats/', views.ConversionCacheStatsView.as_view(), name='api_conversion_cache_stats'),
+    path('convert/jobs/<uuid:job_uuid>/', views.ConversionJobStatusView.as_view(), name='api_conversion_job_status'),
 ]
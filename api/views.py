@@ -1,16 +1,38 @@
-from io import BytesIO
+import os
 
-import pdfkit
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.http import FileResponse
+from django.http import Http404, StreamingHttpResponse
 from drf_spectacular.utils import extend_schema, OpenApiResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.serializers import UserSerializer
-from convertors.document_converters import HtmlToPdfConverter
+from api.serializers import (
+    ConversionJobSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
+    UserSerializer,
+)
+from convertors.batch import convert_batch, iter_archive_items, iter_uploaded_items, stream_zip
+from convertors.cache import get_conversion_cache
+from convertors.conversion_request import ConversionRequest
+from convertors.registry import get_converter_by_mode
+from convertors.wkhtmltopdf_pool import PoolOverloaded
+from documents.access import has_permission
+from documents.downloads import document_response, file_response
+from documents.jobs import enqueue_conversion_job
+from documents.models import ConversionJob, Document, UploadSession
+from documents.uploads import (
+    UploadError,
+    UploadOffsetMismatch,
+    create_upload_session,
+    finalize_upload,
+    write_chunk,
+)
+from utils import metrics
 
 User = get_user_model()
 
@@ -107,37 +129,385 @@ class HtmlToPdfConvertView(APIView):
         responses={
             200: OpenApiResponse(description='PDF файл'),
             400: OpenApiResponse(description='Некорректные данные'),
-            500: OpenApiResponse(description='Ошибка конвертации')
+            500: OpenApiResponse(description='Ошибка конвертации'),
+            503: OpenApiResponse(description='Очередь конвертации переполнена'),
         }
     )
+    @metrics.timed('api_html_to_pdf', mode='html')
     def post(self, request):
         try:
-            converter = HtmlToPdfConverter()
-            enhanced_html = converter._prepare_html_content(
-                request.data.get('file_content'),
-            )
+            with metrics.stage('upload_read', mode='html') as stage:
+                file_content = request.data.get('file_content')
+                stage.add_bytes('in', len(file_content.encode()) if isinstance(file_content, str) else None)
 
-            pdf_bytes = pdfkit.from_string(
-                enhanced_html,
-                False,
-                options=converter.get_conversion_options(),
-                configuration=converter.config
+            pdf_file = get_conversion_cache().convert(
+                get_converter_by_mode('html'),
+                request.data.get('file_name', 'document'),
+                ConversionRequest.from_form_data({'file_content': [file_content]}),
             )
 
-            pdf_file = SimpleUploadedFile(
-                name=f"{request.data.get('file_name', 'document')}.pdf",
-                content=pdf_bytes,
-                content_type='application/pdf'
+            return file_response(request, pdf_file, pdf_file.name, content_type='application/pdf')
+        except ValueError as e:
+            return Response(
+                {'error': 'Некорректные данные', 'details': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-            return FileResponse(
-                BytesIO(pdf_file.read()),
-                as_attachment=True,
-                filename=pdf_file.name,
-                content_type='application/pdf'
+        except PoolOverloaded as e:
+            return Response(
+                {'error': 'Сервис конвертации перегружен', 'details': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
         except Exception as e:
             return Response(
                 {'error': 'Ошибка конвертации', 'details': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class DocumentDownloadView(APIView):
+    @extend_schema(
+        tags=['Документы'],
+        summary='Скачивание документа',
+        description='Отдает файл документа потоком, поддерживает заголовок Range для докачки',
+        responses={
+            200: OpenApiResponse(description='Файл документа'),
+            206: OpenApiResponse(description='Часть файла документа'),
+            404: OpenApiResponse(description='Документ не найден'),
+            416: OpenApiResponse(description='Диапазон вне файла'),
+        }
+    )
+    def get(self, request, document_uuid):
+        document = get_object_or_404(Document, uuid=document_uuid)
+        if not has_permission(request.user, document):
+            raise Http404
+        return document_response(request, document)
+
+
+class BatchConvertView(APIView):
+    permission_classes = [IsAuthenticated]
+    # Поля запроса, которые не передаются конвертеру как общие опции
+    BATCH_FIELDS = {'mode', 'response_format', 'csrfmiddlewaretoken'}
+
+    @extend_schema(
+        tags=['Конвертация файлов'],
+        summary='Пакетная конвертация файлов',
+        description=(
+            'Принимает набор файлов (files) или zip-архив (archive) и режим конвертации. '
+            'При response_format=zip файлы конвертируются параллельно и возвращаются '
+            'zip-архивом с манифестом manifest.json (статус, время конвертации, размер и ошибка '
+            'для каждого файла), при response_format=jobs для каждого '
+            'файла ставится задача конвертации. Ошибка в одном файле не прерывает пакет.'
+        ),
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'mode': {'type': 'string'},
+                    'response_format': {'type': 'string', 'enum': ['zip', 'jobs']},
+                    'files': {'type': 'array', 'items': {'type': 'string', 'format': 'binary'}},
+                    'archive': {'type': 'string', 'format': 'binary'},
+                }
+            }
+        },
+        responses={
+            200: OpenApiResponse(description='Zip-архив с результатами'),
+            202: OpenApiResponse(description='Задачи конвертации поставлены в очередь'),
+            400: OpenApiResponse(description='Некорректные данные'),
+            401: OpenApiResponse(description='Требуется авторизация'),
+        }
+    )
+    def post(self, request):
+        mode = request.data.get('mode')
+        converter = get_converter_by_mode(mode)
+        if converter is None:
+            return Response(
+                {'error': f'Неизвестный режим конвертации: {mode}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        response_format = request.data.get('response_format', 'zip')
+        if response_format not in ('zip', 'jobs'):
+            return Response(
+                {'error': f'Неизвестный формат ответа: {response_format}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        batch_settings = settings.BATCH_CONVERT
+        options = {
+            key: value
+            for key, value in request.POST.dict().items()
+            if key not in self.BATCH_FIELDS
+        }
+        try:
+            if 'archive' in request.FILES:
+                items = iter_archive_items(
+                    request.FILES['archive'],
+                    max_items=batch_settings['MAX_ITEMS'],
+                    max_size=batch_settings['MAX_ARCHIVE_SIZE'],
+                )
+            else:
+                items = iter_uploaded_items(
+                    request.FILES.getlist('files'),
+                    max_items=batch_settings['MAX_ITEMS'],
+                )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if response_format == 'jobs':
+            return self._enqueue_jobs(request.user, mode, converter, items, options)
+
+        executor_kind = converter.BATCH_EXECUTOR
+        workers = batch_settings['PROCESS_WORKERS' if executor_kind == 'process' else 'WORKERS']
+        response = StreamingHttpResponse(
+            stream_zip(convert_batch(converter, items, options, workers, executor_kind)),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{mode}_batch.zip"'
+        return response
+
+    @staticmethod
+    def _enqueue_jobs(user, mode, converter, items, options):
+        """Ставит задачу конвертации для каждого файла пакета"""
+        results = []
+        for item in items:
+            result = {'index': item.index, 'source': item.name}
+            if item.error is not None:
+                result.update(status='failed', error=item.error)
+                results.append(result)
+                continue
+
+            try:
+                item_request = converter.build_source_request(
+                    item.name,
+                    item.content,
+                    item.content_type,
+                    options,
+                )
+                job = enqueue_conversion_job(
+                    owner=user,
+                    mode=mode,
+                    title=os.path.splitext(item.name)[0] or 'document',
+                    post=item_request.POST,
+                    files=item_request.FILES,
+                )
+                result.update(job_id=str(job.uuid), status=job.status)
+            except Exception as e:
+                result.update(status='failed', error=str(e))
+            results.append(result)
+
+        return Response({'items': results}, status=status.HTTP_202_ACCEPTED)
+
+
+class ConversionJobCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=['Конвертация файлов'],
+        summary='Постановка задачи конвертации',
+        description=(
+            'Сохраняет исходные файлы и ставит задачу конвертации в очередь. '
+            'Возвращает идентификатор задачи, статус которой можно опрашивать.'
+        ),
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'mode': {'type': 'string'},
+                    'document_title': {'type': 'string'},
+                    'file_content': {'type': 'string', 'format': 'binary'},
+                }
+            }
+        },
+        responses={
+            202: OpenApiResponse(response=ConversionJobSerializer, description='Задача поставлена в очередь'),
+            400: OpenApiResponse(description='Некорректные данные'),
+        }
+    )
+    def post(self, request):
+        try:
+            job = enqueue_conversion_job(
+                owner=request.user,
+                mode=request.data.get('mode'),
+                title=request.data.get('document_title') or 'document',
+                post=request.POST,
+                files=request.FILES,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(ConversionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ConversionJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=['Конвертация файлов'],
+        summary='Статус задачи конвертации',
+        description='Возвращает статус, тайминги и результирующий документ задачи конвертации.',
+        responses={
+            200: OpenApiResponse(response=ConversionJobSerializer, description='Статус задачи'),
+            404: OpenApiResponse(description='Задача не найдена'),
+        }
+    )
+    def get(self, request, job_uuid):
+        job = get_object_or_404(
+            ConversionJob.objects.select_related('document'),
+            uuid=job_uuid,
+            owner=request.user,
+        )
+        return Response(ConversionJobSerializer(job).data)
+
+
+class ConversionCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        tags=['Конвертация файлов'],
+        summary='Статистика кэша конвертаций',
+        description='Возвращает количество попаданий и промахов кэша конвертаций в текущем процессе.',
+        responses={
+            200: OpenApiResponse(description='Счетчики кэша'),
+        }
+    )
+    def get(self, request):
+        return Response(get_conversion_cache().stats())
+
+
+def _upload_response(session: UploadSession, status_code: int = status.HTTP_200_OK) -> Response:
+    response = Response(UploadSessionSerializer(session).data, status=status_code)
+    response['Upload-Offset'] = str(session.received)
+    return response
+
+
+def _offset_conflict(error: UploadOffsetMismatch) -> Response:
+    response = Response({'error': str(error), 'offset': error.expected_offset}, status=status.HTTP_409_CONFLICT)
+    response['Upload-Offset'] = str(error.expected_offset)
+    return response
+
+
+class UploadSessionCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=['Загрузка файлов'],
+        summary='Начало загрузки файла частями',
+        description=(
+            'Создает сессию загрузки. Части отправляются PUT-запросами на адрес сессии '
+            'с заголовком Upload-Offset, после загрузки всех частей вызывается finalize.'
+        ),
+        request=UploadSessionCreateSerializer,
+        responses={
+            201: OpenApiResponse(response=UploadSessionSerializer, description='Сессия загрузки создана'),
+            400: OpenApiResponse(description='Некорректные данные'),
+        }
+    )
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = create_upload_session(owner=request.user, **serializer.validated_data)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = _upload_response(session, status.HTTP_201_CREATED)
+        response['Upload-Chunk-Size'] = str(settings.CHUNKED_UPLOAD['MAX_CHUNK_SIZE'])
+        return response
+
+
+class UploadSessionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=['Загрузка файлов'],
+        summary='Состояние загрузки',
+        description='Возвращает количество принятых байт, с которого нужно продолжить загрузку.',
+        responses={
+            200: OpenApiResponse(response=UploadSessionSerializer, description='Состояние сессии'),
+            404: OpenApiResponse(description='Сессия не найдена'),
+        }
+    )
+    def get(self, request, upload_uuid):
+        session = get_object_or_404(UploadSession, uuid=upload_uuid, owner=request.user)
+        return _upload_response(session)
+
+    @extend_schema(
+        tags=['Загрузка файлов'],
+        summary='Загрузка части файла',
+        description=(
+            'Тело запроса содержит байты части. Заголовок Upload-Offset задает смещение части, '
+            'необязательный Upload-Checksum ("sha256 <hex>") - контрольную сумму части.'
+        ),
+        request={'application/octet-stream': {'type': 'string', 'format': 'binary'}},
+        responses={
+            200: OpenApiResponse(response=UploadSessionSerializer, description='Часть принята'),
+            400: OpenApiResponse(description='Некорректная часть'),
+            404: OpenApiResponse(description='Сессия не найдена'),
+            409: OpenApiResponse(description='Смещение не совпадает с принятым размером'),
+        }
+    )
+    def put(self, request, upload_uuid):
+        session = get_object_or_404(UploadSession, uuid=upload_uuid, owner=request.user)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'error': 'Не указано смещение части'}, status=status.HTTP_400_BAD_REQUEST)
+
+        checksum = None
+        checksum_header = request.headers.get('Upload-Checksum', '')
+        if checksum_header:
+            algorithm, _, checksum = checksum_header.partition(' ')
+            if algorithm.lower() != 'sha256' or not checksum:
+                return Response(
+                    {'error': 'Поддерживается только контрольная сумма sha256'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            # Тело читается из потока запроса напрямую, без разбора и буферизации в памяти
+            session = write_chunk(session, offset, request.stream, length, checksum)
+        except UploadOffsetMismatch as e:
+            return _offset_conflict(e)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return _upload_response(session)
+
+
+class UploadSessionFinalizeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=['Загрузка файлов'],
+        summary='Завершение загрузки',
+        description=(
+            'Проверяет контрольную сумму всего файла (необязательное поле sha256) и создает документ '
+            'или ставит задачу конвертации.'
+        ),
+        request={
+            'application/json': {
+                'type': 'object',
+                'properties': {
+                    'sha256': {'type': 'string'},
+                }
+            }
+        },
+        responses={
+            200: OpenApiResponse(response=UploadSessionSerializer, description='Загрузка завершена'),
+            400: OpenApiResponse(description='Контрольная сумма не совпадает или файл отклонен'),
+            404: OpenApiResponse(description='Сессия не найдена'),
+            409: OpenApiResponse(description='Файл загружен не полностью'),
+        }
+    )
+    def post(self, request, upload_uuid):
+        session = get_object_or_404(UploadSession, uuid=upload_uuid, owner=request.user)
+        try:
+            session = finalize_upload(session, request.data.get('sha256'))
+        except UploadOffsetMismatch as e:
+            return _offset_conflict(e)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return _upload_response(session)
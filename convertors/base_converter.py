@@ -1,8 +1,139 @@
+import functools
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils.datastructures import MultiValueDict
+
+from convertors.conversion_request import ConversionRequest
+from utils import metrics
+
+# Поля формы, которые не влияют на результат конвертации
+NON_CONVERSION_FIELDS = {'csrfmiddlewaretoken', 'document_title', 'upload_type', 'mode'}
+
+_convert_context = threading.local()
+
+
+def instrument_convert(convert):
+    """
+    Оборачивает метод convert конвертера в этап метрик 'convert'
+
+    Учитываются длительность, объем исходных данных и результата.
+    Вложенные вызовы convert (например, через super()) не измеряются повторно.
+    """
+    @functools.wraps(convert)
+    def wrapper(self, file_name, request, *args, **kwargs):
+        if not metrics.is_enabled() or getattr(_convert_context, 'active', False):
+            return convert(self, file_name, request, *args, **kwargs)
+
+        _convert_context.active = True
+        try:
+            with metrics.stage('convert', mode=self.metrics_mode) as stage:
+                stage.add_bytes('in', metrics.request_size(request))
+                result = convert(self, file_name, request, *args, **kwargs)
+                stage.add_bytes('out', getattr(result, 'size', None))
+                return result
+        finally:
+            _convert_context.active = False
+
+    wrapper.instrumented = True
+    return wrapper
+
+
 class DocumentConverter:
     """Базовый класс для конветрации документов"""
 
+    # Поле запроса с исходными данными и признак передачи их текстом в POST
+    SOURCE_FIELD = 'file_content'
+    SOURCE_IN_POST = False
+    # Пул, в котором конвертер выполняется при пакетной конвертации:
+    # 'thread' или 'process' для конвертеров, нагружающих процессор
+    BATCH_EXECUTOR = 'thread'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        convert = cls.__dict__.get('convert')
+        if convert is not None and not getattr(convert, 'instrumented', False):
+            cls.convert = instrument_convert(convert)
+
     def __init__(self):
         pass
 
+    @property
+    def metrics_mode(self) -> str:
+        """Режим конвертации для меток метрик, реестр задает его при создании конвертера"""
+        return getattr(self, '_mode', None) or type(self).__name__
+
     def convert(self, file_name, file_content):
         pass
+
+    def build_source_request(
+        self,
+        name: str,
+        content: bytes,
+        content_type: str,
+        options: Optional[Dict[str, str]] = None,
+    ) -> ConversionRequest:
+        """
+        Собирает запрос для конвертации одного исходного файла
+
+        :param name: Имя исходного файла
+        :param content: Содержимое исходного файла
+        :param content_type: MIME-тип исходного файла
+        :param options: Дополнительные поля формы, общие для всех файлов
+        :return: Запрос, который можно передать в convert
+        """
+        form_data = {key: [value] for key, value in (options or {}).items()}
+        files = MultiValueDict()
+        if self.SOURCE_IN_POST:
+            form_data[self.SOURCE_FIELD] = [content.decode('utf-8')]
+        else:
+            files[self.SOURCE_FIELD] = SimpleUploadedFile(name, content, content_type)
+
+        return ConversionRequest.from_form_data(form_data, files)
+
+    def get_cache_options(self) -> Dict[str, Any]:
+        """
+        Возвращает параметры конвертера, влияющие на результат.
+
+        По умолчанию это константы класса (DEFAULT_QUALITY, PDF_RESOLUTION и т.д.)
+        и публичные атрибуты экземпляра.
+        """
+        options = {
+            name: getattr(type(self), name)
+            for name in dir(type(self))
+            if name.isupper()
+        }
+        options.update({
+            name: value
+            for name, value in vars(self).items()
+            if not name.startswith('_')
+        })
+        return options
+
+    def get_cache_key(self, request) -> str:
+        """
+        Вычисляет ключ кэша по классу конвертера, его параметрам и входным данным
+
+        :param request: Объект запроса с полями POST и FILES
+        :return: SHA-256 в шестнадцатеричном виде
+        """
+        hasher = hashlib.sha256()
+        hasher.update(f'{type(self).__module__}.{type(self).__qualname__}'.encode())
+        hasher.update(json.dumps(self.get_cache_options(), sort_keys=True, default=str).encode())
+
+        for key in sorted(request.POST):
+            if key in NON_CONVERSION_FIELDS:
+                continue
+            hasher.update(json.dumps([key, request.POST.getlist(key)]).encode())
+
+        for key in sorted(request.FILES):
+            for uploaded_file in request.FILES.getlist(key):
+                hasher.update(json.dumps([key, uploaded_file.content_type, uploaded_file.size]).encode())
+                for chunk in uploaded_file.chunks():
+                    hasher.update(chunk)
+                uploaded_file.seek(0)
+
+        return hasher.hexdigest()
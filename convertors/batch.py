@@ -0,0 +1,236 @@
+import json
+import mimetypes
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from convertors.cache import get_conversion_cache
+from convertors.executors import get_executor
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class BatchItem(NamedTuple):
+    """Исходный файл пакетной конвертации, error - ошибка чтения файла из архива"""
+    index: int
+    name: str
+    content: bytes
+    content_type: str
+    error: Optional[str] = None
+
+
+class BatchResult(NamedTuple):
+    """Результат конвертации одного файла пакета"""
+    item: BatchItem
+    output: Optional[object]
+    error: Optional[str]
+    elapsed: float
+
+
+def iter_uploaded_items(uploaded_files: List, max_items: int) -> Iterator[BatchItem]:
+    """Проверяет загруженные файлы и возвращает элементы пакета"""
+    if not uploaded_files:
+        raise ValueError('Не загружено ни одного файла')
+    if len(uploaded_files) > max_items:
+        raise ValueError(f'Пакет не может содержать больше {max_items} файлов')
+
+    return (
+        BatchItem(index, uploaded_file.name, uploaded_file.read(), uploaded_file.content_type)
+        for index, uploaded_file in enumerate(uploaded_files)
+    )
+
+
+def iter_archive_items(archive, max_items: int, max_size: int) -> Iterator[BatchItem]:
+    """
+    Проверяет zip-архив и возвращает элементы пакета
+
+    Файлы читаются из архива лениво, по мере обработки пакета. Файл, который
+    не удалось прочитать (ошибка CRC, неподдерживаемое сжатие или шифрование),
+    возвращается с ошибкой и не прерывает пакет.
+
+    :param archive: Файл zip-архива
+    :param max_items: Максимальное количество файлов в архиве
+    :param max_size: Максимальный суммарный размер распакованных файлов
+    """
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile as e:
+        raise ValueError('Некорректный zip-архив') from e
+
+    members = [member for member in zip_file.infolist() if not member.is_dir()]
+    if not members:
+        raise ValueError('Архив не содержит файлов')
+    if len(members) > max_items:
+        raise ValueError(f'Пакет не может содержать больше {max_items} файлов')
+    if sum(member.file_size for member in members) > max_size:
+        raise ValueError('Распакованный архив превышает допустимый размер')
+
+    def read_members():
+        with zip_file:
+            for index, member in enumerate(members):
+                name = os.path.basename(member.filename)
+                content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                try:
+                    content = zip_file.read(member)
+                except (zipfile.BadZipFile, NotImplementedError, RuntimeError, EOFError) as e:
+                    yield BatchItem(index, name, b'', content_type, f'Ошибка чтения из архива: {e}')
+                    continue
+                yield BatchItem(index, name, content, content_type)
+
+    return read_members()
+
+
+def convert_item(converter, item: BatchItem, options: Dict[str, str], in_memory: bool = False) -> BatchResult:
+    """
+    Конвертирует один элемент пакета, перехватывая ошибку конвертации
+
+    :param in_memory: Вернуть результат в памяти. Нужно при выполнении в пуле процессов:
+        временные файлы нельзя передать между процессами
+    """
+    started_at = time.perf_counter()
+    # Исходное содержимое не возвращается в результате, чтобы не копировать его обратно из процесса
+    source = item._replace(content=b'')
+    try:
+        request = converter.build_source_request(item.name, item.content, item.content_type, options)
+        output = get_conversion_cache().convert(converter, item.name, request)
+        if in_memory and not isinstance(output, SimpleUploadedFile):
+            output.seek(0)
+            detached = SimpleUploadedFile(output.name, output.read(), output.content_type)
+            output.close()
+            output = detached
+        return BatchResult(source, output, None, time.perf_counter() - started_at)
+    except Exception as e:
+        return BatchResult(source, None, str(e) or e.__class__.__name__, time.perf_counter() - started_at)
+
+
+def convert_batch(
+    converter,
+    items: Iterable[BatchItem],
+    options: Dict[str, str],
+    workers: int,
+    executor_kind: str = 'thread',
+) -> Iterator[BatchResult]:
+    """
+    Конвертирует элементы пакета параллельно в общем пуле исполнителей
+
+    Результаты возвращаются по мере готовности. Одновременно в обработке
+    находится не больше 2 * workers элементов, поэтому исходные файлы
+    читаются из архива по мере освобождения исполнителей.
+
+    Если пул сломался (процесс-исполнитель аварийно завершился), его элементы
+    возвращаются с ошибкой, а следующие отправляются в новый пул.
+
+    :param executor_kind: 'thread' или 'process' для конвертеров, нагружающих процессор
+    """
+    executor = get_executor(executor_kind, workers)
+    in_memory = executor_kind == 'process'
+    pending = {}
+
+    def failed(item: BatchItem, error: str = 'Процесс конвертации аварийно завершился') -> BatchResult:
+        return BatchResult(item._replace(content=b''), None, error, 0.0)
+
+    def collect(done):
+        for future in done:
+            item = pending.pop(future)
+            try:
+                yield future.result()
+            except BrokenExecutor:
+                yield failed(item)
+
+    for item in items:
+        if item.error is not None:
+            yield failed(item, item.error)
+            continue
+
+        try:
+            future = executor.submit(convert_item, converter, item, options, in_memory)
+        except (BrokenExecutor, RuntimeError):
+            # get_executor заменяет сломанный пул новым
+            executor = get_executor(executor_kind, workers)
+            try:
+                future = executor.submit(convert_item, converter, item, options, in_memory)
+            except (BrokenExecutor, RuntimeError):
+                yield failed(item)
+                continue
+
+        pending[future] = item
+        if len(pending) >= 2 * workers:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        yield from collect(done)
+
+
+class _ZipStream:
+    """Буфер для zipfile, из которого ответ забирает уже записанные байты"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        """Возвращает накопленные байты, если они есть"""
+        if self._chunks:
+            data = b''.join(self._chunks)
+            self._chunks = []
+            yield data
+
+
+def _unique_name(name: str, used_names: set) -> str:
+    stem, extension = os.path.splitext(name)
+    candidate, counter = name, 1
+    while candidate in used_names:
+        candidate = f'{stem}_{counter}{extension}'
+        counter += 1
+    used_names.add(candidate)
+    return candidate
+
+
+def stream_zip(results: Iterable[BatchResult], manifest_name: str = 'manifest.json') -> Iterator[bytes]:
+    """
+    Формирует zip-архив с результатами по мере их готовности
+
+    В конец архива добавляется манифест со статусом, временем конвертации
+    и ошибкой для каждого исходного файла.
+    """
+    stream = _ZipStream()
+    manifest = []
+    used_names = set()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as zip_file:
+        for result in results:
+            entry = {
+                'index': result.item.index,
+                'source': result.item.name,
+                'elapsed': round(result.elapsed, 4),
+            }
+            if result.error is not None:
+                entry.update(status='failed', error=result.error)
+            else:
+                output_name = _unique_name(result.output.name, used_names)
+                with zip_file.open(output_name, 'w', force_zip64=True) as destination:
+                    result.output.seek(0)
+                    for chunk in iter(lambda: result.output.read(COPY_CHUNK_SIZE), b''):
+                        destination.write(chunk)
+                        yield from stream.drain()
+                result.output.close()
+                entry.update(status='done', output=output_name, size=result.output.size)
+
+            manifest.append(entry)
+            yield from stream.drain()
+
+        manifest.sort(key=lambda entry: entry['index'])
+        zip_file.writestr(manifest_name, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    yield from stream.drain()
@@ -0,0 +1,265 @@
+import io
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from convertors.registry import get_converter_by_mode
+
+# Размеры синтетических изображений
+IMAGE_SIZES = {
+    'small': (640, 480),
+    'medium': (2000, 1500),
+    'large': (4000, 3000),
+}
+# Метрики, рост которых считается регрессией, и абсолютный рост, который считается шумом
+REGRESSION_METRICS = {
+    'p50_ms': 1.0,
+    'p99_ms': 1.0,
+    'peak_rss_mb': 1.0,
+    'output_size': 0,
+}
+
+
+class BenchmarkCase(NamedTuple):
+    """Сценарий: режим конвертации, исходное изображение и поля формы"""
+    mode: str
+    image_mode: str
+    image_format: str
+    size: str
+    options: Dict[str, str] = {}
+
+    @property
+    def name(self) -> str:
+        suffix = ''.join(f'-{key}={value}' for key, value in sorted(self.options.items()))
+        return f'{self.mode}/{self.image_format.lower()}-{self.image_mode.lower()}/{self.size}{suffix}'
+
+
+# Форматы и цветовые режимы, которые принимает каждый конвертер на основе Pillow
+CASE_TEMPLATES = [
+    ('image', 'RGB', 'JPEG', {}),
+    ('image', 'RGBA', 'PNG', {}),
+    ('image_to_grayscale', 'RGB', 'JPEG', {}),
+    ('image_to_grayscale', 'RGB', 'JPEG', {'convert_to_pdf': 'on'}),
+    ('image_to_grayscale', 'RGB', 'PNG', {}),
+    ('png_to_jpg', 'RGB', 'PNG', {}),
+    ('png_to_jpg', 'RGBA', 'PNG', {}),
+    ('png_to_jpg', 'P', 'PNG', {}),
+    ('bmp_to_jpg', 'RGB', 'BMP', {}),
+    ('bmp_to_jpg', 'L', 'BMP', {}),
+    ('image_distort', 'RGB', 'JPEG', {'effect': 'swirl'}),
+    ('image_distort', 'RGB', 'JPEG', {'effect': 'barrel'}),
+    ('image_distort', 'RGB', 'JPEG', {'effect': 'perspective'}),
+]
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'BMP': 'image/bmp'}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'BMP': 'bmp'}
+
+
+def build_cases(modes: Optional[Iterable[str]] = None, sizes: Iterable[str] = IMAGE_SIZES) -> List[BenchmarkCase]:
+    """Сценарии для выбранных режимов конвертации и размеров изображений"""
+    modes = set(modes) if modes else None
+    return [
+        BenchmarkCase(mode, image_mode, image_format, size, options)
+        for mode, image_mode, image_format, options in CASE_TEMPLATES
+        if modes is None or mode in modes
+        for size in sizes
+    ]
+
+
+def generate_image(size, mode: str, image_format: str, seed: int = 0) -> bytes:
+    """
+    Синтетическое изображение: градиенты с шумом и, для RGBA, переменная прозрачность
+
+    Шум не дает кодекам сжать изображение до неправдоподобно малого размера,
+    seed делает результаты воспроизводимыми.
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    noise = rng.normal(0, 12, (height, width)).astype(np.float32)
+    channels = [x + noise, y + noise, (x + y) / 2 - noise, (x * y) / 255]
+
+    pixels = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels, 'RGBA')
+    if mode == 'P':
+        image = image.convert('RGB').quantize(256)
+    elif mode != 'RGBA':
+        image = image.convert(mode)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **({'quality': 90} if image_format == 'JPEG' else {}))
+    return buffer.getvalue()
+
+
+class PeakMemory:
+    """
+    Пиковый прирост RSS процесса за время измерения
+
+    В Linux пик сбрасывается через /proc/self/clear_refs и читается из VmHWM.
+    В остальных системах используется ru_maxrss, который не сбрасывается,
+    поэтому значение показывает пик процесса с начала работы.
+    """
+
+    STATUS_PATH = '/proc/self/status'
+    CLEAR_REFS_PATH = '/proc/self/clear_refs'
+
+    def __init__(self):
+        self.precise = os.path.exists(self.CLEAR_REFS_PATH)
+        self._baseline = 0
+
+    @classmethod
+    def _status_kb(cls, field: str) -> int:
+        with open(cls.STATUS_PATH) as status:
+            for line in status:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1])
+        return 0
+
+    def reset(self) -> None:
+        if self.precise:
+            try:
+                with open(self.CLEAR_REFS_PATH, 'w') as clear_refs:
+                    clear_refs.write('5')
+                self._baseline = self._status_kb('VmRSS')
+                return
+            except OSError:
+                self.precise = False
+
+        self._baseline = 0
+
+    def peak_mb(self) -> float:
+        if self.precise:
+            peak_kb = self._status_kb('VmHWM') - self._baseline
+        else:
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform == 'darwin':
+                peak_kb //= 1024
+        return round(max(peak_kb, 0) / 1024, 1)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def run_case(case: BenchmarkCase, iterations: int, warmup: int = 1) -> Dict:
+    """
+    Выполняет сценарий без объекта запроса и кэша конвертаций
+
+    :param case: Сценарий
+    :param iterations: Количество измеряемых конвертаций
+    :param warmup: Количество прогревочных конвертаций (импорт модулей, кэши карт искажения)
+    :return: Пропускная способность, задержки, пиковый прирост RSS и размер результата
+    """
+    converter = get_converter_by_mode(case.mode)
+    source = generate_image(IMAGE_SIZES[case.size], case.image_mode, case.image_format)
+    file_name = f'bench.{EXTENSIONS[case.image_format]}'
+
+    def convert_once():
+        request = converter.build_source_request(
+            file_name, source, CONTENT_TYPES[case.image_format], case.options,
+        )
+        started_at = time.perf_counter()
+        output = converter.convert(file_name, request)
+        elapsed = time.perf_counter() - started_at
+        size = output.size
+        output.close()
+        return elapsed, size
+
+    for _ in range(warmup):
+        convert_once()
+
+    memory = PeakMemory()
+    memory.reset()
+    latencies, output_size = [], 0
+    for _ in range(iterations):
+        elapsed, output_size = convert_once()
+        latencies.append(elapsed)
+
+    total = sum(latencies)
+    width, height = IMAGE_SIZES[case.size]
+    return {
+        'mode': case.mode,
+        'input': f'{case.image_format} {case.image_mode} {width}x{height}',
+        'input_size': len(source),
+        'iterations': iterations,
+        'throughput_per_s': round(iterations / total, 3) if total else None,
+        'megapixels_per_s': round(width * height * iterations / total / 1e6, 2) if total else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': memory.peak_mb(),
+        'peak_rss_precise': memory.precise,
+        'output_size': output_size,
+    }
+
+
+def run_benchmarks(cases: Iterable[BenchmarkCase], iterations: int, warmup: int = 1) -> Iterator[tuple]:
+    """Выполняет сценарии по очереди и возвращает пары (имя сценария, результат)"""
+    for case in cases:
+        try:
+            yield case.name, run_case(case, iterations, warmup)
+        except Exception as e:
+            yield case.name, {'mode': case.mode, 'error': str(e) or e.__class__.__name__}
+
+
+def environment() -> Dict:
+    """Параметры окружения, от которых зависят результаты"""
+    return {
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare_with_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Dict]:
+    """
+    Сравнивает результаты с сохраненными
+
+    :param results: Текущие результаты по сценариям
+    :param baseline: Результаты базового прогона по сценариям
+    :param threshold: Допустимый относительный рост метрики, например 0.1 для 10 %
+    :return: Изменения метрик по сценариям, присутствующим в обоих прогонах
+    """
+    changes = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or 'error' in current or 'error' in previous:
+            continue
+
+        for metric, noise in REGRESSION_METRICS.items():
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before - 1
+            changes.append({
+                'case': name,
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': round(ratio, 4),
+                'regression': ratio > threshold and after - before > noise,
+            })
+    return changes
+
+
+def load_report(path: str) -> Dict:
+    with open(path, encoding='utf-8') as report_file:
+        return json.load(report_file)
+
+
+def save_report(path: str, report: Dict) -> None:
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
@@ -0,0 +1,247 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+
+class CachedResult(NamedTuple):
+    """Сохраненный результат конвертации"""
+    extension: str
+    content_type: str
+    content: bytes
+
+
+class FileSystemCacheBackend:
+    """
+    Хранит результаты конвертации на локальном диске.
+
+    Размер кэша ограничен max_size байт, при переполнении удаляются записи,
+    к которым дольше всего не обращались (время обращения хранится в mtime).
+
+    Директорию могут использовать несколько процессов, поэтому размер кэша
+    пересчитывается по диску не реже раза в scan_interval секунд, а между
+    пересчетами к нему добавляются записи текущего процесса. Записи других
+    процессов за это время могут ненадолго превысить max_size.
+    """
+
+    def __init__(self, location: str, max_size: int, scan_interval: float = 60):
+        self.location = location
+        self.max_size = max_size
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        os.makedirs(self.location, exist_ok=True)
+        self._current_size = self._scan_size()
+        self._scanned_at = time.monotonic()
+
+    def _paths(self, key: str):
+        directory = os.path.join(self.location, key[:2])
+        return os.path.join(directory, f'{key}.bin'), os.path.join(directory, f'{key}.json')
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        content_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as meta_file:
+                meta = json.load(meta_file)
+            with open(content_path, 'rb') as content_file:
+                content = content_file.read()
+        except (OSError, ValueError):
+            return None
+
+        os.utime(content_path)
+        return CachedResult(meta['extension'], meta['content_type'], content)
+
+    def set(self, key: str, result: CachedResult) -> None:
+        if len(result.content) > self.max_size:
+            return
+
+        content_path, meta_path = self._paths(key)
+        directory = os.path.dirname(content_path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Запись через временный файл, чтобы параллельные читатели не увидели неполные данные
+        for path, data in (
+            (content_path, result.content),
+            (meta_path, json.dumps({
+                'extension': result.extension,
+                'content_type': result.content_type,
+            }).encode()),
+        ):
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            if time.monotonic() - self._scanned_at >= self.scan_interval:
+                self._current_size = self._scan_size()
+                self._scanned_at = time.monotonic()
+            else:
+                self._current_size += len(result.content)
+
+            if self._current_size > self.max_size:
+                self._evict()
+
+    def _entries(self):
+        for directory, _, file_names in os.walk(self.location):
+            for file_name in file_names:
+                if file_name.endswith('.bin'):
+                    path = os.path.join(directory, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """Удаляет самые старые записи, пока кэш не уменьшится до 90% лимита"""
+        entries = sorted(self._entries())
+        self._current_size = sum(size for _, size, _ in entries)
+        self._scanned_at = time.monotonic()
+        target_size = self.max_size * 0.9
+        for _, size, path in entries:
+            if self._current_size <= target_size:
+                break
+
+            for stale_path in (path, path[:-len('.bin')] + '.json'):
+                try:
+                    os.remove(stale_path)
+                except FileNotFoundError:
+                    pass
+            self._current_size -= size
+
+
+class DjangoCacheBackend:
+    """Хранит результаты конвертации в кэше Django"""
+
+    def __init__(self, alias: str = 'default', timeout: Optional[int] = None):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        cached = self.cache.get(f'conversion:{key}')
+        return CachedResult(*cached) if cached is not None else None
+
+    def set(self, key: str, result: CachedResult) -> None:
+        self.cache.set(f'conversion:{key}', tuple(result), self.timeout)
+
+
+class ConversionCache:
+    """
+    Кэш результатов конвертации, адресуемый по содержимому входных данных.
+
+    Ключ строится из класса конвертера, его параметров и байтов входных данных,
+    поэтому повторная конвертация тех же данных возвращает сохраненный результат.
+    """
+
+    def __init__(self, backend, max_entry_size: Optional[int] = None):
+        self.backend = backend
+        self.max_entry_size = max_entry_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def convert(self, converter, file_name: str, request):
+        """
+        Возвращает результат конвертации из кэша или выполняет конвертацию
+
+        :param converter: Экземпляр DocumentConverter
+        :param file_name: Базовое имя для выходного файла
+        :param request: Объект запроса с полями POST и FILES
+        :return: Результирующий файл
+        """
+        key = converter.get_cache_key(request)
+        cached = self.backend.get(key)
+        if cached is not None:
+            self._count(hit=True)
+            return SimpleUploadedFile(
+                name=f"{file_name.rsplit('.', 1)[0]}.{cached.extension}",
+                content=cached.content,
+                content_type=cached.content_type,
+            )
+
+        self._count(hit=False)
+        result = converter.convert(file_name=file_name, request=request)
+        if self.max_entry_size is not None and result.size > self.max_entry_size:
+            return result
+
+        result.seek(0)
+        content = result.read()
+        result.seek(0)
+        self.backend.set(key, CachedResult(
+            extension=result.name.rsplit('.', 1)[-1],
+            content_type=result.content_type,
+            content=content,
+        ))
+        return result
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        """Возвращает счетчики попаданий и промахов кэша текущего процесса"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+class DisabledConversionCache(ConversionCache):
+    """Заглушка, которая всегда выполняет конвертацию"""
+
+    def __init__(self):
+        super().__init__(backend=None)
+
+    def convert(self, converter, file_name: str, request):
+        self._count(hit=False)
+        return converter.convert(file_name=file_name, request=request)
+
+
+_conversion_cache = None
+_conversion_cache_lock = threading.Lock()
+
+
+def get_conversion_cache() -> ConversionCache:
+    """Возвращает кэш конвертаций, настроенный через settings.CONVERSION_CACHE"""
+    global _conversion_cache
+
+    with _conversion_cache_lock:
+        if _conversion_cache is None:
+            cache_settings = settings.CONVERSION_CACHE
+            backend_name = cache_settings.get('BACKEND')
+            if backend_name == 'filesystem':
+                _conversion_cache = ConversionCache(
+                    FileSystemCacheBackend(
+                        location=cache_settings['LOCATION'],
+                        max_size=cache_settings['MAX_SIZE'],
+                        scan_interval=cache_settings.get('SCAN_INTERVAL', 60),
+                    ),
+                    max_entry_size=cache_settings.get('MAX_ENTRY_SIZE'),
+                )
+            elif backend_name == 'django':
+                _conversion_cache = ConversionCache(
+                    DjangoCacheBackend(
+                        alias=cache_settings.get('ALIAS', 'default'),
+                        timeout=cache_settings.get('TIMEOUT'),
+                    ),
+                    max_entry_size=cache_settings.get('MAX_ENTRY_SIZE'),
+                )
+            else:
+                _conversion_cache = DisabledConversionCache()
+
+        return _conversion_cache
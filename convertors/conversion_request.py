@@ -0,0 +1,34 @@
+from typing import Dict, List, Optional
+
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+class ConversionRequest:
+    """
+    Минимальная замена HttpRequest для запуска конвертеров вне веб-запроса.
+
+    Конвертеры читают только POST и FILES, поэтому этого достаточно,
+    чтобы выполнять их в Celery-воркерах и пакетных обработчиках.
+    """
+
+    def __init__(
+        self,
+        post: Optional[QueryDict] = None,
+        files: Optional[MultiValueDict] = None,
+    ):
+        self.POST = post if post is not None else QueryDict(mutable=True)
+        self.FILES = files if files is not None else MultiValueDict()
+
+    @classmethod
+    def from_form_data(
+        cls,
+        form_data: Dict[str, List[str]],
+        files: Optional[MultiValueDict] = None,
+    ) -> 'ConversionRequest':
+        """Собирает запрос из сериализованных полей формы вида {поле: [значения]}"""
+        post = QueryDict(mutable=True)
+        for key, values in form_data.items():
+            post.setlist(key, list(values))
+
+        return cls(post=post, files=files)
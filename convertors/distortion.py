@@ -0,0 +1,165 @@
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.lru_cache import LRUCache
+
+# Шаг сетки, по которой вычисляется карта координат. Между узлами сетки
+# Pillow интерполирует координаты сам, поэтому NumPy считает не каждый пиксель,
+# а только узлы: для 12 Мп изображения это десятки тысяч точек вместо миллионов.
+MESH_STEP = 16
+
+Size = Tuple[int, int]
+Mesh = List[Tuple[Tuple[int, int, int, int], Tuple[float, ...]]]
+
+# Количество закэшированных преобразований. Сетка для 12 Мп изображения занимает
+# около 26 МБ, а сила искажения задается пользователем, поэтому кэш держится маленьким
+TRANSFORM_CACHE_SIZE = 4
+
+# Преобразования по (эффект, размер, сила): повторные искажения изображений
+# того же размера не пересчитывают карту координат
+_transforms = LRUCache(max_size=TRANSFORM_CACHE_SIZE)
+
+
+def _vertex_grid(size: Size, step: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Координаты узлов сетки, покрывающей изображение, включая правую и нижнюю границы"""
+    width, height = size
+    xs = np.unique(np.append(np.arange(0, width, step), width)).astype(np.float64)
+    ys = np.unique(np.append(np.arange(0, height, step), height)).astype(np.float64)
+    return np.meshgrid(xs, ys)
+
+
+def _build_mesh(size: Size, source_of: Callable, step: int = MESH_STEP) -> Mesh:
+    """
+    Собирает сетку для Image.transform(MESH)
+
+    :param size: Размер изображения
+    :param source_of: Функция, возвращающая для массивов координат результата координаты в исходнике
+    :param step: Шаг сетки в пикселях
+    :return: Список (прямоугольник результата, четырехугольник исходника)
+    """
+    grid_x, grid_y = _vertex_grid(size, step)
+    source_x, source_y = source_of(grid_x, grid_y)
+
+    boxes = np.stack(
+        [grid_x[:-1, :-1], grid_y[:-1, :-1], grid_x[1:, 1:], grid_y[1:, 1:]],
+        axis=-1,
+    ).reshape(-1, 4).astype(int)
+    # Вершины исходного четырехугольника: левая верхняя, левая нижняя, правая нижняя, правая верхняя
+    quads = np.stack(
+        [
+            source_x[:-1, :-1], source_y[:-1, :-1],
+            source_x[1:, :-1], source_y[1:, :-1],
+            source_x[1:, 1:], source_y[1:, 1:],
+            source_x[:-1, 1:], source_y[:-1, 1:],
+        ],
+        axis=-1,
+    ).reshape(-1, 8)
+    return [(tuple(box), tuple(quad)) for box, quad in zip(boxes.tolist(), quads.tolist())]
+
+
+def swirl_transform(size: Size, strength: float):
+    """
+    Закручивание вокруг центра изображения
+
+    Точка на расстоянии d от центра поворачивается на угол strength * (R - d) / R,
+    где R - половина меньшей стороны; точки дальше R не смещаются.
+    """
+    width, height = size
+    center_x, center_y = width / 2, height / 2
+    radius = min(width, height) / 2
+
+    def source_of(x, y):
+        dx, dy = x - center_x, y - center_y
+        distance = np.hypot(dx, dy)
+        angle = np.arctan2(dy, dx) + strength * np.clip(radius - distance, 0, None) / radius
+        return center_x + distance * np.cos(angle), center_y + distance * np.sin(angle)
+
+    return Image.Transform.MESH, _build_mesh(size, source_of)
+
+
+def barrel_transform(size: Size, strength: float):
+    """
+    Бочкообразная (strength > 0) или подушкообразная (strength < 0) дисторсия
+
+    Расстояние от центра масштабируется на 1 + strength * r², где r нормировано
+    на половину диагонали.
+    """
+    width, height = size
+    center_x, center_y = width / 2, height / 2
+    half_diagonal = np.hypot(center_x, center_y)
+
+    def source_of(x, y):
+        dx, dy = x - center_x, y - center_y
+        scale = 1 + strength * (np.hypot(dx, dy) / half_diagonal) ** 2
+        return center_x + dx * scale, center_y + dy * scale
+
+    return Image.Transform.MESH, _build_mesh(size, source_of)
+
+
+def perspective_transform(size: Size, strength: float):
+    """
+    Перспективное искажение: углы изображения смещаются внутрь на долю strength от размера
+
+    Коэффициенты проективного преобразования находятся решением линейной системы
+    по четырем парам углов.
+    """
+    width, height = size
+    shift_x, shift_y = width * strength, height * strength
+    corners = [(0, 0), (width, 0), (width, height), (0, height)]
+    # Куда попадают углы исходника в результате
+    targets = [
+        (shift_x, shift_y / 2),
+        (width - shift_x, shift_y * 0.75),
+        (width - shift_x * 0.75, height - shift_y),
+        (shift_x / 2, height - shift_y / 2),
+    ]
+
+    # Image.transform ожидает преобразование из координат результата в координаты исходника
+    matrix, vector = [], []
+    for (target_x, target_y), (source_x, source_y) in zip(targets, corners):
+        matrix.append([target_x, target_y, 1, 0, 0, 0, -source_x * target_x, -source_x * target_y])
+        matrix.append([0, 0, 0, target_x, target_y, 1, -source_y * target_x, -source_y * target_y])
+        vector.extend([source_x, source_y])
+
+    coefficients = np.linalg.solve(np.array(matrix, dtype=np.float64), np.array(vector, dtype=np.float64))
+    return Image.Transform.PERSPECTIVE, tuple(float(value) for value in coefficients)
+
+
+# Эффект: (функция преобразования, сила по умолчанию, допустимый диапазон силы)
+DISTORTIONS: Dict[str, Tuple[Callable, float, Tuple[float, float]]] = {
+    'swirl': (swirl_transform, 5.0, (-20.0, 20.0)),
+    'barrel': (barrel_transform, 0.3, (-0.9, 2.0)),
+    'perspective': (perspective_transform, 0.05, (0.0, 0.3)),
+}
+
+
+def get_transform(effect: str, size: Size, strength: float):
+    """
+    Возвращает метод и данные Image.transform для эффекта, используя кэш
+
+    :raises ValueError: Если эффект неизвестен или сила не является конечным числом
+    """
+    if effect not in DISTORTIONS:
+        raise ValueError(f'Неизвестный эффект искажения: {effect}')
+    if not np.isfinite(strength):
+        raise ValueError('Сила искажения должна быть конечным числом')
+
+    key = (effect, size, strength)
+    transform = _transforms.get(key)
+    if transform is None:
+        transform = DISTORTIONS[effect][0](size, strength)
+        _transforms.set(key, transform)
+    return transform
+
+
+def distort(image: Image.Image, effect: str, strength: float) -> Image.Image:
+    """
+    Применяет искажение к изображению
+
+    Пиксели переносятся Pillow по карте координат с бикубической интерполяцией,
+    области за пределами исходника заполняются черным.
+    """
+    method, data = get_transform(effect, image.size, strength)
+    return image.transform(image.size, method, data, resample=Image.Resampling.BICUBIC)
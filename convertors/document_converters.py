@@ -1,23 +1,60 @@
+import math
 import os
 import re
+import threading
 from io import BytesIO
 from tempfile import NamedTemporaryFile
-from typing import Dict, Any, List
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
-import docx
-import pdfkit
-import pythoncom
-import win32com.client
 from PIL import Image
 from django.conf import settings
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile, UploadedFile
 
 from convertors.base_converter import DocumentConverter
+from convertors.executors import get_executor
+from convertors.image_loading import PAGE_SIZE_A4, fit_size, load_image, page_pixels
+from convertors.office_pool import get_office_pool
+from convertors.pdf_writer import COLOR_SPACES, JpegPage, StreamingPdfWriter
+from convertors.wkhtmltopdf_pool import get_pdf_pool
+
+
+class RenderedFile(UploadedFile):
+    """
+    Результат конвертации, записанный внешним процессом во временный файл.
+
+    Содержимое не копируется в память: файл читается напрямую при отдаче
+    ответа и удаляется при закрытии.
+    """
+
+    def __init__(self, path: str, name: str, content_type: str):
+        super().__init__(
+            file=open(path, 'rb'),
+            name=name,
+            content_type=content_type,
+            size=os.path.getsize(path),
+        )
+        self._path = path
+
+    def temporary_file_path(self) -> str:
+        return self._path
+
+    def close(self):
+        try:
+            return self.file.close()
+        finally:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
 
 
 class HtmlToPdfConverter(DocumentConverter):
     """Конвертер HTML-контента в PDF-документы с использованием wkhtmltopdf"""
 
+    SOURCE_IN_POST = True
     DEFAULT_PAGE_SIZE = 'A4'
     DEFAULT_MARGIN = '40px'
     DEFAULT_CSS = {
@@ -27,8 +64,6 @@ class HtmlToPdfConverter(DocumentConverter):
 
     def __init__(self):
         super().__init__()
-        self.path_to_wkhtmltopdf = r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe'
-        self.config = pdfkit.configuration(wkhtmltopdf=self.path_to_wkhtmltopdf)
 
     def get_conversion_options(self) -> Dict[str, Any]:
         """Возвращает параметры конвертации"""
@@ -41,6 +76,10 @@ class HtmlToPdfConverter(DocumentConverter):
             'encoding': 'UTF-8'
         }
 
+    def get_cache_options(self) -> Dict[str, Any]:
+        """Добавляет опции wkhtmltopdf к параметрам, влияющим на результат"""
+        return {**super().get_cache_options(), 'conversion_options': self.get_conversion_options()}
+
     def _generate_css(self) -> str:
         """Генерирует CSS стили из DEFAULT_CSS"""
         css_lines = []
@@ -57,7 +96,7 @@ class HtmlToPdfConverter(DocumentConverter):
             html_content,
         )
 
-    def convert(self, file_name: str, request) -> SimpleUploadedFile:
+    def convert(self, file_name: str, request) -> RenderedFile:
         """
         Конвертирует HTML-контент в PDF-документ
 
@@ -66,7 +105,7 @@ class HtmlToPdfConverter(DocumentConverter):
             request: Объект запроса с параметрами
 
         Returns:
-            SimpleUploadedFile: Результирующий PDF-документ
+            RenderedFile: Результирующий PDF-документ во временном файле пула
 
         Raises:
             ValueError: При отсутствии обязательных данных
@@ -76,49 +115,68 @@ class HtmlToPdfConverter(DocumentConverter):
         if not html_content:
             raise ValueError('Отсутствует HTML-контент для конвертации')
 
-        try:
-            processed_html = self._prepare_html_content(html_content)
-            pdf_bytes = pdfkit.from_string(
-                input=processed_html,
-                output_path=False,
-                options=self.get_conversion_options(),
-            )
-            return self._create_pdf_file(file_name, pdf_bytes)
-        except Exception as e:
-            raise e
-
-    @staticmethod
-    def _create_pdf_file(file_name: str, content: bytes) -> SimpleUploadedFile:
-        """Создает объект SimpleUploadedFile для PDF"""
-        file_name = f"{file_name.rsplit('.', 1)[0]}.pdf"
-        return SimpleUploadedFile(
-            name=file_name,
-            content=content,
-            content_type='application/pdf'
+        output_path = get_pdf_pool().render_to_file(
+            self._prepare_html_content(html_content),
+            self.get_conversion_options(),
         )
+        return RenderedFile(
+            output_path,
+            name=f"{file_name.rsplit('.', 1)[0]}.pdf",
+            content_type='application/pdf',
+        )
+
+
+def encode_jpeg_page(source, quality: int, max_size: Optional[Tuple[int, int]] = None) -> JpegPage:
+    """
+    Декодирует изображение в RGB не больше max_size и сжимает в JPEG-страницу
+
+    Функция вынесена на уровень модуля, чтобы ее можно было выполнять в пуле процессов.
+
+    Args:
+        source: Файл изображения или его содержимое в байтах
+        quality: Качество JPEG
+        max_size: Максимальный размер страницы в пикселях
+
+    Returns:
+        JpegPage: Подготовленная страница PDF
+    """
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    with load_image(source, max_size, mode='RGB') as img:
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=quality)
+        return JpegPage(buffer.getvalue(), img.width, img.height, img.mode)
 
 
 class ImageToPdfConverter(DocumentConverter):
-    """Конвертер изображений в PDF документы с поддержкой многопоточности"""
+    """Конвертер изображений в PDF документы с постраничной записью"""
 
+    SOURCE_FIELD = 'file_content[]'
     SUPPORTED_FORMATS = {'image/jpeg', 'image/png', 'image/bmp', 'image/gif'}
     DEFAULT_QUALITY = 90
     PDF_RESOLUTION = 300  # DPI
+    # Изображения больше листа уменьшаются до размера листа при PDF_RESOLUTION
+    MAX_PAGE_SIZE = PAGE_SIZE_A4  # дюймы
 
     def __init__(self):
         super().__init__()
-        self._image_objects = []
+        self._parallel = settings.IMAGE_TO_PDF_PARALLEL
+        self._max_pixels = page_pixels(self.MAX_PAGE_SIZE, self.PDF_RESOLUTION)
 
-    def convert(self, file_name: str, request) -> SimpleUploadedFile:
+    def convert(self, file_name: str, request) -> UploadedFile:
         """
         Конвертирует одно или несколько изображений в PDF
 
+        Страницы декодируются и записываются в выходной файл по одной,
+        поэтому потребление памяти не зависит от количества изображений.
+
         Args:
             file_name: Базовое имя для выходного файла
             request: Объект запроса с файлами изображений
 
         Returns:
-            SimpleUploadedFile: Результирующий PDF документ
+            UploadedFile: Результирующий PDF документ
 
         Raises:
             ValueError: При отсутствии изображений или ошибках валидации
@@ -126,34 +184,90 @@ class ImageToPdfConverter(DocumentConverter):
         """
         try:
             self._validate_request(request)
-            images = self._load_images(request)
-            return self._create_pdf(file_name, images)
+            image_files = request.FILES.getlist(self.SOURCE_FIELD)
+            for image_file in image_files:
+                self._validate_image_format(image_file)
+
+            return self._create_pdf(file_name, self._load_images(image_files))
         except Exception as e:
             raise e
 
     def _validate_request(self, request) -> None:
         """Проверяет корректность входящего запроса"""
-        if not request.FILES.getlist('file_content[]'):
+        if not request.FILES.getlist(self.SOURCE_FIELD):
             raise ValueError('Отсутствуют файлы изображений')
 
-        if len(request.FILES.getlist('file_content[]')) == 0:
+        if len(request.FILES.getlist(self.SOURCE_FIELD)) == 0:
             raise ValueError('Не загружено ни одного изображения')
 
-    def _load_images(self, request) -> List[Image.Image]:
-        """Загружает и валидирует изображения"""
-        images = []
-        for img_file in request.FILES.getlist('file_content[]'):
-            self._validate_image_format(img_file)
+    def _load_images(self, image_files) -> Iterator[JpegPage]:
+        """Загружает изображения и подготавливает страницы PDF в исходном порядке"""
+        if self._parallel['ENABLED'] and len(image_files) > 1:
+            yield from self._load_images_parallel(image_files)
+            return
+
+        for img_file in image_files:
             try:
-                img = Image.open(img_file)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+                yield self._get_passthrough_page(img_file) or encode_jpeg_page(
+                    img_file, self.DEFAULT_QUALITY, self._max_pixels,
+                )
+            except IOError as e:
+                raise ValueError(f'Невозможно открыть изображение {img_file.name}') from e
+
+    def _load_images_parallel(self, image_files) -> Iterator[JpegPage]:
+        """
+        Декодирует и сжимает страницы в пуле исполнителей
+
+        Одновременно в обработке находится не больше WINDOW страниц,
+        результаты возвращаются в порядке загрузки файлов.
+        """
+        executor = get_executor(self._parallel['EXECUTOR'], self._parallel['WORKERS'])
+        window = self._parallel['WINDOW']
+        pending = deque()
 
-                images.append(img)
+        def next_page():
+            img_file, page = pending.popleft()
+            try:
+                return page.result() if isinstance(page, Future) else page
             except IOError as e:
                 raise ValueError(f'Невозможно открыть изображение {img_file.name}') from e
 
-        return images
+        try:
+            for img_file in image_files:
+                try:
+                    page = self._get_passthrough_page(img_file)
+                except IOError as e:
+                    raise ValueError(f'Невозможно открыть изображение {img_file.name}') from e
+
+                if page is None:
+                    page = executor.submit(encode_jpeg_page, img_file.read(), self.DEFAULT_QUALITY, self._max_pixels)
+                pending.append((img_file, page))
+
+                if len(pending) >= window:
+                    yield next_page()
+
+            while pending:
+                yield next_page()
+        finally:
+            for _, page in pending:
+                if isinstance(page, Future):
+                    page.cancel()
+
+    def _get_passthrough_page(self, image_file) -> Optional[JpegPage]:
+        """Возвращает страницу без перекодирования для JPEG в RGB или оттенках серого, не больше листа"""
+        with Image.open(image_file) as img:
+            is_passthrough = (
+                img.format == 'JPEG'
+                and img.mode in COLOR_SPACES
+                and fit_size(img.size, self._max_pixels) == img.size
+            )
+            width, height, mode = img.width, img.height, img.mode
+
+        image_file.seek(0)
+        if not is_passthrough:
+            return None
+
+        return JpegPage(image_file.read(), width, height, mode)
 
     def _validate_image_format(self, image_file) -> None:
         """Проверяет MIME-тип изображения"""
@@ -161,37 +275,34 @@ class ImageToPdfConverter(DocumentConverter):
         if content_type not in self.SUPPORTED_FORMATS:
             raise ValueError(f'Неподдерживаемый формат изображения: {content_type}')
 
-    def _create_pdf(self, original_name: str, images: List[Image.Image]) -> SimpleUploadedFile:
-        """Создает PDF файл из списка изображений"""
-        if not images:
-            raise ValueError('Нет изображений для конвертации')
-
-        main_image, *other_images = images
-        pdf_buffer = BytesIO()
+    def _create_pdf(self, original_name: str, pages: Iterable[JpegPage]) -> UploadedFile:
+        """Записывает страницы во временный PDF файл по мере их подготовки"""
+        output_file = TemporaryUploadedFile(
+            name=f'{self._sanitize_name(original_name)}.pdf',
+            content_type='application/pdf',
+            size=0,
+            charset=None,
+        )
+        writer = StreamingPdfWriter(output_file, resolution=self.PDF_RESOLUTION)
 
         try:
-            main_image.save(
-                pdf_buffer,
-                format='PDF',
-                save_all=True,
-                append_images=other_images,
-                quality=self.DEFAULT_QUALITY,
-                dpi=(self.PDF_RESOLUTION, self.PDF_RESOLUTION)
-            )
+            for page in pages:
+                writer.add_page(page)
+
+            if not writer.page_count:
+                raise ValueError('Нет изображений для конвертации')
+
+            writer.close()
+        except ValueError:
+            output_file.close()
+            raise
         except Exception as e:
+            output_file.close()
             raise RuntimeError('Ошибка генерации PDF') from e
 
-        return self._prepare_output_file(original_name, pdf_buffer)
-
-    def _prepare_output_file(self, base_name: str, buffer: BytesIO) -> SimpleUploadedFile:
-        """Создает объект SimpleUploadedFile"""
-        buffer.seek(0)
-        filename = f'{self._sanitize_name(base_name)}.pdf'
-        return SimpleUploadedFile(
-            name=filename,
-            content=buffer.read(),
-            content_type='application/pdf'
-        )
+        output_file.size = writer.size
+        output_file.seek(0)
+        return output_file
 
     def _sanitize_name(self, name: str) -> str:
         """Очищает имя файла от недопустимых символов"""
@@ -199,60 +310,101 @@ class ImageToPdfConverter(DocumentConverter):
 
 
 class WordToPdfConverter(DocumentConverter):
-    """"""
+    """
+    Конвертер DOCX-документов в PDF
+
+    Способ конвертации задается настройкой WORD_TO_PDF_BACKEND:
+    'html' - собственный рендеринг через HTML и пул wkhtmltopdf,
+    'office' - пул headless LibreOffice, 'word' - Microsoft Word через COM (только Windows).
+    """
+
+    BACKEND_HTML = 'html'
+    BACKEND_OFFICE = 'office'
+    BACKEND_WORD = 'word'
 
     def __init__(self):
         super().__init__()
-        self.use_v2_generation = False
+        self.backend = settings.WORD_TO_PDF_BACKEND
 
-    def convert_word_to_pdf(self, file_name, request):
-        """"""
-        word_to_pdf_dir = os.path.join(settings.MEDIA_ROOT, 'word_to_pdf')
-        if not os.path.exists(word_to_pdf_dir):
-            os.makedirs(word_to_pdf_dir)
+    def get_conversion_options(self) -> Dict[str, Any]:
+        """Возвращает параметры wkhtmltopdf"""
+        return {
+            'no-images': False,
+            'quiet': None,
+            'page-size': 'A4',
+            'print-media-type': True,
+            'encoding': 'UTF-8',
+        }
 
-        word_file_path = os.path.join(word_to_pdf_dir, file_name + '.docx')
+    def get_cache_options(self) -> Dict[str, Any]:
+        """Добавляет опции wkhtmltopdf к параметрам, влияющим на результат"""
+        return {**super().get_cache_options(), 'conversion_options': self.get_conversion_options()}
 
-        with open(word_file_path, 'wb') as temp_file:
-            temp_file.write(request.FILES.get('file_content').read())
+    def convert_word_to_pdf(self, file_name, request) -> RenderedFile:
+        """
+        Конвертирует DOCX в PDF без Word и временных файлов с исходником
 
-        doc = docx.Document(word_file_path)
-        html_content = "<html><body>"
-        for para in doc.paragraphs:
-            html_content += f"<p>{para.text}</p>"
+        Документ читается из загруженного файла в памяти и преобразуется в HTML
+        с сохранением форматирования, таблиц и изображений, после чего
+        рендерится пулом wkhtmltopdf.
 
-        html_content += "</body></html>"
-        options = {
-            'no-images': False,
-            'enable-local-file-access': True,
-            'quiet': '',
-            'page-size': 'A4',
-            'print-media-type': True
-        }
-        styles = 'body { padding: 0; font-family: Arial, sans-serif; } @page { margin: 40px; }'
-        html_with_styles = f'<head><meta charset="UTF-8"></head>' + re.sub(r'<style>', f'<style>{styles}', html_content)
+        Args:
+            file_name: Базовое имя для выходного файла
+            request: Объект запроса с DOCX-файлом в file_content
 
-        return SimpleUploadedFile(
-            f'{file_name}.pdf',
-            pdfkit.from_string(html_with_styles, False, options=options),
-            content_type='application/pdf'
+        Returns:
+            RenderedFile: Результирующий PDF-документ во временном файле пула
+
+        Raises:
+            ValueError: При отсутствии файла или некорректном DOCX
+        """
+        from convertors.docx_html import DocxHtmlRenderer
+
+        word_file = request.FILES.get('file_content')
+        if not word_file:
+            raise ValueError('Отсутствует DOCX-файл для конвертации')
+
+        html_content = DocxHtmlRenderer().render(word_file)
+        output_path = get_pdf_pool().render_to_file(html_content, self.get_conversion_options())
+        return RenderedFile(
+            output_path,
+            name=f"{file_name.rsplit('.', 1)[0]}.pdf",
+            content_type='application/pdf',
+        )
+
+    def convert_word_to_pdf_office(self, file_name, request) -> RenderedFile:
+        """
+        Конвертирует DOCX в PDF в пуле headless LibreOffice
+
+        Args:
+            file_name: Базовое имя для выходного файла
+            request: Объект запроса с DOCX-файлом в file_content
+
+        Returns:
+            RenderedFile: Результирующий PDF-документ во временном файле пула
+
+        Raises:
+            ValueError: При отсутствии файла
+            RuntimeError: При ошибках или превышении времени конвертации
+        """
+        word_file = request.FILES.get('file_content')
+        if not word_file:
+            raise ValueError('Отсутствует DOCX-файл для конвертации')
+
+        suffix = os.path.splitext(word_file.name)[1].lower() or '.docx'
+        output_path = get_office_pool().convert_to_file(word_file, suffix)
+        return RenderedFile(
+            output_path,
+            name=f"{file_name.rsplit('.', 1)[0]}.pdf",
+            content_type='application/pdf',
         )
 
     def convert_word_to_pdf_v2(self, file_name, request):
         """"""
-        # pythoncom.CoInitialize()
-        # word_to_pdf_dir = os.path.join(settings.MEDIA_ROOT, 'word_to_pdf')
-        # os.makedirs(word_to_pdf_dir, exist_ok=True)
-        # pdf_title = file_name.split('.')[0]
-        # word_file_path = os.path.join(word_to_pdf_dir, pdf_title + '.docx')
-        # print(word_file_path)
-        # with open(word_file_path, 'wb') as temp_file:
-        #     temp_file.write(file_content.read())
-        # print(file_name)
-        # try:
-        #     word = win32com.client.Dispatch('Word.Application')
-        #     doc = word.Documents.Open(word_file_path)
-        #     doc.SaveAs(os.path.join(word_to_pdf_dir, pdf_title + '.pdf'), FileFormat=17)  # 17 - это формат PDF
+        # COM-библиотеки есть только в Windows, поэтому импортируются при вызове
+        import pythoncom
+        import win32com.client
+
         pythoncom.CoInitialize()
 
         word_to_pdf_dir = os.path.join(settings.MEDIA_ROOT, 'word_to_pdf')
@@ -261,7 +413,8 @@ class WordToPdfConverter(DocumentConverter):
 
         # Создаем временный файл (он удалится после закрытия)
         with NamedTemporaryFile(delete=False, suffix=".docx") as temp_file:
-            temp_file.write(request.FILES.get('file_content').read())  # Записываем файл
+            for chunk in request.FILES.get('file_content').chunks():  # Записываем файл по частям
+                temp_file.write(chunk)
             temp_file_path = temp_file.name  # Получаем путь к файлу
 
         try:
@@ -286,7 +439,9 @@ class WordToPdfConverter(DocumentConverter):
             pythoncom.CoUninitialize()
 
     def convert(self, file_name, request):
-        if self.use_v2_generation:
+        if self.backend == self.BACKEND_OFFICE:
+            return self.convert_word_to_pdf_office(file_name, request)
+        if self.backend == self.BACKEND_WORD:
             return self.convert_word_to_pdf_v2(file_name, request)
 
         return self.convert_word_to_pdf(file_name, request)
@@ -295,9 +450,12 @@ class WordToPdfConverter(DocumentConverter):
 class ImageToGrayscaleConverter(DocumentConverter):
     """Конвертер изображений в черно-белый формат с возможностью сохранения в PDF"""
 
+    BATCH_EXECUTOR = 'process'
     JPEG_QUALITY = 95
     PDF_RESOLUTION = 300  # DPI
     DEFAULT_IMAGE_FORMAT = 'JPEG'
+    # Для PDF изображение больше листа уменьшается до размера листа при PDF_RESOLUTION
+    MAX_PAGE_SIZE = PAGE_SIZE_A4  # дюймы
 
     def __init__(self):
         super().__init__()
@@ -318,10 +476,12 @@ class ImageToGrayscaleConverter(DocumentConverter):
         self._validate_request(request)
 
         image_file = request.FILES['file_content']
-        image = self._process_image(image_file)
+        convert_to_pdf = self._should_convert_to_pdf(request)
+        max_size = page_pixels(self.MAX_PAGE_SIZE, self.PDF_RESOLUTION) if convert_to_pdf else None
+        image = self._process_image(image_file, max_size)
         output_buffer = BytesIO()
 
-        if self._should_convert_to_pdf(request):
+        if convert_to_pdf:
             self._save_as_pdf(image, output_buffer)
             content_type = 'application/pdf'
             file_extension = 'pdf'
@@ -347,10 +507,10 @@ class ImageToGrayscaleConverter(DocumentConverter):
             raise ValueError(f'Неподдерживаемый формат файла: {content_type}')
 
     @staticmethod
-    def _process_image(image_file) -> Image.Image:
-        """Обрабатывает и конвертирует изображение"""
+    def _process_image(image_file, max_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Декодирует изображение сразу в оттенках серого и не больше max_size"""
         try:
-            return Image.open(image_file).convert('L')
+            return load_image(image_file, max_size, mode='L')
         except IOError as e:
             raise ValueError('Невозможно открыть изображение') from e
 
@@ -399,6 +559,7 @@ class ImageToGrayscaleConverter(DocumentConverter):
 class PngToJpgConverter(DocumentConverter):
     """Конвертер PNG изображений в JPEG формат с поддержкой прозрачности и валидацией"""
 
+    BATCH_EXECUTOR = 'process'
     SUPPORTED_MIME_TYPES = {'image/png', 'image/x-png'}
     DEFAULT_QUALITY = 95
     OUTPUT_FORMAT = 'JPEG'
@@ -493,6 +654,7 @@ class PngToJpgConverter(DocumentConverter):
 class BmpToJpgConverter(DocumentConverter):
     """Конвертер BMP изображений в JPEG формат с валидацией и обработкой ошибок"""
 
+    BATCH_EXECUTOR = 'process'
     SUPPORTED_MIME_TYPES = {'image/bmp', 'image/x-ms-bmp'}
     DEFAULT_QUALITY = 95
     OUTPUT_FORMAT = 'JPEG'
@@ -574,65 +736,381 @@ class BmpToJpgConverter(DocumentConverter):
 
 
 class ImageToDistortConverter(DocumentConverter):
-    """"""
+    """Конвертер изображений с эффектами искажения (закручивание, бочка, перспектива)"""
+
+    BATCH_EXECUTOR = 'process'
+    SUPPORTED_MIME_TYPES = {'image/jpeg', 'image/png', 'image/bmp'}
+    DEFAULT_EFFECT = 'swirl'
+    JPEG_QUALITY = 95
+    PDF_RESOLUTION = 300  # DPI
 
     def __init__(self):
         super().__init__()
 
-    def convert(self, file_name, request):
-        image = request.FILES.get('file_content')
-        print(image, request.FILES)
-        uploaded_file = request.FILES.get('file_content')
-        file_bytes = uploaded_file.read()
-
-        # Используем Wand для работы с изображением
-        # with WandImage(blob=file_bytes) as img:
-        #     # При необходимости переводим в оттенки серого
-        #     img.type = 'grayscale'
-        #
-        #     # Подготавливаем аргументы для перспективного искажения
-        #     distort_args = [
-        #         0, 0, 20, 10,  # Верхний левый: из (0, 0) в (20, 10)
-        #         img.width, 0, img.width - 20, 15,  # Верхний правый
-        #         img.width, img.height, img.width - 15, img.height - 20,  # Нижний правый
-        #         0, img.height, 10, img.height - 10  # Нижний левый
-        #     ]
-        #
-        #     # Применяем перспективное искажение
-        #     img.distort('perspective', distort_args, bestfit=False)
-        #
-        #     # Получаем PDF в виде blob'а
-        #     pdf_blob = img.make_blob(format='pdf')
-
-        # image = Image.open(image).convert('L')
-        #
-        # strength = 5
-        # radius = 200
-        # width, height = image.size
-        # cx, cy = width / 2, height / 2
-        # new_img = Image.new("RGB", (width, height))
-        #
-        # for x in range(width):
-        #     for y in range(height):
-        #         dx = x - cx
-        #         dy = y - cy
-        #         distance = math.sqrt(dx ** 2 + dy ** 2)
-        #         if distance < radius:
-        #             # Вычисляем угол с учетом эффекта закручивания
-        #             angle = math.atan2(dy, dx) + strength * (radius - distance) / radius
-        #             new_x = int(cx + distance * math.cos(angle))
-        #             new_y = int(cy + distance * math.sin(angle))
-        #             if 0 <= new_x < width and 0 <= new_y < height:
-        #                 new_img.putpixel((x, y), image.getpixel((new_x, new_y)))
-        #         else:
-        #             new_img.putpixel((x, y), image.getpixel((x, y)))
-        #
-        # pdf_buffer = BytesIO()
-        # image.save(pdf_buffer, format="PDF", save_all=True)
-        # pdf_file = pdf_buffer.getvalue()
+    def convert(self, file_name: str, request) -> SimpleUploadedFile:
+        """
+        Искажает изображение выбранным эффектом
+
+        Карта координат вычисляется NumPy по сетке узлов и кэшируется по размеру
+        изображения и параметрам эффекта, пиксели переносит Image.transform.
+
+        Args:
+            file_name: Исходное имя файла
+            request: Объект запроса с изображением в file_content, эффектом в effect
+                и силой искажения в strength
+
+        Returns:
+            SimpleUploadedFile: Искаженное изображение (PNG для PNG, иначе JPEG) или PDF
+
+        Raises:
+            ValueError: При ошибках валидации
+            RuntimeError: При ошибках обработки изображения
+        """
+        from convertors.distortion import distort
+
+        image_file = self._validate_request(request)
+        effect, strength = self._get_effect(request)
+
+        try:
+            with Image.open(image_file) as image:
+                source_format = image.format
+                if image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGB')
+                result = distort(image, effect, strength)
+        except IOError as e:
+            raise ValueError('Невозможно открыть изображение') from e
+
+        buffer = BytesIO()
+        if request.POST.get('convert_to_pdf') == 'on':
+            result.convert('RGB').save(buffer, format='PDF', resolution=self.PDF_RESOLUTION)
+            extension, content_type = 'pdf', 'application/pdf'
+        elif source_format == 'PNG':
+            result.save(buffer, format='PNG')
+            extension, content_type = 'png', 'image/png'
+        else:
+            result.convert('RGB').save(buffer, format='JPEG', quality=self.JPEG_QUALITY)
+            extension, content_type = 'jpg', 'image/jpeg'
+
         return SimpleUploadedFile(
-            file_name,
-            'pdf_blob',
-            content_type='application/pdf',
+            name=f"{file_name.rsplit('.', 1)[0]}.{extension}",
+            content=buffer.getvalue(),
+            content_type=content_type,
         )
 
+    def _validate_request(self, request):
+        """Проверяет наличие и MIME-тип изображения"""
+        image_file = request.FILES.get(self.SOURCE_FIELD)
+        if not image_file:
+            raise ValueError('Отсутствует файл изображения')
+
+        if image_file.content_type not in self.SUPPORTED_MIME_TYPES:
+            raise ValueError(f'Неподдерживаемый формат файла: {image_file.content_type}')
+
+        return image_file
+
+    def _get_effect(self, request) -> Tuple[str, float]:
+        """Возвращает эффект и силу искажения, ограниченную допустимым диапазоном"""
+        from convertors.distortion import DISTORTIONS
+
+        effect = request.POST.get('effect') or self.DEFAULT_EFFECT
+        if effect not in DISTORTIONS:
+            raise ValueError(f'Неизвестный эффект искажения: {effect}')
+
+        _, default_strength, (minimum, maximum) = DISTORTIONS[effect]
+        try:
+            strength = float(request.POST.get('strength') or default_strength)
+        except ValueError:
+            raise ValueError('Сила искажения должна быть числом')
+        if not math.isfinite(strength):
+            raise ValueError('Сила искажения должна быть конечным числом')
+
+        return effect, round(min(max(strength, minimum), maximum), 3)
+
+
+class PdfTextSpan(NamedTuple):
+    text: str
+    size: float
+    bold: bool
+    italic: bool
+    color: int
+
+
+class PdfTextBlock(NamedTuple):
+    bbox: Tuple[float, float, float, float]
+    lines: List[List[PdfTextSpan]]
+
+
+class PdfImageBlock(NamedTuple):
+    bbox: Tuple[float, float, float, float]
+    image: bytes
+
+
+class PdfPage(NamedTuple):
+    number: int
+    width: float
+    height: float
+    blocks: List[Union[PdfTextBlock, PdfImageBlock]]
+
+
+# Флаги фрагментов текста PyMuPDF
+PDF_SPAN_ITALIC = 2
+PDF_SPAN_BOLD = 16
+
+# Открытый PDF исполнителя: документ не переоткрывается для каждой страницы.
+# Закрывается при разборе следующего PDF этим же исполнителем.
+_pdf_documents = threading.local()
+
+
+def _open_pdf(path: str):
+    import pymupdf
+
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    cached = getattr(_pdf_documents, 'cached', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    if cached is not None:
+        cached[1].close()
+    document = pymupdf.open(path)
+    _pdf_documents.cached = (key, document)
+    return document
+
+
+def extract_pdf_page(path: str, number: int) -> PdfPage:
+    """
+    Извлекает фрагменты текста, изображения и их положение на странице PDF
+
+    Функция вынесена на уровень модуля, чтобы ее можно было выполнять в пуле процессов.
+    Изображения перекодируются в PNG, если python-docx не сможет их вставить.
+
+    Args:
+        path: Путь к PDF-файлу
+        number: Номер страницы, начиная с нуля
+
+    Returns:
+        PdfPage: Блоки страницы в порядке чтения
+    """
+    import pymupdf
+
+    page = _open_pdf(path)[number]
+    content = page.get_text('dict', flags=pymupdf.TEXTFLAGS_DICT, sort=True)
+
+    blocks = []
+    for block in content['blocks']:
+        bbox = tuple(block['bbox'])
+        if block['type'] == 1:
+            image = block['image']
+            if block.get('ext') not in ('png', 'jpeg', 'jpg', 'bmp', 'gif'):
+                image = pymupdf.Pixmap(image).tobytes('png')
+            blocks.append(PdfImageBlock(bbox, image))
+            continue
+
+        lines = [
+            [
+                PdfTextSpan(
+                    text=span['text'],
+                    size=round(span['size'], 1),
+                    bold=bool(span['flags'] & PDF_SPAN_BOLD),
+                    italic=bool(span['flags'] & PDF_SPAN_ITALIC),
+                    color=span['color'],
+                )
+                for span in line['spans']
+                if span['text']
+            ]
+            for line in block['lines']
+        ]
+        if any(lines):
+            blocks.append(PdfTextBlock(bbox, [line for line in lines if line]))
+
+    return PdfPage(number, page.rect.width, page.rect.height, blocks)
+
+
+class PdfToWordConverter(DocumentConverter):
+    """Конвертер PDF-документов в DOCX с постраничным извлечением текста и изображений"""
+
+    OUTPUT_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    PDF_SIGNATURE = b'%PDF-'
+    PAGE_MARGIN = 36  # pt
+    # Максимальный отступ между блоками, переносимый в документ, pt
+    MAX_BLOCK_GAP = 72
+
+    def __init__(self):
+        super().__init__()
+        self._parallel = settings.PDF_TO_WORD_PARALLEL
+
+    def convert(self, file_name: str, request) -> UploadedFile:
+        """
+        Конвертирует PDF в DOCX
+
+        Страницы разбираются в пуле исполнителей, одновременно в обработке
+        находится не больше WINDOW страниц, результаты добавляются
+        в документ в исходном порядке по мере готовности.
+
+        Args:
+            file_name: Базовое имя для выходного файла
+            request: Объект запроса с PDF-файлом в file_content
+
+        Returns:
+            UploadedFile: Результирующий DOCX-документ во временном файле
+
+        Raises:
+            ValueError: При отсутствии файла или некорректном PDF
+            RuntimeError: При ошибках формирования документа
+        """
+        pdf_file = request.FILES.get(self.SOURCE_FIELD)
+        if not pdf_file:
+            raise ValueError('Отсутствует PDF-файл для конвертации')
+
+        with self._source_path(pdf_file) as path:
+            page_count = self._count_pages(path)
+            return self._create_docx(file_name, self._load_pages(path, page_count))
+
+    @contextmanager
+    def _source_path(self, pdf_file) -> Iterator[str]:
+        """Путь к исходному PDF на диске: исполнителям передается путь, а не содержимое"""
+        if pdf_file.read(len(self.PDF_SIGNATURE)) != self.PDF_SIGNATURE:
+            raise ValueError('Файл не является PDF-документом')
+        pdf_file.seek(0)
+
+        if hasattr(pdf_file, 'temporary_file_path'):
+            yield pdf_file.temporary_file_path()
+            return
+
+        with NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+            for chunk in pdf_file.chunks():
+                temp_file.write(chunk)
+
+        try:
+            yield temp_file.name
+        finally:
+            os.remove(temp_file.name)
+
+    @staticmethod
+    def _count_pages(path: str) -> int:
+        import pymupdf
+
+        try:
+            with pymupdf.open(path) as document:
+                if document.needs_pass:
+                    raise ValueError('PDF-документ защищен паролем')
+                page_count = document.page_count
+        except (pymupdf.FileDataError, RuntimeError) as e:
+            raise ValueError('Некорректный PDF-файл') from e
+
+        if not page_count:
+            raise ValueError('PDF-документ не содержит страниц')
+        return page_count
+
+    def _load_pages(self, path: str, page_count: int) -> Iterator[PdfPage]:
+        """
+        Разбирает страницы в исходном порядке, в пуле - не больше WINDOW одновременно
+
+        Если пул исполнителей не удается запустить, страницы разбираются последовательно.
+        """
+        if not self._parallel['ENABLED'] or page_count == 1:
+            for number in range(page_count):
+                yield extract_pdf_page(path, number)
+            return
+
+        window = self._parallel['WINDOW']
+        pending = deque()
+        try:
+            executor = get_executor(self._parallel['EXECUTOR'], self._parallel['WORKERS'])
+        except (AssertionError, OSError, NotImplementedError):
+            executor = None
+
+        try:
+            for number in range(page_count):
+                if executor is not None:
+                    try:
+                        pending.append(executor.submit(extract_pdf_page, path, number))
+                    except (AssertionError, OSError, RuntimeError):
+                        # Пул не запустился (например, в демоническом воркере Celery prefork
+                        # нельзя порождать процессы), оставшиеся страницы разбираются здесь
+                        executor = None
+
+                if executor is None:
+                    while pending:
+                        yield pending.popleft().result()
+                    yield extract_pdf_page(path, number)
+                elif len(pending) >= window:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for page in pending:
+                page.cancel()
+
+    def _create_docx(self, original_name: str, pages: Iterable[PdfPage]) -> UploadedFile:
+        """Добавляет страницы в документ по мере их разбора и сохраняет его во временный файл"""
+        import docx
+
+        document = docx.Document()
+        for page in pages:
+            try:
+                self._add_page(document, page)
+            except Exception as e:
+                raise RuntimeError(f'Ошибка формирования страницы {page.number + 1}') from e
+
+        output_file = TemporaryUploadedFile(
+            name=f"{original_name.rsplit('.', 1)[0]}.docx",
+            content_type=self.OUTPUT_CONTENT_TYPE,
+            size=0,
+            charset=None,
+        )
+        try:
+            document.save(output_file)
+        except Exception as e:
+            output_file.close()
+            raise RuntimeError('Ошибка сохранения DOCX') from e
+
+        output_file.size = output_file.tell()
+        output_file.seek(0)
+        return output_file
+
+    def _add_page(self, document, page: PdfPage) -> None:
+        from docx.shared import Pt
+
+        if page.number == 0:
+            section = document.sections[0]
+            section.page_width, section.page_height = Pt(page.width), Pt(page.height)
+            for side in ('left_margin', 'right_margin', 'top_margin', 'bottom_margin'):
+                setattr(section, side, Pt(self.PAGE_MARGIN))
+
+        first_paragraph = None
+        previous_bottom = self.PAGE_MARGIN
+        for block in page.blocks:
+            x0, y0, x1, y1 = block.bbox
+            paragraph = document.add_paragraph()
+            paragraph_format = paragraph.paragraph_format
+            paragraph_format.left_indent = Pt(max(x0 - self.PAGE_MARGIN, 0))
+            paragraph_format.space_before = Pt(min(max(y0 - previous_bottom, 0), self.MAX_BLOCK_GAP))
+            paragraph_format.space_after = Pt(0)
+            previous_bottom = max(previous_bottom, y1)
+
+            if isinstance(block, PdfImageBlock):
+                paragraph.add_run().add_picture(BytesIO(block.image), width=Pt(max(x1 - x0, 1)))
+            else:
+                self._add_text(paragraph, block)
+            first_paragraph = first_paragraph or paragraph
+
+        if page.number > 0:
+            # Пустая страница сохраняется как пустой абзац с разрывом
+            (first_paragraph or document.add_paragraph()).paragraph_format.page_break_before = True
+
+    @staticmethod
+    def _add_text(paragraph, block: PdfTextBlock) -> None:
+        from docx.shared import Pt, RGBColor
+
+        for line_number, line in enumerate(block.lines):
+            if line_number:
+                paragraph.runs[-1].add_break()
+            for span in line:
+                run = paragraph.add_run(span.text)
+                run.bold = span.bold or None
+                run.italic = span.italic or None
+                run.font.size = Pt(span.size)
+                if span.color:
+                    run.font.color.rgb = RGBColor.from_string(f'{span.color:06X}')
@@ -0,0 +1,254 @@
+import base64
+from html import escape
+from typing import BinaryIO, Iterator, List, Optional
+
+import docx
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.table import Table, _Cell
+from docx.text.hyperlink import Hyperlink
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+# Размер в EMU (English Metric Unit) одного пикселя при 96 dpi
+EMU_PER_PIXEL = 9525
+ALIGNMENTS = {
+    WD_ALIGN_PARAGRAPH.CENTER: 'center',
+    WD_ALIGN_PARAGRAPH.RIGHT: 'right',
+    WD_ALIGN_PARAGRAPH.JUSTIFY: 'justify',
+}
+LIST_STYLES = {
+    'List Bullet': 'ul',
+    'List Number': 'ol',
+}
+
+
+class DocxHtmlRenderer:
+    """
+    Преобразует DOCX в HTML без промежуточных файлов.
+
+    Тело документа обходится в исходном порядке: абзацы с форматированием
+    фрагментов текста, заголовки, списки, таблицы (в том числе вложенные
+    и с объединенными ячейками), встроенные изображения и колонтитулы.
+    HTML отдается генератором фрагментов и собирается одним join.
+    """
+
+    DEFAULT_CSS = (
+        'body { padding: 0; font-family: Arial, sans-serif; } '
+        '@page { margin: 40px; } '
+        'p { margin: 0 0 8px 0; } '
+        'table { border-collapse: collapse; margin: 0 0 8px 0; } '
+        'td { border: 1px solid #000; padding: 4px; vertical-align: top; } '
+        'header, footer { color: #555; font-size: 0.9em; } '
+        'img { max-width: 100%; }'
+    )
+
+    def __init__(self):
+        self._style_names = {}
+
+    def render(self, source: BinaryIO) -> str:
+        """
+        Возвращает HTML-документ для DOCX-файла
+
+        :param source: DOCX-файл или файлоподобный объект
+        :raises ValueError: Если файл не является корректным DOCX
+        """
+        try:
+            document = docx.Document(source)
+        except Exception as e:
+            raise ValueError('Некорректный DOCX-файл') from e
+
+        return ''.join(self.iter_html(document))
+
+    def iter_html(self, document) -> Iterator[str]:
+        # Paragraph.style ищет стиль по всей таблице стилей при каждом обращении,
+        # поэтому имена стилей по id собираются один раз на документ
+        self._style_names = {style.style_id: style.name for style in document.styles}
+
+        yield f'<html><head><meta charset="UTF-8"><style>{self.DEFAULT_CSS}</style></head><body>'
+
+        section = document.sections[0] if document.sections else None
+        if section is not None and not section.header.is_linked_to_previous:
+            yield '<header>'
+            yield from self._iter_blocks(section.header.iter_inner_content())
+            yield '</header>'
+
+        yield from self._iter_blocks(document.iter_inner_content())
+
+        if section is not None and not section.footer.is_linked_to_previous:
+            yield '<footer>'
+            yield from self._iter_blocks(section.footer.iter_inner_content())
+            yield '</footer>'
+
+        yield '</body></html>'
+
+    def _iter_blocks(self, blocks) -> Iterator[str]:
+        """Абзацы и таблицы; соседние абзацы списков объединяются в ul/ol"""
+        open_list = None
+        for block in blocks:
+            list_tag = self._list_tag(block)
+
+            if open_list and list_tag != open_list:
+                yield f'</{open_list}>'
+                open_list = None
+            if list_tag and not open_list:
+                yield f'<{list_tag}>'
+                open_list = list_tag
+
+            if isinstance(block, Table):
+                yield from self._iter_table(block)
+            elif list_tag:
+                yield '<li>'
+                yield from self._iter_inline(block)
+                yield '</li>'
+            else:
+                yield from self._iter_paragraph(block)
+
+        if open_list:
+            yield f'</{open_list}>'
+
+    def _style_name(self, paragraph: Paragraph) -> str:
+        style_id = paragraph._p.style
+        return self._style_names.get(style_id, '') if style_id else ''
+
+    def _list_tag(self, block) -> Optional[str]:
+        if not isinstance(block, Paragraph):
+            return None
+        return LIST_STYLES.get(self._style_name(block))
+
+    def _iter_paragraph(self, paragraph: Paragraph) -> Iterator[str]:
+        tag = self._paragraph_tag(paragraph)
+        alignment = ALIGNMENTS.get(paragraph.alignment)
+        yield f'<{tag} style="text-align: {alignment}">' if alignment else f'<{tag}>'
+        yield from self._iter_inline(paragraph)
+        yield f'</{tag}>'
+
+    def _paragraph_tag(self, paragraph: Paragraph) -> str:
+        style_name = self._style_name(paragraph)
+        if style_name == 'Title':
+            return 'h1'
+        if style_name.startswith('Heading '):
+            level = style_name.rsplit(' ', 1)[-1]
+            if level.isdigit():
+                return f'h{min(max(int(level), 1), 6)}'
+        return 'p'
+
+    def _iter_inline(self, paragraph: Paragraph) -> Iterator[str]:
+        empty = True
+        for item in paragraph.iter_inner_content():
+            if isinstance(item, Hyperlink):
+                url = item.url
+                yield f'<a href="{escape(url)}">' if url else '<a>'
+                for run in item.runs:
+                    yield from self._iter_run(run)
+                yield '</a>'
+            else:
+                yield from self._iter_run(item)
+            empty = False
+
+        if empty:
+            # Пустой абзац сохраняет вертикальный отступ, как в Word
+            yield '&nbsp;'
+
+    def _iter_run(self, run: Run) -> Iterator[str]:
+        yield from self._run_images(run)
+
+        text = run.text
+        if not text:
+            return
+
+        styles = []
+        font = run.font
+        if font.size is not None:
+            styles.append(f'font-size: {font.size.pt:g}pt')
+        if font.color is not None and font.color.type is not None and font.color.rgb is not None:
+            styles.append(f'color: #{font.color.rgb}')
+        if font.highlight_color is not None:
+            styles.append('background-color: yellow')
+
+        opening, closing = [], []
+        for enabled, tag in (
+            (run.bold, 'b'),
+            (run.italic, 'i'),
+            (run.underline, 'u'),
+            (font.strike, 's'),
+            (font.superscript, 'sup'),
+            (font.subscript, 'sub'),
+        ):
+            if enabled:
+                opening.append(f'<{tag}>')
+                closing.insert(0, f'</{tag}>')
+
+        if styles:
+            style = '; '.join(styles)
+            opening.insert(0, f'<span style="{style}">')
+            closing.append('</span>')
+
+        yield ''.join(opening)
+        yield escape(text).replace('\n', '<br>').replace('\t', '&emsp;')
+        yield ''.join(closing)
+
+    @staticmethod
+    def _run_images(run: Run) -> List[str]:
+        """Встроенные изображения фрагмента в виде data URI"""
+        images = []
+        for inline in run.element.iter(qn('wp:inline'), qn('wp:anchor')):
+            blip = next(inline.iter(qn('a:blip')), None)
+            relationship_id = blip.get(qn('r:embed')) if blip is not None else None
+            if not relationship_id or relationship_id not in run.part.related_parts:
+                continue
+
+            image_part = run.part.related_parts[relationship_id]
+            extent = inline.find(qn('wp:extent'))
+            size = ''
+            if extent is not None:
+                width = int(extent.get('cx', 0)) // EMU_PER_PIXEL
+                height = int(extent.get('cy', 0)) // EMU_PER_PIXEL
+                size = f' width="{width}" height="{height}"'
+
+            data = base64.b64encode(image_part.blob).decode('ascii')
+            images.append(f'<img src="data:{image_part.content_type};base64,{data}"{size}>')
+        return images
+
+    def _iter_table(self, table: Table) -> Iterator[str]:
+        rows = self._table_grid(table)
+        yield '<table>'
+        for row_index, row in enumerate(rows):
+            yield '<tr>'
+            for column, tc, span in row:
+                if tc.vMerge == 'continue':
+                    continue
+
+                attributes = f' colspan="{span}"' if span > 1 else ''
+                rowspan = self._rowspan(rows, row_index, column) if tc.vMerge == 'restart' else 1
+                if rowspan > 1:
+                    attributes += f' rowspan="{rowspan}"'
+
+                yield f'<td{attributes}>'
+                yield from self._iter_blocks(_Cell(tc, table).iter_inner_content())
+                yield '</td>'
+            yield '</tr>'
+        yield '</table>'
+
+    @staticmethod
+    def _table_grid(table: Table):
+        """Ячейки строк с номером начальной колонки сетки и шириной в колонках"""
+        rows = []
+        for tr in table._tbl.tr_lst:
+            row, column = [], 0
+            for tc in tr.tc_lst:
+                span = tc.grid_span
+                row.append((column, tc, span))
+                column += span
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _rowspan(rows, row_index: int, column: int) -> int:
+        rowspan = 1
+        for row in rows[row_index + 1:]:
+            tc = next((tc for start, tc, _ in row if start == column), None)
+            if tc is None or tc.vMerge != 'continue':
+                break
+            rowspan += 1
+        return rowspan
@@ -0,0 +1,39 @@
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTOR_KINDS = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(kind: str, workers: int) -> Executor:
+    """
+    Возвращает общий пул исполнителей для конвертеров
+
+    Пулы создаются один раз на процесс и переиспользуются между запросами.
+    Сломанный пул (например, после аварийного завершения процесса-исполнителя)
+    заменяется новым.
+
+    :param kind: Тип пула: 'process' или 'thread'
+    :param workers: Количество исполнителей
+    :return: Пул исполнителей
+    """
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f'Неизвестный тип пула исполнителей: {kind}')
+
+    key = (kind, workers, os.getpid())
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is not None and getattr(executor, '_broken', False):
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+        if executor is None:
+            executor = EXECUTOR_KINDS[kind](max_workers=workers)
+            _executors[key] = executor
+
+        return executor
@@ -0,0 +1,219 @@
+import os
+import resource
+import shlex
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from convertors.benchmarks import PeakMemory, percentile
+from convertors.document_converters import HtmlToPdfConverter
+from convertors.wkhtmltopdf_pool import get_pdf_pool, reset_pdf_pool
+
+# Документы корпуса: имя и количество страниц (0 - счет на одну страницу)
+CORPUS = {
+    'invoice': 0,
+    'report-10': 10,
+    'report-100': 100,
+    'report-500': 500,
+}
+WORDS = (
+    'договор поставка оплата счет акт сверка остаток период сумма налог '
+    'исполнитель заказчик срок условие приложение подпись печать реестр'
+).split()
+
+
+def _text(seed: int, words: int) -> str:
+    return ' '.join(WORDS[(seed * 7 + index * 13) % len(WORDS)] for index in range(words))
+
+
+def generate_html(name: str) -> str:
+    """
+    Синтетический HTML-документ корпуса
+
+    Счет - одна страница с реквизитами и таблицей позиций, отчет - заданное количество
+    страниц с заголовками, абзацами и таблицами (около 3 КБ HTML на страницу).
+    """
+    pages = CORPUS[name]
+    parts = [
+        '<html><head><style>'
+        'table { width: 100%; border-collapse: collapse; } '
+        'td, th { border: 1px solid #999; padding: 2px 4px; } '
+        'h2 { page-break-before: always; }'
+        '</style></head><body>'
+    ]
+    if not pages:
+        parts.append(f'<h1>Счет № 42</h1><p>{_text(1, 30)}</p><table><tr><th>Позиция</th><th>Сумма</th></tr>')
+        parts.extend(f'<tr><td>{_text(row, 6)}</td><td>{row * 1250} ₽</td></tr>' for row in range(15))
+        parts.append('</table><p><b>Итого</b>: 150 000 ₽</p>')
+
+    for page in range(pages):
+        parts.append(f'<h2>Раздел {page + 1}</h2>')
+        parts.extend(f'<p>{_text(page + paragraph, 60)}</p>' for paragraph in range(3))
+        parts.append('<table>')
+        parts.extend(
+            f'<tr><td>{page}.{row}</td><td>{_text(row, 4)}</td><td>{row * 100}</td></tr>'
+            for row in range(10)
+        )
+        parts.append('</table>')
+
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def write_stub_renderer(directory: str) -> str:
+    """
+    Создает исполняемый файл, запускающий заглушку wkhtmltopdf текущим интерпретатором
+
+    :param directory: Директория для файла
+    :return: Путь, который можно передать в WKHTMLTOPDF_PATH
+    """
+    path = os.path.join(directory, 'wkhtmltopdf-stub')
+    with open(path, 'w') as script:
+        script.write(
+            '#!/bin/sh\n'
+            f'PYTHONPATH={shlex.quote(str(settings.BASE_DIR))}${{PYTHONPATH:+:$PYTHONPATH}} '
+            f'exec {shlex.quote(sys.executable)} -m convertors.wkhtmltopdf_stub "$@"\n'
+        )
+    os.chmod(path, 0o755)
+    return path
+
+
+class RendererMemorySampler(threading.Thread):
+    """
+    Периодически читает пиковый RSS (VmHWM) процессов пула wkhtmltopdf
+
+    Работает только в Linux, в остальных системах peak_mb остается None.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb: Optional[int] = None
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        for pid in get_pdf_pool().pids:
+            try:
+                with open(f'/proc/{pid}/status') as status:
+                    for line in status:
+                        if line.startswith('VmHWM:'):
+                            self.peak_kb = max(self.peak_kb or 0, int(line.split()[1]))
+            except OSError:
+                continue
+
+    def stop(self) -> Optional[float]:
+        self.sample()
+        self._stop_event.set()
+        self.join()
+        return round(self.peak_kb / 1024, 1) if self.peak_kb is not None else None
+
+
+def _cpu_seconds(who: int) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure_prepare(html: str, iterations: int = 5) -> Dict:
+    """Время подготовки HTML (подстановка CSS регулярным выражением) без рендеринга"""
+    converter = HtmlToPdfConverter()
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        converter._prepare_html_content(html)
+    elapsed = (time.perf_counter() - started_at) / iterations
+    return {
+        'prepare_ms': round(elapsed * 1000, 3),
+        'prepare_mb_per_s': round(len(html.encode()) / elapsed / 2 ** 20, 1) if elapsed else None,
+    }
+
+
+def run_load(html: str, requests: int, concurrency: int, warmup: int = 0, unique: bool = True) -> Dict:
+    """
+    Отправляет запросы в HtmlToPdfConvertView тестовым клиентом Django из нескольких потоков
+
+    Пул wkhtmltopdf пересоздается перед прогоном и останавливается после него,
+    поэтому время процессора рендерера берется из RUSAGE_CHILDREN завершенных процессов.
+
+    :param html: HTML-документ
+    :param requests: Количество измеряемых запросов
+    :param concurrency: Количество одновременных клиентов
+    :param warmup: Количество запросов для запуска процессов пула до измерений
+    :param unique: Добавлять в каждый документ уникальный комментарий, чтобы не попадать в кэш конвертаций
+    :return: Пропускная способность, задержки, статусы ответов, процессор и память
+    """
+    url = reverse('api_html_to_pdf')
+    clients = threading.local()
+
+    def send(number: int):
+        client = getattr(clients, 'client', None)
+        if client is None:
+            client = clients.client = Client()
+
+        body = f'{html}<!-- {uuid.uuid4()} -->' if unique else html
+        started_at = time.perf_counter()
+        response = client.post(url, {'file_content': body, 'file_name': f'bench-{number}'})
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return time.perf_counter() - started_at, response.status_code, len(content)
+
+    reset_pdf_pool()
+    children_cpu = _cpu_seconds(resource.RUSAGE_CHILDREN)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(warmup)))
+
+        sampler = RendererMemorySampler()
+        sampler.start()
+        memory = PeakMemory()
+        memory.reset()
+        app_cpu = _cpu_seconds(resource.RUSAGE_SELF)
+        started_at = time.perf_counter()
+        results = list(executor.map(send, range(requests)))
+        wall_time = time.perf_counter() - started_at
+        app_cpu = _cpu_seconds(resource.RUSAGE_SELF) - app_cpu
+        renderer_peak_rss = sampler.stop()
+        peak_rss = memory.peak_mb()
+
+    reset_pdf_pool()
+    renderer_cpu = _cpu_seconds(resource.RUSAGE_CHILDREN) - children_cpu
+
+    latencies = [elapsed for elapsed, _, _ in results]
+    sizes = [size for _, status, size in results if status == 200]
+    return {
+        'html_size': len(html.encode()),
+        'requests': requests,
+        'concurrency': concurrency,
+        'status_counts': dict(Counter(str(status) for _, status, _ in results)),
+        'requests_per_s': round(requests / wall_time, 2),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'output_size': round(sum(sizes) / len(sizes)) if sizes else None,
+        'app_cpu_ms_per_request': round(app_cpu / requests * 1000, 2),
+        # Процессы пула рендерят и прогревочные запросы, поэтому время делится на все запросы
+        'renderer_cpu_ms_per_request': round(renderer_cpu / (requests + warmup) * 1000, 2),
+        'peak_rss_mb': peak_rss,
+        'renderer_peak_rss_mb': renderer_peak_rss,
+    }
+
+
+def run_corpus(names: List[str], requests: int, concurrency: int, warmup: int, unique: bool):
+    """Прогоняет нагрузку по документам корпуса и возвращает пары (имя, результат)"""
+    for name in names:
+        html = generate_html(name)
+        try:
+            result = run_load(html, requests, concurrency, warmup, unique)
+            result.update(measure_prepare(html))
+        except Exception as e:
+            result = {'error': str(e) or e.__class__.__name__}
+        yield name, result
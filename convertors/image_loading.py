@@ -0,0 +1,66 @@
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from utils import metrics
+
+Size = Tuple[int, int]
+
+# Размер листа A4 в дюймах
+PAGE_SIZE_A4 = (8.27, 11.69)
+# Режимы, в которые декодер JPEG умеет переводить изображение при draft
+DRAFT_MODES = {'L', 'RGB'}
+
+
+def page_pixels(page_size: Tuple[float, float], resolution: int) -> Size:
+    """Количество пикселей, которое нужно листу заданного размера в дюймах при разрешении resolution"""
+    return round(page_size[0] * resolution), round(page_size[1] * resolution)
+
+
+def fit_size(size: Size, bounds: Optional[Size]) -> Size:
+    """
+    Размер изображения, вписанного в bounds с сохранением пропорций
+
+    Ориентация bounds подстраивается под изображение, увеличение не выполняется.
+    """
+    if bounds is None:
+        return size
+
+    width, height = size
+    max_width, max_height = sorted(bounds, reverse=width > height)
+    scale = min(max_width / width, max_height / height, 1)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+@metrics.timed('decode')
+def load_image(source, max_size: Optional[Size] = None, mode: Optional[str] = None) -> Image.Image:
+    """
+    Декодирует изображение сразу в нужном размере и цветовом режиме
+
+    JPEG декодируется через draft: декодер масштабирует изображение в 2, 4 или 8 раз
+    и переводит его в оттенки серого без промежуточного полноразмерного RGB.
+    Остальные форматы после декодирования уменьшаются reduce в целое число раз,
+    окончательный размер доводится resize.
+
+    :param source: Файл изображения
+    :param max_size: Максимальный размер результата в пикселях (ориентация не важна)
+    :param mode: Цветовой режим результата
+    :return: Загруженное изображение, не требующее открытого исходного файла
+    """
+    image = Image.open(source)
+    target = fit_size(image.size, max_size)
+
+    if image.format == 'JPEG' and (target != image.size or mode in DRAFT_MODES):
+        image.draft(mode if mode in DRAFT_MODES else None, target)
+    image.load()
+    if mode and image.mode != mode:
+        image = image.convert(mode)
+
+    factor = min(image.width // target[0], image.height // target[1])
+    # Палитровые и битовые изображения reduce не поддерживает, их уменьшает resize
+    if factor > 1 and image.mode not in ('P', '1'):
+        image = image.reduce(factor)
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS)
+
+    return image
@@ -0,0 +1,284 @@
+import atexit
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+from convertors.worker_pool import RendererError, RendererTimeout, WorkerPool
+from utils import metrics
+
+LOCALHOST = '127.0.0.1'
+
+
+def _free_port() -> int:
+    """Возвращает свободный TCP-порт на localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((LOCALHOST, 0))
+        return sock.getsockname()[1]
+
+
+def _port_is_open(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex((LOCALHOST, port)) == 0
+
+
+class OfficeWorker:
+    """
+    Долгоживущий экземпляр headless LibreOffice под управлением unoserver.
+
+    У каждого экземпляра свои порты и свой профиль пользователя, иначе
+    второй soffice передает задачи первому и пул вырождается в один процесс.
+    Процесс запускается в отдельной группе, чтобы при зависании можно было
+    убить и unoserver, и порожденный им soffice.
+    """
+
+    def __init__(self, unoserver: str, unoconvert: str, profile_dir: str, start_timeout: float):
+        self.unoconvert = unoconvert
+        self.port = _free_port()
+        self.uno_port = _free_port()
+        self.profile_dir = profile_dir
+        self.jobs_done = 0
+        self.process = subprocess.Popen(
+            [
+                unoserver,
+                '--interface', LOCALHOST,
+                '--port', str(self.port),
+                '--uno-port', str(self.uno_port),
+                '--user-installation', Path(profile_dir).as_uri(),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self._wait_ready(start_timeout)
+
+    def _wait_ready(self, timeout: float) -> None:
+        """Ждет, пока unoserver начнет принимать подключения"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                raise RendererError('Процесс LibreOffice завершился при запуске')
+            if _port_is_open(self.port):
+                return
+            time.sleep(0.2)
+
+        self.kill()
+        raise RendererTimeout(f'LibreOffice не запустился за {timeout:.0f} с')
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def convert(self, input_path: str, output_path: str, timeout: float) -> None:
+        """
+        Конвертирует файл в PDF на этом экземпляре
+
+        :param input_path: Путь к исходному файлу
+        :param output_path: Путь к PDF-файлу
+        :param timeout: Максимальное время выполнения задачи в секундах
+        :raises RendererTimeout: Если задача не уложилась в отведенное время
+        :raises RendererError: Если LibreOffice вернул ошибку
+        """
+        try:
+            result = subprocess.run(
+                [
+                    self.unoconvert,
+                    '--host', LOCALHOST,
+                    '--port', str(self.port),
+                    '--convert-to', 'pdf',
+                    input_path,
+                    output_path,
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise RendererTimeout(f'Конвертация в LibreOffice превысила {timeout:.0f} с')
+        except OSError as e:
+            raise RendererError('Не удалось запустить unoconvert') from e
+
+        self.jobs_done += 1
+        if result.returncode != 0:
+            message = result.stderr.decode('utf-8', errors='replace').strip().splitlines()
+            raise RendererError(message[-1] if message else f'unoconvert завершился с кодом {result.returncode}')
+
+    def _signal_group(self, sig: int) -> None:
+        try:
+            os.killpg(self.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def kill(self) -> None:
+        """Убивает unoserver вместе с soffice"""
+        self._signal_group(signal.SIGKILL)
+        self.process.wait()
+
+    def stop(self) -> None:
+        """Останавливает процесс, при зависании убивает его"""
+        self._signal_group(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+
+class OfficePool(WorkerPool):
+    """
+    Пул прогретых экземпляров headless LibreOffice для конвертации документов в PDF.
+
+    Задача получает свободный экземпляр, исходный и выходной файлы лежат во
+    временной директории пула. Количество ожидающих задач ограничено,
+    экземпляр, не уложившийся в таймаут, убивается и запускается заново
+    при следующей задаче, а каждый экземпляр пересоздается после
+    max_jobs_per_worker задач, чтобы не накапливать утечки памяти LibreOffice.
+    Запуск экземпляра ограничен start_timeout и не расходует время конвертации.
+    """
+
+    OVERLOADED_MESSAGE = 'Очередь конвертации LibreOffice переполнена'
+    NO_WORKER_MESSAGE = 'Нет свободных экземпляров LibreOffice'
+
+    def __init__(
+        self,
+        unoserver: str,
+        unoconvert: str,
+        workers: int = 2,
+        max_queue: int = 8,
+        job_timeout: float = 120,
+        start_timeout: float = 60,
+        max_jobs_per_worker: int = 100,
+        queue_timeout: Optional[float] = None,
+    ):
+        super().__init__(workers, max_queue, job_timeout, max_jobs_per_worker, queue_timeout)
+        self.unoserver = unoserver
+        self.unoconvert = unoconvert
+        self.start_timeout = start_timeout
+        self.work_dir = tempfile.mkdtemp(prefix='office_pool_')
+
+    def _start_worker(self) -> OfficeWorker:
+        profile_dir = tempfile.mkdtemp(prefix='profile_', dir=self.work_dir)
+        try:
+            return OfficeWorker(self.unoserver, self.unoconvert, profile_dir, self.start_timeout)
+        except BaseException:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+
+    def _stop_worker(self, worker: OfficeWorker, kill: bool = False) -> None:
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        shutil.rmtree(worker.profile_dir, ignore_errors=True)
+
+    def convert_to_file(self, source, suffix: str, retries: int = 1) -> str:
+        """
+        Конвертирует документ в PDF-файл во временной директории пула
+
+        :param source: Загруженный файл с исходным документом
+        :param suffix: Расширение исходного файла, по нему LibreOffice выбирает фильтр импорта
+        :param retries: Количество повторов при падении экземпляра
+        :return: Путь к PDF-файлу, который должен удалить вызывающий код
+        """
+        with self._admit():
+            input_fd, input_path = tempfile.mkstemp(suffix=suffix, dir=self.work_dir)
+            output_path = os.path.splitext(input_path)[0] + '.pdf'
+            try:
+                with os.fdopen(input_fd, 'wb') as input_file:
+                    for chunk in source.chunks():
+                        input_file.write(chunk)
+
+                for attempt in range(retries + 1):
+                    with metrics.stage('render_queue'):
+                        worker = self._acquire_worker(time.monotonic() + self.queue_timeout)
+                    try:
+                        with metrics.stage('render'):
+                            worker.convert(input_path, output_path, timeout=self.job_timeout)
+                    except RendererTimeout:
+                        self._discard(worker, kill=True)
+                        raise
+                    except RendererError:
+                        if worker.is_alive():
+                            # Ошибка живого экземпляра означает некорректный документ, повтор не поможет
+                            self._release_worker(worker)
+                            raise
+
+                        self._discard(worker)
+                        if attempt == retries:
+                            raise
+                        continue
+
+                    self._release_worker(worker)
+                    break
+            except BaseException:
+                self._remove(output_path)
+                raise
+            finally:
+                self._remove(input_path)
+
+        if not os.path.exists(output_path) or not os.path.getsize(output_path):
+            self._remove(output_path)
+            raise RendererError('LibreOffice не создал PDF-файл')
+
+        return output_path
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Останавливает все экземпляры пула"""
+        for worker in self._take_all_workers():
+            worker.stop()
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_office_pool() -> OfficePool:
+    """Возвращает пул LibreOffice текущего процесса, создавая его при первом обращении"""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        # После fork (например, в воркерах Celery) процессы родителя недоступны
+        if _pool is None or _pool_pid != os.getpid():
+            pool_settings = settings.OFFICE_POOL
+            _pool = OfficePool(
+                unoserver=pool_settings['UNOSERVER_PATH'],
+                unoconvert=pool_settings['UNOCONVERT_PATH'],
+                workers=pool_settings['WORKERS'],
+                max_queue=pool_settings['MAX_QUEUE'],
+                job_timeout=pool_settings['JOB_TIMEOUT'],
+                start_timeout=pool_settings['START_TIMEOUT'],
+                max_jobs_per_worker=pool_settings['MAX_JOBS_PER_WORKER'],
+                queue_timeout=pool_settings['QUEUE_TIMEOUT'],
+            )
+            _pool_pid = os.getpid()
+
+        return _pool
+
+
+@atexit.register
+def _close_pool() -> None:
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
@@ -0,0 +1,119 @@
+from typing import BinaryIO, List, NamedTuple
+
+POINTS_PER_INCH = 72
+COLOR_SPACES = {
+    'RGB': '/DeviceRGB',
+    'L': '/DeviceGray',
+}
+
+
+class JpegPage(NamedTuple):
+    """Страница PDF, представленная JPEG-изображением"""
+    data: bytes
+    width: int
+    height: int
+    mode: str
+
+
+class StreamingPdfWriter:
+    """
+    Постраничная запись PDF из JPEG-изображений.
+
+    Каждая страница записывается в выходной поток сразу после добавления,
+    JPEG-данные встраиваются без перекодирования (фильтр DCTDecode),
+    поэтому в памяти одновременно находится не больше одной страницы.
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, output: BinaryIO, resolution: int = POINTS_PER_INCH):
+        self._output = output
+        self._resolution = resolution
+        self._position = 0
+        self._offsets = {}
+        self._page_ids: List[int] = []
+        self._next_id = self.PAGES_ID + 1
+        self._closed = False
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    @property
+    def size(self) -> int:
+        """Количество записанных байт"""
+        return self._position
+
+    def _write(self, data: bytes) -> None:
+        self._output.write(data)
+        self._position += len(data)
+
+    def _allocate_id(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _write_object(self, object_id: int, dictionary: str, stream: bytes = None) -> None:
+        self._offsets[object_id] = self._position
+        self._write(f'{object_id} 0 obj\n{dictionary}\n'.encode('ascii'))
+        if stream is not None:
+            self._write(b'stream\n')
+            self._write(stream)
+            self._write(b'\nendstream\n')
+        self._write(b'endobj\n')
+
+    def add_page(self, page: JpegPage) -> None:
+        """Записывает страницу с изображением на весь лист"""
+        if page.mode not in COLOR_SPACES:
+            raise ValueError(f'Неподдерживаемый цветовой режим страницы: {page.mode}')
+
+        image_id = self._allocate_id()
+        content_id = self._allocate_id()
+        page_id = self._allocate_id()
+        page_width = page.width * POINTS_PER_INCH / self._resolution
+        page_height = page.height * POINTS_PER_INCH / self._resolution
+
+        self._write_object(
+            image_id,
+            f'<< /Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} '
+            f'/ColorSpace {COLOR_SPACES[page.mode]} /BitsPerComponent 8 '
+            f'/Filter /DCTDecode /Length {len(page.data)} >>',
+            page.data,
+        )
+        content = f'q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q'.encode('ascii')
+        self._write_object(content_id, f'<< /Length {len(content)} >>', content)
+        self._write_object(
+            page_id,
+            f'<< /Type /Page /Parent {self.PAGES_ID} 0 R '
+            f'/MediaBox [0 0 {page_width:.4f} {page_height:.4f}] '
+            f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>',
+        )
+        self._page_ids.append(page_id)
+
+    def close(self) -> None:
+        """Записывает дерево страниц, каталог и таблицу перекрестных ссылок"""
+        if self._closed:
+            return
+        if not self._page_ids:
+            raise ValueError('PDF должен содержать хотя бы одну страницу')
+
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._write_object(
+            self.PAGES_ID,
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>',
+        )
+        self._write_object(self.CATALOG_ID, f'<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>')
+
+        xref_position = self._position
+        objects_count = self._next_id
+        self._write(f'xref\n0 {objects_count}\n0000000000 65535 f \n'.encode('ascii'))
+        for object_id in range(1, objects_count):
+            self._write(f'{self._offsets[object_id]:010d} 00000 n \n'.encode('ascii'))
+        self._write(
+            f'trailer\n<< /Size {objects_count} /Root {self.CATALOG_ID} 0 R >>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'.encode('ascii')
+        )
+        self._closed = True
@@ -0,0 +1,128 @@
+import threading
+from importlib.metadata import entry_points
+from typing import Dict, Optional, Union
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from convertors.base_converter import DocumentConverter
+
+# Группа entry points, через которую сторонние пакеты регистрируют конвертеры:
+# [project.entry-points."document_flow.converters"]
+# my_mode = "my_package.converters:MyConverter"
+ENTRY_POINT_GROUP = 'document_flow.converters'
+
+# Режимы конвертации из скрытого html тега и пути к классам конвертеров
+DEFAULT_CONVERTERS = {
+    'html': 'convertors.document_converters.HtmlToPdfConverter',
+    'word': 'convertors.document_converters.WordToPdfConverter',
+    'image': 'convertors.document_converters.ImageToPdfConverter',
+    'image_to_grayscale': 'convertors.document_converters.ImageToGrayscaleConverter',
+    'png_to_jpg': 'convertors.document_converters.PngToJpgConverter',
+    'bmp_to_jpg': 'convertors.document_converters.BmpToJpgConverter',
+    'image_distort': 'convertors.document_converters.ImageToDistortConverter',
+    'pdf_to_word': 'convertors.document_converters.PdfToWordConverter',
+}
+
+
+class ConverterRegistry:
+    """
+    Реестр конвертеров по режимам конвертации.
+
+    Модуль с классом конвертера импортируется только при первом запросе режима,
+    экземпляр конвертера создается один раз и переиспользуется, поэтому
+    конвертеры не должны хранить состояние между вызовами convert.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Union[str, type]] = {}
+        self._instances: Dict[str, DocumentConverter] = {}
+        self._lock = threading.Lock()
+
+    def register(self, mode: str, converter: Union[str, type]) -> None:
+        """
+        Регистрирует конвертер для режима
+
+        :param mode: Режим конвертации
+        :param converter: Класс конвертера или путь к нему в виде 'package.module.Class'
+        """
+        with self._lock:
+            self._sources[mode] = converter
+            self._instances.pop(mode, None)
+
+    def unregister(self, mode: str) -> None:
+        """Удаляет режим из реестра"""
+        with self._lock:
+            self._sources.pop(mode, None)
+            self._instances.pop(mode, None)
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP) -> None:
+        """Регистрирует конвертеры, объявленные установленными пакетами"""
+        for entry_point in entry_points(group=group):
+            self.register(entry_point.name, entry_point.value.replace(':', '.'))
+
+    @property
+    def modes(self):
+        return sorted(self._sources)
+
+    def __contains__(self, mode: str) -> bool:
+        return mode in self._sources
+
+    def get(self, mode: str) -> Optional[DocumentConverter]:
+        """
+        Возвращает экземпляр конвертера для режима
+
+        :param mode: Режим конвертации
+        :return: Конвертер или None, если режим не зарегистрирован
+        """
+        converter = self._instances.get(mode)
+        if converter is not None:
+            return converter
+
+        with self._lock:
+            converter = self._instances.get(mode)
+            if converter is None:
+                source = self._sources.get(mode)
+                if source is None:
+                    return None
+
+                converter_class = import_string(source) if isinstance(source, str) else source
+                converter = converter_class()
+                converter._mode = mode
+                self._instances[mode] = converter
+
+            return converter
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_converter_registry() -> ConverterRegistry:
+    """
+    Возвращает реестр конвертеров процесса
+
+    Реестр заполняется из DEFAULT_CONVERTERS, entry points группы ENTRY_POINT_GROUP
+    и settings.DOCUMENT_CONVERTERS (значение None отключает режим).
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            registry = ConverterRegistry()
+            for mode, path in DEFAULT_CONVERTERS.items():
+                registry.register(mode, path)
+            registry.load_entry_points()
+            for mode, path in getattr(settings, 'DOCUMENT_CONVERTERS', {}).items():
+                if path is None:
+                    registry.unregister(mode)
+                else:
+                    registry.register(mode, path)
+            _registry = registry
+
+        return _registry
+
+
+def get_converter_by_mode(mode: str) -> Optional[DocumentConverter]:
+    """Получить конвертер из скрытого html тега"""
+    return get_converter_registry().get(mode)
@@ -0,0 +1,280 @@
+import atexit
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from convertors.worker_pool import PoolOverloaded, RendererError, RendererTimeout, WorkerPool  # noqa: F401
+from utils import metrics
+
+FEEDBACK_DONE = 'Done'
+FEEDBACK_EXIT = 'Exit with code'
+FEEDBACK_EOF = None
+
+
+def build_wkhtmltopdf_args(options: Dict[str, Any]) -> List[str]:
+    """
+    Преобразует словарь опций в аргументы командной строки wkhtmltopdf
+
+    Флаги с булевым значением или None передаются без значения, False пропускается.
+    Опция quiet игнорируется: пулу нужен вывод прогресса, чтобы определить окончание задачи.
+    """
+    args = []
+    for key, value in options.items():
+        key = key.lower().lstrip('-')
+        if key == 'quiet' or value is False:
+            continue
+
+        args.append(f'--{key}')
+        if value is not None and not isinstance(value, bool) and value != '':
+            args.append(str(value))
+
+    return args
+
+
+def _quote_arg(arg: str) -> str:
+    """Экранирует аргумент для строки, передаваемой через --read-args-from-stdin"""
+    if arg and not re.search(r'[\s"\\]', arg):
+        return arg
+
+    return '"{}"'.format(arg.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class WkhtmltopdfWorker:
+    """Долгоживущий процесс wkhtmltopdf, принимающий задачи через stdin"""
+
+    def __init__(self, binary: str):
+        self.process = subprocess.Popen(
+            [binary, '--read-args-from-stdin'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        self.jobs_done = 0
+        self._feedback = queue.Queue()
+        self._reader = threading.Thread(target=self._read_feedback, daemon=True)
+        self._reader.start()
+
+    def _read_feedback(self) -> None:
+        """Читает stderr процесса и передает строки завершения задач"""
+        buffer = b''
+        while True:
+            chunk = self.process.stderr.read(4096)
+            if not chunk:
+                break
+
+            *lines, buffer = re.split(rb'[\r\n]', buffer + chunk)
+            for line in lines:
+                line = line.decode('utf-8', errors='replace').strip()
+                if line.startswith((FEEDBACK_DONE, FEEDBACK_EXIT)):
+                    self._feedback.put(line)
+
+        self._feedback.put(FEEDBACK_EOF)
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def render(self, args: List[str], timeout: float) -> Optional[str]:
+        """
+        Отправляет задачу процессу и ждет ее завершения
+
+        :param args: Аргументы wkhtmltopdf, включая входной и выходной файлы
+        :param timeout: Максимальное время выполнения задачи в секундах
+        :return: Сообщение об ошибке wkhtmltopdf, если оно было
+        """
+        while not self._feedback.empty():
+            self._feedback.get_nowait()
+
+        try:
+            self.process.stdin.write((' '.join(map(_quote_arg, args)) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RendererError('Процесс wkhtmltopdf недоступен') from e
+
+        try:
+            feedback = self._feedback.get(timeout=timeout)
+        except queue.Empty:
+            raise RendererTimeout(f'Рендеринг PDF превысил {timeout:.0f} с')
+
+        if feedback is FEEDBACK_EOF:
+            raise RendererError('Процесс wkhtmltopdf неожиданно завершился')
+
+        self.jobs_done += 1
+        return None if feedback == FEEDBACK_DONE else feedback
+
+    def stop(self) -> None:
+        """Останавливает процесс"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class WkhtmltopdfPool(WorkerPool):
+    """
+    Пул прогретых процессов wkhtmltopdf.
+
+    Процессы запускаются в режиме --read-args-from-stdin и получают задачи через
+    временные файлы. Количество ожидающих задач ограничено, зависшие процессы
+    убиваются по таймауту, упавшие перезапускаются, а каждый процесс
+    пересоздается после max_jobs_per_worker задач.
+    """
+
+    OVERLOADED_MESSAGE = 'Очередь рендеринга PDF переполнена'
+    NO_WORKER_MESSAGE = 'Нет свободных процессов wkhtmltopdf'
+
+    def __init__(
+        self,
+        binary: str,
+        workers: int = 2,
+        max_queue: int = 16,
+        job_timeout: float = 60,
+        max_jobs_per_worker: int = 200,
+        queue_timeout: Optional[float] = None,
+    ):
+        super().__init__(workers, max_queue, job_timeout, max_jobs_per_worker, queue_timeout)
+        self.binary = binary
+        self.work_dir = tempfile.mkdtemp(prefix='wkhtmltopdf_pool_')
+
+    @property
+    def pids(self) -> List[int]:
+        """Идентификаторы запущенных процессов wkhtmltopdf"""
+        with self._condition:
+            return [worker.pid for worker in self._workers]
+
+    def _start_worker(self) -> WkhtmltopdfWorker:
+        return WkhtmltopdfWorker(self.binary)
+
+    def _stop_worker(self, worker: WkhtmltopdfWorker, kill: bool = False) -> None:
+        if kill:
+            worker.process.kill()
+        worker.stop()
+
+    def render_to_file(self, html: str, options: Dict[str, Any], retries: int = 1) -> str:
+        """
+        Рендерит HTML в PDF-файл во временной директории пула
+
+        :param html: HTML-контент
+        :param options: Опции wkhtmltopdf
+        :param retries: Количество повторов при падении процесса
+        :return: Путь к PDF-файлу, который должен удалить вызывающий код
+        """
+        with self._admit():
+            input_fd, input_path = tempfile.mkstemp(suffix='.html', dir=self.work_dir)
+            output_path = input_path[:-len('.html')] + '.pdf'
+            try:
+                with os.fdopen(input_fd, 'w', encoding='utf-8') as input_file:
+                    input_file.write(html)
+
+                args = [*build_wkhtmltopdf_args(options), input_path, output_path]
+                for attempt in range(retries + 1):
+                    with metrics.stage('render_queue'):
+                        worker = self._acquire_worker(time.monotonic() + self.queue_timeout)
+                    try:
+                        with metrics.stage('render'):
+                            error = worker.render(args, timeout=self.job_timeout)
+                    except RendererTimeout:
+                        self._discard(worker, kill=True)
+                        raise
+                    except RendererError:
+                        self._discard(worker)
+                        if attempt == retries:
+                            raise
+                        continue
+
+                    self._release_worker(worker)
+                    break
+            except BaseException:
+                self._remove(output_path)
+                raise
+            finally:
+                self._remove(input_path)
+
+        if not os.path.exists(output_path) or not os.path.getsize(output_path):
+            self._remove(output_path)
+            raise RendererError(error or 'wkhtmltopdf не создал PDF-файл')
+
+        return output_path
+
+    def render(self, html: str, options: Dict[str, Any]) -> bytes:
+        """Рендерит HTML и возвращает содержимое PDF"""
+        output_path = self.render_to_file(html, options)
+        try:
+            with open(output_path, 'rb') as output_file:
+                return output_file.read()
+        finally:
+            self._remove(output_path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Останавливает все процессы пула"""
+        for worker in self._take_all_workers():
+            worker.stop()
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> WkhtmltopdfPool:
+    """Возвращает пул wkhtmltopdf текущего процесса, создавая его при первом обращении"""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        # После fork (например, в воркерах Celery) процессы родителя недоступны
+        if _pool is None or _pool_pid != os.getpid():
+            pool_settings = settings.WKHTMLTOPDF_POOL
+            _pool = WkhtmltopdfPool(
+                binary=settings.WKHTMLTOPDF_PATH,
+                workers=pool_settings['WORKERS'],
+                max_queue=pool_settings['MAX_QUEUE'],
+                job_timeout=pool_settings['JOB_TIMEOUT'],
+                max_jobs_per_worker=pool_settings['MAX_JOBS_PER_WORKER'],
+                queue_timeout=pool_settings['QUEUE_TIMEOUT'],
+            )
+            _pool_pid = os.getpid()
+
+        return _pool
+
+
+def reset_pdf_pool() -> None:
+    """Останавливает пул текущего процесса, следующий get_pdf_pool создаст новый по текущим настройкам"""
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+        if pool is not None and _pool_pid == os.getpid():
+            pool.close()
+
+
+@atexit.register
+def _close_pool() -> None:
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
@@ -0,0 +1,78 @@
+"""
+Заглушка wkhtmltopdf для нагрузочных тестов без установленного wkhtmltopdf.
+
+Поддерживает только режим --read-args-from-stdin, который использует пул:
+читает строку аргументов, записывает PDF с пустыми страницами (одна страница
+на PAGE_HTML_SIZE байт HTML) и сообщает о завершении задачи в stderr, как wkhtmltopdf.
+Стоимость рендеринга имитируется нагрузкой на процессор: WKHTMLTOPDF_STUB_MS_PER_KB
+миллисекунд на килобайт HTML.
+
+Запуск: python -m convertors.wkhtmltopdf_stub --read-args-from-stdin
+"""
+import os
+import shlex
+import sys
+import time
+
+PAGE_HTML_SIZE = 3000
+DEFAULT_MS_PER_KB = 0.05
+
+
+def _burn_cpu(seconds: float) -> None:
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+
+
+def _write_pdf(path: str, pages: int) -> None:
+    """Записывает минимальный корректный PDF с пустыми страницами A4"""
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [{}] /Count {} >>'.format(
+            ' '.join(f'{3 + page} 0 R' for page in range(pages)), pages,
+        ),
+    ]
+    objects.extend('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>' for _ in range(pages))
+
+    body = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f'{number} 0 obj\n{obj}\nendobj\n'.encode('ascii')
+
+    xref = len(body)
+    body += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii')
+    body += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('ascii')
+    body += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('ascii')
+
+    with open(path, 'wb') as output:
+        output.write(body)
+
+
+def main() -> int:
+    if '--read-args-from-stdin' not in sys.argv[1:]:
+        sys.stderr.write('Поддерживается только режим --read-args-from-stdin\n')
+        return 1
+
+    ms_per_kb = float(os.getenv('WKHTMLTOPDF_STUB_MS_PER_KB', DEFAULT_MS_PER_KB))
+    for line in sys.stdin:
+        args = shlex.split(line)
+        if len(args) < 2:
+            continue
+
+        input_path, output_path = args[-2:]
+        try:
+            with open(input_path, 'rb') as input_file:
+                size = len(input_file.read())
+            _burn_cpu(size / 1024 * ms_per_kb / 1000)
+            _write_pdf(output_path, max(size // PAGE_HTML_SIZE, 1))
+            sys.stderr.write('Done\n')
+        except OSError as e:
+            sys.stderr.write(f'Error: {e}\nExit with code 1 due to network error: ContentNotFoundError\n')
+        sys.stderr.flush()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+class RendererError(RuntimeError):
+    """Ошибка рендеринга PDF в пуле процессов"""
+
+
+class RendererTimeout(RendererError):
+    """Задача рендеринга не уложилась в отведенное время"""
+
+
+class PoolOverloaded(RendererError):
+    """Очередь пула переполнена"""
+
+
+class WorkerPool:
+    """
+    Основа пулов долгоживущих процессов рендеринга.
+
+    Количество задач в пуле ограничено workers + max_queue. Задача получает
+    свободный процесс или запускает новый, если процессов меньше workers,
+    иначе ждет на условии, которое оповещается и при возврате процесса в пул,
+    и при его удалении (таймаут, падение, пересоздание после max_jobs_per_worker задач).
+
+    Ожидание процесса ограничено queue_timeout (по умолчанию равен job_timeout),
+    а job_timeout отсчитывается с момента получения процесса, чтобы задача,
+    простоявшая в очереди, не убивала исправный процесс по таймауту.
+
+    Наследники реализуют _start_worker и _stop_worker, процессы должны иметь
+    метод is_alive и счетчик jobs_done.
+    """
+
+    OVERLOADED_MESSAGE = 'Очередь пула переполнена'
+    NO_WORKER_MESSAGE = 'Нет свободных процессов'
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        job_timeout: float,
+        max_jobs_per_worker: int,
+        queue_timeout: Optional[float] = None,
+    ):
+        self.size = workers
+        self.job_timeout = job_timeout
+        self.queue_timeout = job_timeout if queue_timeout is None else queue_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._admission = threading.BoundedSemaphore(workers + max_queue)
+        self._condition = threading.Condition()
+        self._idle = []
+        self._workers = set()
+        self._starting = 0
+
+    def _start_worker(self):
+        """Запускает новый процесс"""
+        raise NotImplementedError
+
+    def _stop_worker(self, worker, kill: bool = False) -> None:
+        """Останавливает процесс, kill - без ожидания корректного завершения"""
+        raise NotImplementedError
+
+    @contextmanager
+    def _admit(self):
+        """Ограничивает количество задач, находящихся в пуле"""
+        if not self._admission.acquire(blocking=False):
+            raise PoolOverloaded(self.OVERLOADED_MESSAGE)
+
+        try:
+            yield
+        finally:
+            self._admission.release()
+
+    def _acquire_worker(self, deadline: float):
+        """Возвращает свободный процесс, при необходимости запуская новый"""
+        dead = []
+        try:
+            with self._condition:
+                while True:
+                    while self._idle:
+                        worker = self._idle.pop()
+                        if worker.is_alive():
+                            return worker
+                        self._workers.discard(worker)
+                        dead.append(worker)
+
+                    if len(self._workers) + self._starting < self.size:
+                        # Место в пуле занимается до запуска, запуск идет без блокировки
+                        self._starting += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RendererTimeout(self.NO_WORKER_MESSAGE)
+                    self._condition.wait(remaining)
+        finally:
+            for worker in dead:
+                self._stop_worker(worker)
+
+        worker = None
+        try:
+            worker = self._start_worker()
+        finally:
+            with self._condition:
+                self._starting -= 1
+                if worker is not None:
+                    self._workers.add(worker)
+                else:
+                    self._condition.notify()
+        return worker
+
+    def _release_worker(self, worker) -> None:
+        """Возвращает процесс в пул или пересоздает его после лимита задач"""
+        if worker.jobs_done >= self.max_jobs_per_worker or not worker.is_alive():
+            self._discard(worker)
+            return
+
+        with self._condition:
+            self._idle.append(worker)
+            self._condition.notify()
+
+    def _discard(self, worker, kill: bool = False) -> None:
+        """Удаляет процесс из пула, ожидающая задача может сразу запустить замену"""
+        with self._condition:
+            self._workers.discard(worker)
+            self._condition.notify()
+
+        self._stop_worker(worker, kill)
+
+    def _take_all_workers(self) -> List:
+        with self._condition:
+            workers, self._workers = self._workers, set()
+            self._idle.clear()
+        return list(workers)
@@ -0,0 +1,163 @@
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Document, DocumentAccess
+
+# Эффективные права пользователя на документ в порядке возрастания
+PERMISSION_VIEW = 'view'
+PERMISSION_EDIT = 'edit'
+PERMISSION_OWNER = 'owner'
+PERMISSION_LEVELS = {
+    None: 0,
+    PERMISSION_VIEW: 1,
+    PERMISSION_EDIT: 2,
+    PERMISSION_OWNER: 3,
+}
+DEFAULT_ACCESS_PERMISSIONS = {
+    'private': None,
+    'public_read': PERMISSION_VIEW,
+    'public_edit': PERMISSION_EDIT,
+}
+
+
+def _grant_permission(permissions: str) -> str:
+    """Переводит значение DocumentAccess.permissions в эффективное право"""
+    return PERMISSION_EDIT if 'edit' in permissions else PERMISSION_VIEW
+
+
+def _strongest(*permissions: Optional[str]) -> Optional[str]:
+    return max(permissions, key=PERMISSION_LEVELS.__getitem__)
+
+
+def _cache():
+    # Локальный кэш процесса отклоняется при запуске проверкой checks.check_document_access_cache
+    return caches[settings.DOCUMENT_ACCESS_CACHE['ALIAS']]
+
+
+def _version_key(document_id: int) -> str:
+    return f'document_access_version:{document_id}'
+
+
+def _new_version() -> int:
+    """
+    Начальная версия прав документа
+
+    Версия не совпадает с прежними значениями ключа, поэтому после вытеснения
+    ключа версии из кэша уцелевшие записи старых версий не используются.
+    """
+    return time.time_ns()
+
+
+def _entry_key(user_id: int, document_id: int, version: int) -> str:
+    return f'document_access:{user_id}:{document_id}:{version}'
+
+
+def invalidate_document_access(document_id: int) -> None:
+    """Сбрасывает закэшированные права всех пользователей на документ"""
+    cache = _cache()
+    try:
+        cache.incr(_version_key(document_id))
+    except ValueError:
+        cache.set(_version_key(document_id), _new_version(), None)
+
+
+def resolve_permissions(user, documents: Iterable[Document]) -> Dict[int, Optional[str]]:
+    """
+    Вычисляет эффективные права пользователя на набор документов
+
+    Права складываются из владения документом, default_access и активных
+    непросроченных DocumentAccess. Для всех документов, которых нет в кэше,
+    выдачи доступа загружаются одним запросом. Записи кэша привязаны к версии
+    прав документа: если ключа версии нет, права вычисляются заново.
+
+    :param user: Пользователь (в том числе анонимный)
+    :param documents: Документы с загруженными owner_id и default_access
+    :return: Словарь {id документа: 'owner' | 'edit' | 'view' | None}
+    """
+    documents = {document.pk: document for document in documents}
+    if not documents:
+        return {}
+
+    if not user.is_authenticated:
+        return {
+            document_id: DEFAULT_ACCESS_PERMISSIONS.get(document.default_access)
+            for document_id, document in documents.items()
+        }
+
+    cache = _cache()
+    version_keys = [_version_key(document_id) for document_id in documents]
+    versions = cache.get_many(version_keys)
+    unversioned = [key for key in version_keys if key not in versions]
+    if unversioned:
+        # Новая версия записывается через add, чтобы не перезаписать версию,
+        # одновременно увеличенную invalidate_document_access
+        version = _new_version()
+        for key in unversioned:
+            cache.add(key, version, None)
+        versions.update(cache.get_many(unversioned))
+
+    entry_keys = {
+        document_id: _entry_key(user.pk, document_id, versions[_version_key(document_id)])
+        for document_id in documents
+        if _version_key(document_id) in versions
+    }
+    cached = cache.get_many(list(entry_keys.values()))
+
+    now = time.time()
+    result = {}
+    missing = []
+    for document_id in documents:
+        key = entry_keys.get(document_id)
+        entry = cached.get(key) if key is not None else None
+        # Запись хранит момент, до которого она верна: истечение expires_at выдачи доступа
+        if entry is not None and (entry[1] is None or entry[1] > now):
+            result[document_id] = entry[0]
+        else:
+            missing.append(document_id)
+
+    if missing:
+        grants = DocumentAccess.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+            user=user,
+            document_id__in=missing,
+            is_active=True,
+        ).values_list('document_id', 'permissions', 'expires_at')
+        grants_by_document = {}
+        for document_id, permissions, expires_at in grants:
+            grants_by_document.setdefault(document_id, []).append((permissions, expires_at))
+
+        new_entries = {}
+        for document_id in missing:
+            document = documents[document_id]
+            permission = DEFAULT_ACCESS_PERMISSIONS.get(document.default_access)
+            valid_until = None
+            if document.owner_id == user.pk:
+                permission = PERMISSION_OWNER
+            for permissions, expires_at in grants_by_document.get(document_id, []):
+                permission = _strongest(permission, _grant_permission(permissions))
+                if expires_at is not None:
+                    expires_at = expires_at.timestamp()
+                    valid_until = expires_at if valid_until is None else min(valid_until, expires_at)
+
+            result[document_id] = permission
+            if document_id in entry_keys:
+                new_entries[entry_keys[document_id]] = (permission, valid_until)
+
+        cache.set_many(new_entries, settings.DOCUMENT_ACCESS_CACHE['TIMEOUT'])
+
+    return result
+
+
+def get_permission(user, document: Document) -> Optional[str]:
+    """Возвращает эффективное право пользователя на документ"""
+    return resolve_permissions(user, [document])[document.pk]
+
+
+def has_permission(user, document: Document, required: str = PERMISSION_VIEW) -> bool:
+    """Проверяет, что право пользователя на документ не ниже требуемого"""
+    return PERMISSION_LEVELS[get_permission(user, document)] >= PERMISSION_LEVELS[required]
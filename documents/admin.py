@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document
+from .models import ConversionJob, Document, MaintenanceRun, UploadSession
 
 
 @admin.register(Document)
@@ -8,3 +8,27 @@ class DocumentAdmin(admin.ModelAdmin):
     list_filter = ('file',)
     search_fields = ('file', 'title')
     list_per_page = 10
+
+
+@admin.register(ConversionJob)
+class ConversionJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'mode', 'owner', 'status', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'mode')
+    search_fields = ('title', 'uuid')
+    list_per_page = 10
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'owner', 'target', 'status', 'received', 'size', 'updated_at')
+    list_filter = ('status', 'target')
+    search_fields = ('filename', 'uuid')
+    list_per_page = 10
+
+
+@admin.register(MaintenanceRun)
+class MaintenanceRunAdmin(admin.ModelAdmin):
+    list_display = ('table', 'action', 'status', 'dead_tuples', 'size_before', 'size_after', 'started_at', 'finished_at')
+    list_filter = ('status', 'action')
+    search_fields = ('table',)
+    list_per_page = 10
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+@register(Tags.caches)
+def check_document_access_cache(app_configs, **kwargs):
+    """Кэш прав на документы должен быть общим для всех процессов"""
+    alias = settings.DOCUMENT_ACCESS_CACHE['ALIAS']
+    cache_settings = settings.CACHES.get(alias)
+    if cache_settings is None:
+        return [Error(
+            f'Кэш {alias} из DOCUMENT_ACCESS_CACHE не описан в CACHES',
+            id='documents.E001',
+        )]
+
+    if cache_settings.get('BACKEND') in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f'Кэш {alias} для прав на документы должен быть общим для всех процессов, а не LocMemCache',
+            hint='Используйте Redis или Memcached либо DummyCache, чтобы отключить кэширование прав',
+            id='documents.E002',
+        )]
+
+    return []
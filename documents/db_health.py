@@ -0,0 +1,266 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DatabaseMetricSample
+
+# Периоды графиков: длина в секундах и разрешение временного ряда
+PERIODS = {
+    '1h': (60 * 60, 60),
+    '24h': (24 * 60 * 60, 15 * 60),
+    '7d': (7 * 24 * 60 * 60, 60 * 60),
+    '90d': (90 * 24 * 60 * 60, 24 * 60 * 60),
+}
+DEFAULT_PERIOD = '24h'
+# Счетчики с момента сброса статистики, на графиках показывается скорость их роста
+COUNTER_METRICS = {'transactions_total', 'table_operations_total', 'seq_scan_total'}
+# Графики страницы: метрика, заголовок и максимальное количество рядов
+CHARTS = [
+    ('transactions_total', 'Транзакций в секунду', None),
+    ('backends', 'Процессы по состояниям', None),
+    ('active_queries', 'Активные запросы', None),
+    ('longest_transaction_s', 'Самая долгая транзакция, с', None),
+    ('longest_query_s', 'Самый долгий запрос, с', None),
+    ('table_operations_total', 'Изменений строк в секунду по таблицам', 5),
+]
+# Префиксы системных таблиц, которые не проверяются на недостающие индексы
+SYSTEM_TABLE_PREFIXES = ('pg_', 'sql_')
+
+
+class MetricValue(NamedTuple):
+    metric: str
+    subject: str
+    value: float
+
+
+def _rows(queries: Dict[str, Dict], name: str) -> List[tuple]:
+    result = queries.get(name)
+    if not result or result['error']:
+        return []
+    return result['rows']
+
+
+def extract_metrics(queries: Dict[str, Dict], top_tables: int) -> List[MetricValue]:
+    """
+    Преобразует результаты запросов диагностики в значения метрик
+
+    :param queries: Результаты DatabaseDiagnostics.collect по имени запроса
+    :param top_tables: Количество самых нагруженных таблиц, для которых сохраняются метрики
+    :return: Значения метрик, по одному на метрику и объект
+    """
+    values = {}
+
+    def add(metric: str, subject: str, value) -> None:
+        if value is not None:
+            values.setdefault((metric, subject), MetricValue(metric, subject, float(value)))
+
+    for database, transactions, _ in _rows(queries, 'db_load'):
+        if database:
+            add('transactions_total', database, transactions)
+
+    for state, count in _rows(queries, 'process_distribution'):
+        add('backends', state or 'background', count)
+
+    active = _rows(queries, 'active_transactions_and_queries_duration')
+    add('active_queries', '', len(active))
+    add('longest_transaction_s', '', max((row[2].total_seconds() for row in active if row[2]), default=0))
+    add('longest_query_s', '', max((row[3].total_seconds() for row in active if row[3]), default=0))
+
+    for table, operations in _rows(queries, 'most_loaded_tables')[:top_tables]:
+        add('table_operations_total', table, operations)
+
+    scans = sorted(_rows(queries, 'index_vs_seq_scan_ratio'), key=lambda row: row[1], reverse=True)
+    for table, seq_scan, idx_scan, _ in scans[:top_tables]:
+        add('seq_scan_total', table, seq_scan)
+        add('seq_scan_ratio', table, seq_scan / (seq_scan + (idx_scan or 0)))
+
+    return list(values.values())
+
+
+def bucket_start(moment: datetime, resolution: int) -> datetime:
+    """Начало интервала длиной resolution секунд, в который попадает moment"""
+    seconds = int(moment.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % resolution, tz=dt_timezone.utc)
+
+
+def record_samples(values: Iterable[MetricValue], moment: Optional[datetime] = None) -> None:
+    """
+    Добавляет замер в интервалы всех разрешений из DATABASE_HEALTH['RETENTION']
+
+    На каждое разрешение выполняется один запрос на чтение и не более двух на запись.
+
+    :param values: Значения метрик
+    :param moment: Время замера, по умолчанию текущее
+    """
+    moment = moment or timezone.now()
+    values = list(values)
+
+    with transaction.atomic():
+        for resolution in settings.DATABASE_HEALTH['RETENTION']:
+            timestamp = bucket_start(moment, resolution)
+            existing = {
+                (sample.metric, sample.subject): sample
+                for sample in DatabaseMetricSample.objects.select_for_update().filter(
+                    resolution=resolution,
+                    timestamp=timestamp,
+                )
+            }
+
+            created, updated = [], []
+            for item in values:
+                sample = existing.get((item.metric, item.subject))
+                if sample is None:
+                    created.append(DatabaseMetricSample(
+                        metric=item.metric,
+                        subject=item.subject,
+                        resolution=resolution,
+                        timestamp=timestamp,
+                        value=item.value,
+                        min_value=item.value,
+                        max_value=item.value,
+                    ))
+                    continue
+
+                sample.value = (sample.value * sample.count + item.value) / (sample.count + 1)
+                sample.min_value = min(sample.min_value, item.value)
+                sample.max_value = max(sample.max_value, item.value)
+                sample.count += 1
+                updated.append(sample)
+
+            DatabaseMetricSample.objects.bulk_create(created)
+            DatabaseMetricSample.objects.bulk_update(updated, ['value', 'min_value', 'max_value', 'count'])
+
+
+def prune_samples(moment: Optional[datetime] = None) -> int:
+    """Удаляет точки старше срока хранения их разрешения"""
+    moment = moment or timezone.now()
+    deleted = 0
+    for resolution, retention in settings.DATABASE_HEALTH['RETENTION'].items():
+        deleted += DatabaseMetricSample.objects.filter(
+            resolution=resolution,
+            timestamp__lt=moment - timedelta(seconds=retention),
+        ).delete()[0]
+    return deleted
+
+
+def sample_database_health() -> int:
+    """
+    Снимает метрики состояния базы и сохраняет их во временные ряды
+
+    :return: Количество сохраненных значений
+    """
+    from utils.database.postgresql import get_database_diagnostics
+
+    # Свежий замер заодно обновляет кэш результатов для страницы database_info
+    queries = get_database_diagnostics().collect(force=True)['queries']
+    values = extract_metrics(queries, settings.DATABASE_HEALTH['TOP_TABLES'])
+
+    moment = timezone.now()
+    record_samples(values, moment)
+    prune_samples(moment)
+    return len(values)
+
+
+def load_series(period: str) -> Dict[Tuple[str, str], List[Tuple[datetime, float]]]:
+    """
+    Загружает временные ряды за период в разрешении периода
+
+    Для счетчиков вместо значения возвращается скорость роста между соседними
+    интервалами по их максимальным значениям, интервал после сброса статистики пропускается.
+
+    :param period: Ключ PERIODS
+    :return: Точки (время, значение) по метрике и объекту
+    """
+    length, resolution = PERIODS[period]
+    rows = DatabaseMetricSample.objects.filter(
+        resolution=resolution,
+        timestamp__gte=timezone.now() - timedelta(seconds=length),
+    ).order_by('timestamp').values_list('metric', 'subject', 'timestamp', 'value', 'max_value')
+
+    series = defaultdict(list)
+    previous = {}
+    for metric, subject, timestamp, value, max_value in rows:
+        key = (metric, subject)
+        if metric in COUNTER_METRICS:
+            last = previous.get(key)
+            previous[key] = (timestamp, max_value)
+            if last is None or max_value < last[1]:
+                continue
+            value = (max_value - last[1]) / (timestamp - last[0]).total_seconds()
+        series[key].append((timestamp, value))
+    return series
+
+
+def sparkline(points: List[Tuple[datetime, float]], width: int = 240, height: int = 40) -> str:
+    """Координаты polyline для SVG-графика значений ряда"""
+    if len(points) < 2:
+        return ''
+
+    start, end = points[0][0], points[-1][0]
+    duration = (end - start).total_seconds() or 1
+    low = min(value for _, value in points)
+    span = max(value for _, value in points) - low or 1
+    return ' '.join(
+        f'{(timestamp - start).total_seconds() / duration * width:.1f},'
+        f'{height - (value - low) / span * height:.1f}'
+        for timestamp, value in points
+    )
+
+
+def build_charts(series: Dict[Tuple[str, str], List[Tuple[datetime, float]]]) -> List[Dict]:
+    """Графики CHARTS с последним, минимальным и максимальным значением каждого ряда"""
+    charts = []
+    for metric, title, limit in CHARTS:
+        rows = [
+            {
+                'subject': subject or 'всего',
+                'points': sparkline(points),
+                'last': round(points[-1][1], 2),
+                'min': round(min(value for _, value in points), 2),
+                'max': round(max(value for _, value in points), 2),
+            }
+            for (name, subject), points in series.items()
+            if name == metric and points
+        ]
+        rows.sort(key=lambda row: row['last'], reverse=True)
+        charts.append({'title': title, 'series': rows[:limit]})
+    return charts
+
+
+def missing_index_candidates(queries: Optional[Dict[str, Dict]], series) -> List[Dict]:
+    """
+    Таблицы, которые читаются в основном последовательным сканированием
+
+    Таблица попадает в список, если доля последовательных сканирований не меньше
+    SEQ_SCAN_RATIO_THRESHOLD и их количество не меньше MIN_SEQ_SCANS. Скорость
+    последовательных сканирований берется из временного ряда seq_scan_total.
+
+    :param queries: Текущие результаты DatabaseDiagnostics.collect или None
+    :param series: Временные ряды из load_series
+    :return: Таблицы по убыванию количества последовательных сканирований
+    """
+    health_settings = settings.DATABASE_HEALTH
+    candidates = []
+    for table, seq_scan, idx_scan, _ in _rows(queries or {}, 'index_vs_seq_scan_ratio'):
+        if table.startswith(SYSTEM_TABLE_PREFIXES) or seq_scan < health_settings['MIN_SEQ_SCANS']:
+            continue
+
+        ratio = seq_scan / (seq_scan + (idx_scan or 0))
+        if ratio < health_settings['SEQ_SCAN_RATIO_THRESHOLD']:
+            continue
+
+        rates = series.get(('seq_scan_total', table))
+        candidates.append({
+            'table': table,
+            'seq_scan': seq_scan,
+            'idx_scan': idx_scan or 0,
+            'seq_scan_ratio': round(ratio, 3),
+            'seq_scan_per_s': round(rates[-1][1], 3) if rates else None,
+        })
+
+    candidates.sort(key=lambda candidate: candidate['seq_scan'], reverse=True)
+    return candidates
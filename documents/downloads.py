@@ -0,0 +1,168 @@
+import mimetypes
+import os
+import re
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .models import Document
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """Запрошенный диапазон байт лежит за пределами файла"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает заголовок Range
+
+    Поддерживается только один диапазон, для остальных запросов файл отдается целиком.
+
+    :param header: Значение заголовка Range
+    :param size: Размер файла в байтах
+    :return: Первый и последний байт диапазона включительно или None
+    """
+    if not header:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Суффиксный диапазон: последние N байт файла
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def iter_file_range(file, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    """Читает диапазон файла блоками и закрывает файл по окончании"""
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_response(
+    request,
+    file,
+    filename: str,
+    content_type: Optional[str] = None,
+    as_attachment: bool = True,
+    etag: Optional[str] = None,
+):
+    """
+    Отдает файл потоком с поддержкой запросов диапазонов
+
+    Файл не читается в память целиком: без заголовка Range он передается через
+    FileResponse (сервер может использовать wsgi.file_wrapper и sendfile),
+    для Range отдается только запрошенная часть. Файл закрывается вместе с ответом.
+
+    :param request: Объект запроса
+    :param file: Открытый файловый объект с поддержкой seek
+    :param filename: Имя файла для заголовка Content-Disposition
+    :param content_type: MIME-тип, по умолчанию определяется по имени файла
+    :param as_attachment: Отдавать файл как вложение
+    :param etag: ETag файла для проверки If-Range
+    """
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    chunk_size = settings.DOWNLOADS['CHUNK_SIZE']
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(
+            file,
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type=content_type,
+        )
+        response.block_size = chunk_size
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_file_range(file, start, end - start + 1, chunk_size),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def document_response(request, document: Document, as_attachment: bool = True):
+    """
+    Отдает файл документа
+
+    Если задан settings.DOWNLOADS['SENDFILE_BACKEND'], передача файла делегируется
+    веб-серверу через X-Sendfile (Apache, lighttpd) или X-Accel-Redirect (nginx).
+    """
+    # Файл хранится под хэшем содержимого, пользователю он отдается под заголовком документа
+    extension = os.path.splitext(document.file.name)[1]
+    filename = f'{document.title}{extension}'
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = f'"{document.uuid.hex}-{document.version}-{int(document.updated_at.timestamp())}"'
+    backend = settings.DOWNLOADS['SENDFILE_BACKEND']
+
+    if backend in ('xsendfile', 'xaccel'):
+        response = HttpResponse(content_type=content_type)
+        if backend == 'xsendfile':
+            response['X-Sendfile'] = document.file.path
+        else:
+            prefix = settings.DOWNLOADS['ACCEL_REDIRECT_PREFIX'].rstrip('/')
+            response['X-Accel-Redirect'] = f'{prefix}/{quote(document.file.name)}'
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['ETag'] = etag
+        return response
+
+    return file_response(
+        request,
+        document.file.storage.open(document.file.name, 'rb'),
+        filename,
+        content_type=content_type,
+        as_attachment=as_attachment,
+        etag=etag,
+    )
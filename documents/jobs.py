@@ -0,0 +1,216 @@
+import os
+from datetime import timedelta
+
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from convertors.cache import get_conversion_cache
+from convertors.conversion_request import ConversionRequest
+from convertors.registry import get_converter_by_mode
+from utils import metrics
+from utils.tasks_utils import run_task
+from .forms import DocumentForm
+from .models import ConversionJob, Document
+from .notifications import send_email_about_document
+
+JOBS_STAGING_DIR = 'conversion_jobs'
+IGNORED_FORM_FIELDS = {'csrfmiddlewaretoken', 'upload_type'}
+TIME_LIMIT_ERROR = 'Превышено время выполнения задачи'
+
+
+def enqueue_conversion_job(owner, mode: str, title: str, post, files) -> ConversionJob:
+    """
+    Сохраняет исходные данные конвертации и ставит задачу в очередь generate_pdf
+
+    :param owner: Пользователь, для которого создается документ
+    :param mode: Режим конвертации из get_converter_by_mode
+    :param title: Заголовок результирующего документа
+    :param post: Поля формы (QueryDict)
+    :param files: Загруженные файлы (MultiValueDict)
+    :return: Созданная задача конвертации
+    """
+    if get_converter_by_mode(mode) is None:
+        raise ValueError(f'Неизвестный режим конвертации: {mode}')
+
+    job = ConversionJob.objects.create(
+        owner=owner,
+        mode=mode,
+        title=title,
+        form_data={
+            key: post.getlist(key)
+            for key in post
+            if key not in IGNORED_FORM_FIELDS
+        },
+    )
+    job.source_files = [
+        _stage_file(job, field_name, uploaded_file)
+        for field_name in files
+        for uploaded_file in files.getlist(field_name)
+    ]
+    job.save(update_fields=['source_files'])
+
+    transaction.on_commit(lambda: _schedule_job(job))
+    return job
+
+
+def _schedule_job(job: ConversionJob) -> None:
+    """Отправляет задачу конвертации в Celery"""
+    from .tasks import task_run_conversion_job
+
+    run_task(
+        task=task_run_conversion_job,
+        queue='generate_pdf',
+        task_kwargs={'job_id': job.id},
+        task_id=f'conversion_job_{job.uuid}',
+        time_limit=settings.CONVERSION_JOB_TIME_LIMIT,
+        soft_time_limit=settings.CONVERSION_JOB_SOFT_TIME_LIMIT,
+    )
+
+
+def _stage_file(job: ConversionJob, field_name: str, uploaded_file) -> dict:
+    """Сохраняет загруженный файл во временную директорию задачи"""
+    path = default_storage.save(
+        os.path.join(JOBS_STAGING_DIR, str(job.uuid), os.path.basename(uploaded_file.name)),
+        uploaded_file,
+    )
+    return {
+        'field': field_name,
+        'path': path,
+        'name': uploaded_file.name,
+        'content_type': uploaded_file.content_type,
+        'size': uploaded_file.size,
+    }
+
+
+def build_conversion_request(job: ConversionJob) -> ConversionRequest:
+    """Восстанавливает запрос для конвертера из сохраненных данных задачи"""
+    files = MultiValueDict()
+    try:
+        for source in job.source_files:
+            files.appendlist(
+                source['field'],
+                UploadedFile(
+                    file=default_storage.open(source['path'], 'rb'),
+                    name=source['name'],
+                    content_type=source['content_type'],
+                    size=source['size'],
+                ),
+            )
+    except BaseException:
+        _close_files(files)
+        raise
+
+    return ConversionRequest.from_form_data(job.form_data, files)
+
+
+def _close_files(files: MultiValueDict) -> None:
+    for _, uploaded_files in files.lists():
+        for uploaded_file in uploaded_files:
+            uploaded_file.close()
+
+
+def save_converted_document(owner, title: str, converted_file) -> Document:
+    """Создает документ из результата конвертации"""
+    form = DocumentForm({'title': title}, {'file': converted_file})
+    if not form.is_valid():
+        raise ValueError(f'Некорректный результат конвертации: {form.errors.as_text()}')
+
+    document = form.save(commit=False)
+    document.owner = owner
+    document.file_size = document.file.size
+    document.file_type = document.file.name.split('.')[-1]
+    document.save()
+    return document
+
+
+def run_conversion_job(job_id: int) -> ConversionJob:
+    """
+    Выполняет конвертацию и сохраняет результат и тайминги в задаче
+
+    :param job_id: Id задачи конвертации
+    :return: Обновленная задача конвертации
+    """
+    job = ConversionJob.objects.select_related('owner').get(id=job_id)
+    if job.is_finished:
+        return job
+
+    job.status = ConversionJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    conversion_request = None
+    try:
+        # Недоступный исходный файл тоже завершает задачу ошибкой, а не оставляет ее выполняющейся
+        conversion_request = build_conversion_request(job)
+        converter = get_converter_by_mode(job.mode)
+        converted_file = get_conversion_cache().convert(converter, job.title, conversion_request)
+        try:
+            with metrics.stage('storage_save', mode=job.mode) as stage:
+                job.document = save_converted_document(job.owner, job.title, converted_file)
+                stage.add_bytes('out', job.document.file_size)
+        finally:
+            converted_file.close()
+        job.status = ConversionJob.STATUS_DONE
+    except SoftTimeLimitExceeded:
+        job.status = ConversionJob.STATUS_FAILED
+        job.error = TIME_LIMIT_ERROR
+    except Exception as e:
+        job.status = ConversionJob.STATUS_FAILED
+        job.error = str(e) or e.__class__.__name__
+    finally:
+        if conversion_request is not None:
+            _close_files(conversion_request.FILES)
+        _cleanup_staged_files(job)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'document', 'error', 'finished_at'])
+
+    if job.status == ConversionJob.STATUS_DONE and job.owner.email:
+        send_email_about_document(
+            subject='Документ загружен',
+            html_message='Ваш документ был загружен',
+            user_email=job.owner.email,
+            user_id=job.owner.id,
+        )
+
+    return job
+
+
+def _cleanup_staged_files(job: ConversionJob) -> None:
+    """Удаляет исходные файлы задачи после завершения"""
+    for source in job.source_files:
+        default_storage.delete(source['path'])
+
+    try:
+        os.rmdir(default_storage.path(os.path.join(JOBS_STAGING_DIR, str(job.uuid))))
+    except (NotImplementedError, OSError):
+        pass
+
+
+def cleanup_stale_conversion_jobs() -> int:
+    """
+    Завершает ошибкой задачи, выполняющиеся дольше CONVERSION_JOB_TIME_LIMIT
+
+    Такие задачи не закончатся сами: по жесткому ограничению Celery убивает процесс
+    воркера, и run_conversion_job не успевает сохранить статус и удалить исходные файлы.
+
+    :return: Количество завершенных задач
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.CONVERSION_JOB_TIME_LIMIT)
+    stale = ConversionJob.objects.filter(status=ConversionJob.STATUS_RUNNING, started_at__lt=deadline)
+
+    finished = 0
+    for job in stale.only('id', 'uuid', 'source_files').iterator():
+        updated = ConversionJob.objects.filter(id=job.id, status=ConversionJob.STATUS_RUNNING).update(
+            status=ConversionJob.STATUS_FAILED,
+            error=TIME_LIMIT_ERROR,
+            finished_at=timezone.now(),
+        )
+        if updated:
+            _cleanup_staged_files(job)
+            finished += 1
+    return finished
@@ -0,0 +1,106 @@
+import base64
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .models import Document, DocumentAccess
+
+
+class KeysetPage(NamedTuple):
+    """Страница списка с курсором на следующую страницу"""
+    items: List
+    next_cursor: Optional[str]
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(moment: datetime, pk: int) -> str:
+    """Кодирует позицию последней записи страницы в строку для URL"""
+    return base64.urlsafe_b64encode(f'{moment.isoformat()}|{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Декодирует курсор страницы
+
+    :param cursor: Строка, полученная из encode_cursor
+    :return: Время и id последней записи предыдущей страницы
+    :raises ValueError: Если курсор поврежден
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        moment, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(moment), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Некорректный курсор страницы') from e
+
+
+def paginate_keyset(
+    queryset: QuerySet,
+    cursor: Optional[str],
+    page_size: int,
+    time_field: str = 'created_at',
+) -> KeysetPage:
+    """
+    Возвращает страницу, отсортированную по (time_field, id) в обратном порядке
+
+    В отличие от OFFSET, стоимость запроса не зависит от номера страницы:
+    выборка начинается сразу с позиции курсора по индексу.
+
+    :param queryset: Исходная выборка
+    :param cursor: Курсор из предыдущей страницы или None для первой
+    :param page_size: Количество записей на странице
+    :param time_field: Поле времени, по которому строится порядок
+    """
+    queryset = queryset.order_by(f'-{time_field}', '-id')
+    if cursor:
+        moment, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__lt': moment}) | Q(**{time_field: moment, 'id__lt': pk})
+        )
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, time_field), last.pk)
+
+    return KeysetPage(items, next_cursor)
+
+
+def owned_documents_page(user, cursor: Optional[str], page_size: int) -> KeysetPage:
+    """Страница документов пользователя, начиная с новых"""
+    return paginate_keyset(
+        Document.objects.filter(owner=user).defer('description', 'encryption_key'),
+        cursor,
+        page_size,
+    )
+
+
+def _shared_accesses(user) -> QuerySet:
+    """Активные непросроченные доступы пользователя к чужим документам"""
+    return DocumentAccess.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        user=user,
+        is_active=True,
+    )
+
+
+def shared_documents_page(user, cursor: Optional[str], page_size: int) -> KeysetPage:
+    """Страница активных непросроченных доступов пользователя к чужим документам вместе с документами"""
+    return paginate_keyset(
+        _shared_accesses(user).select_related('document', 'granted_by'),
+        cursor,
+        page_size,
+        time_field='granted_at',
+    )
+
+
+def shared_documents_count(user) -> int:
+    """Количество документов в списке shared_documents_page"""
+    return _shared_accesses(user).count()
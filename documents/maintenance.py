@@ -0,0 +1,76 @@
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from utils.database.maintenance import (
+    MaintenanceLockTimeout,
+    PostgresMaintenanceBackend,
+    maintenance_window_end,
+    plan_maintenance,
+)
+from .models import MaintenanceRun
+
+
+def run_database_maintenance(backend=None, now: Optional[datetime] = None) -> List[MaintenanceRun]:
+    """
+    Обслуживает таблицы, выбранные plan_maintenance, если сейчас окно обслуживания
+
+    Таблицы обрабатываются по одной командами VACUUM (ANALYZE) или ANALYZE с lock_timeout:
+    занятая таблица пропускается, а не блокирует запросы приложения в очереди за собой.
+    Новые таблицы не начинаются после окончания окна. Одновременно обслуживание
+    выполняет только один процесс.
+
+    :param backend: Источник статистики и исполнитель команд, по умолчанию PostgreSQL из DATABASE_DIAGNOSTICS
+    :param now: Текущее время, по умолчанию timezone.now()
+    :return: Записи о выполненном обслуживании
+    """
+    maintenance = settings.DATABASE_MAINTENANCE
+    now = now or timezone.now()
+    window_end = maintenance_window_end(now, maintenance['WINDOWS'])
+    if not maintenance['ENABLED'] or window_end is None:
+        return []
+
+    if backend is None:
+        from utils.database.postgresql import get_database_diagnostics
+
+        backend = PostgresMaintenanceBackend(get_database_diagnostics())
+
+    runs = []
+    started = time.monotonic()
+    with backend.exclusive() as acquired:
+        if not acquired:
+            return runs
+
+        for task in plan_maintenance(backend.table_stats(), maintenance, now):
+            if now + timedelta(seconds=time.monotonic() - started) >= window_end:
+                break
+
+            run = MaintenanceRun(
+                table=task.name,
+                action=task.action,
+                reason=task.reason,
+                dead_tuples=task.dead_tuples,
+                started_at=timezone.now(),
+            )
+            try:
+                run.size_before, run.size_after = backend.execute(
+                    task,
+                    maintenance['LOCK_TIMEOUT'],
+                    maintenance['STATEMENT_TIMEOUT'],
+                )
+                run.status = MaintenanceRun.STATUS_DONE
+            except MaintenanceLockTimeout as e:
+                run.status = MaintenanceRun.STATUS_SKIPPED
+                run.error = str(e)
+            except Exception as e:
+                run.status = MaintenanceRun.STATUS_FAILED
+                run.error = str(e) or e.__class__.__name__
+
+            run.finished_at = timezone.now()
+            run.save()
+            runs.append(run)
+
+    return runs
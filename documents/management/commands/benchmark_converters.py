@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from convertors.benchmarks import (
+    IMAGE_SIZES,
+    build_cases,
+    compare_with_baseline,
+    environment,
+    load_report,
+    run_benchmarks,
+    save_report,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет производительность конвертеров изображений на синтетических данных: '
+        'пропускную способность, p50/p99, пиковый прирост RSS и размер результата. '
+        'Результаты сохраняются в JSON и сравниваются с базовым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', help='Режим конвертации (можно несколько)')
+        parser.add_argument(
+            '--size',
+            action='append',
+            dest='sizes',
+            choices=sorted(IMAGE_SIZES),
+            help='Размер изображений (можно несколько), по умолчанию все',
+        )
+        parser.add_argument('--iterations', type=int, default=10, help='Измеряемых конвертаций на сценарий')
+        parser.add_argument('--warmup', type=int, default=1, help='Прогревочных конвертаций на сценарий')
+        parser.add_argument('--output', help='Файл для сохранения результатов в JSON')
+        parser.add_argument('--baseline', help='JSON с результатами базового прогона для сравнения')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.1,
+            help='Допустимый относительный рост метрики, по умолчанию 0.1 (10 %%)',
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдена регрессия',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должен быть больше нуля')
+
+        cases = build_cases(options['modes'], options['sizes'] or IMAGE_SIZES)
+        if not cases:
+            raise CommandError('Нет сценариев для выбранных режимов')
+
+        results = {}
+        for name, result in run_benchmarks(cases, options['iterations'], options['warmup']):
+            results[name] = result
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f'{name}: {result["error"]}'))
+            else:
+                self.stdout.write(
+                    f'{name}: {result["throughput_per_s"]}/s, p50 {result["p50_ms"]} ms, '
+                    f'p99 {result["p99_ms"]} ms, RSS +{result["peak_rss_mb"]} MB, '
+                    f'{result["output_size"]} B'
+                )
+
+        report = {'environment': environment(), 'results': results}
+        if options['baseline']:
+            baseline = load_report(options['baseline'])
+            report['comparison'] = compare_with_baseline(
+                results, baseline.get('results', {}), options['threshold'],
+            )
+            self._print_comparison(report['comparison'])
+
+        if options['output']:
+            save_report(options['output'], report)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+        regressions = [change for change in report.get('comparison', []) if change['regression']]
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+
+    def _print_comparison(self, changes):
+        regressions = [change for change in changes if change['regression']]
+        for change in regressions:
+            self.stdout.write(self.style.WARNING(
+                f'Регрессия {change["case"]} {change["metric"]}: '
+                f'{change["baseline"]} -> {change["current"]} ({change["change"]:+.1%})'
+            ))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'Регрессий нет, сравнено метрик: {len(changes)}'))
@@ -0,0 +1,111 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from convertors.benchmarks import compare_with_baseline, environment, load_report, save_report
+from convertors.html_benchmarks import CORPUS, run_corpus, write_stub_renderer
+
+RENDERER_STUB = 'stub'
+RENDERER_WKHTMLTOPDF = 'wkhtmltopdf'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест конвертации HTML в PDF через API: запросы отправляются тестовым клиентом '
+        'Django с заданной конкурентностью на синтетических документах от счета до отчета '
+        'на 500 страниц. Работает с настоящим wkhtmltopdf или с заглушкой без сети и установки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--document',
+            action='append',
+            dest='documents',
+            choices=list(CORPUS),
+            help='Документ корпуса (можно несколько), по умолчанию все',
+        )
+        parser.add_argument(
+            '--renderer',
+            choices=[RENDERER_STUB, RENDERER_WKHTMLTOPDF],
+            default=RENDERER_STUB,
+            help='stub - заглушка, wkhtmltopdf - бинарный файл из WKHTMLTOPDF_PATH',
+        )
+        parser.add_argument('--requests', type=int, default=20, help='Измеряемых запросов на документ')
+        parser.add_argument('--concurrency', type=int, default=4, help='Одновременных клиентов')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запросов на документ')
+        parser.add_argument('--workers', type=int, help='Процессов в пуле wkhtmltopdf')
+        parser.add_argument('--max-queue', type=int, help='Размер очереди пула wkhtmltopdf')
+        parser.add_argument(
+            '--repeat-html',
+            action='store_true',
+            help='Отправлять одинаковый HTML, чтобы повторные запросы обслуживал кэш конвертаций',
+        )
+        parser.add_argument('--output', help='Файл для сохранения результатов в JSON')
+        parser.add_argument('--baseline', help='JSON с результатами базового прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.1, help='Допустимый относительный рост метрики')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Завершиться с ошибкой при регрессии')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть больше нуля')
+
+        pool_settings = dict(settings.WKHTMLTOPDF_POOL)
+        if options['workers']:
+            pool_settings['WORKERS'] = options['workers']
+        if options['max_queue'] is not None:
+            pool_settings['MAX_QUEUE'] = options['max_queue']
+
+        with tempfile.TemporaryDirectory(prefix='html_benchmark_') as directory:
+            binary = settings.WKHTMLTOPDF_PATH
+            if options['renderer'] == RENDERER_STUB:
+                binary = write_stub_renderer(directory)
+
+            with override_settings(WKHTMLTOPDF_PATH=binary, WKHTMLTOPDF_POOL=pool_settings):
+                results = dict(self._run(options))
+
+        report = {
+            'environment': {**environment(), 'renderer': options['renderer'], 'pool': pool_settings},
+            'results': results,
+        }
+        if options['baseline']:
+            baseline = load_report(options['baseline'])
+            report['comparison'] = compare_with_baseline(
+                results, baseline.get('results', {}), options['threshold'],
+            )
+
+        if options['output']:
+            save_report(options['output'], report)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+        regressions = [change for change in report.get('comparison', []) if change['regression']]
+        for change in regressions:
+            self.stdout.write(self.style.WARNING(
+                f'Регрессия {change["case"]} {change["metric"]}: '
+                f'{change["baseline"]} -> {change["current"]} ({change["change"]:+.1%})'
+            ))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+
+    def _run(self, options):
+        for name, result in run_corpus(
+            options['documents'] or list(CORPUS),
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+            unique=not options['repeat_html'],
+        ):
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f'{name}: {result["error"]}'))
+            else:
+                self.stdout.write(
+                    f'{name} ({result["html_size"]} B): {result["requests_per_s"]} req/s, '
+                    f'p50 {result["p50_ms"]} ms, p99 {result["p99_ms"]} ms, '
+                    f'статусы {result["status_counts"]}, '
+                    f'CPU приложения {result["app_cpu_ms_per_request"]} ms/запрос, '
+                    f'CPU рендерера {result["renderer_cpu_ms_per_request"]} ms/запрос, '
+                    f'RSS рендерера {result["renderer_peak_rss_mb"]} MB, '
+                    f'подготовка HTML {result["prepare_ms"]} ms'
+                )
+            yield name, result
@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_user_document_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Document = apps.get_model('documents', 'Document')
+    DocumentAccess = apps.get_model('documents', 'DocumentAccess')
+    UserDocumentStats = apps.get_model('documents', 'UserDocumentStats')
+
+    owned = {
+        row['owner_id']: row
+        for row in Document.objects.values('owner_id').annotate(
+            count=models.Count('id'),
+            size=models.Sum('file_size'),
+        )
+    }
+    shared = dict(
+        DocumentAccess.objects.filter(is_active=True)
+        .values('user_id')
+        .annotate(count=models.Count('id'))
+        .values_list('user_id', 'count')
+    )
+    UserDocumentStats.objects.bulk_create(
+        [
+            UserDocumentStats(
+                user_id=user_id,
+                documents_count=owned.get(user_id, {}).get('count', 0),
+                total_bytes=owned.get(user_id, {}).get('size') or 0,
+                shared_with_me_count=shared.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('id', flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('documents', '0003_conversionjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDocumentStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('documents_count', models.PositiveIntegerField(default=0)),
+                ('shared_with_me_count', models.PositiveIntegerField(default=0)),
+                ('total_bytes', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='document_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentaccess',
+            index=models.Index(fields=['user', '-granted_at', '-id'], name='access_user_granted_idx'),
+        ),
+        migrations.RunPython(fill_user_document_stats, migrations.RunPython.noop),
+    ]
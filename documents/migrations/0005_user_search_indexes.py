@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import migrations
+
+SQLITE_FTS_TABLE = 'documents_user_search'
+
+
+def _user_table(apps):
+    return apps.get_model(*settings.AUTH_USER_MODEL.split('.'))._meta.db_table
+
+
+def create_search_indexes(apps, schema_editor):
+    user_table = schema_editor.quote_name(_user_table(apps))
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in ('username', 'email'):
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS user_search_{column}_trgm '
+                f'ON {user_table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+            )
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS user_search_{column}_prefix '
+                f'ON {user_table} (UPPER({column}::text) text_pattern_ops)'
+            )
+
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5("
+            f"username, email, content={user_table}, content_rowid='id', prefix='1 2 3')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SQLITE_FTS_TABLE}_insert AFTER INSERT ON {user_table} BEGIN '
+            f'INSERT INTO {SQLITE_FTS_TABLE}(rowid, username, email) VALUES (new.id, new.username, new.email); '
+            f'END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SQLITE_FTS_TABLE}_delete AFTER DELETE ON {user_table} BEGIN '
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, username, email) "
+            f"VALUES ('delete', old.id, old.username, old.email); "
+            f'END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SQLITE_FTS_TABLE}_update AFTER UPDATE OF username, email ON {user_table} BEGIN '
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, username, email) "
+            f"VALUES ('delete', old.id, old.username, old.email); "
+            f'INSERT INTO {SQLITE_FTS_TABLE}(rowid, username, email) VALUES (new.id, new.username, new.email); '
+            f'END'
+        )
+        schema_editor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        for column in ('username', 'email'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS user_search_{column}_trgm')
+            schema_editor.execute(f'DROP INDEX IF EXISTS user_search_{column}_prefix')
+
+    elif vendor == 'sqlite':
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{action}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_userdocumentstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_storedblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatabaseMetricSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=64)),
+                ('subject', models.CharField(blank=True, default='', max_length=255)),
+                ('resolution', models.PositiveIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('count', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'timestamp'], name='documents_d_resolut_052c1a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('metric', 'subject', 'resolution', 'timestamp'), name='unique_database_metric_sample')],
+            },
+        ),
+    ]
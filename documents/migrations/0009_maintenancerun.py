@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_databasemetricsample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=255)),
+                ('action', models.CharField(choices=[('vacuum_analyze', 'VACUUM (ANALYZE)'), ('analyze', 'ANALYZE')], max_length=20)),
+                ('reason', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('done', 'Выполнено'), ('skipped', 'Пропущено'), ('failed', 'Ошибка')], max_length=20)),
+                ('dead_tuples', models.PositiveBigIntegerField(default=0)),
+                ('size_before', models.BigIntegerField(blank=True, null=True)),
+                ('size_after', models.BigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['table', 'started_at'], name='documents_m_table_faef9e_idx')],
+            },
+        ),
+    ]
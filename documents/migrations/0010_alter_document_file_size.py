@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_maintenancerun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file_size',
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
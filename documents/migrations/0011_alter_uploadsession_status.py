@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_alter_document_file_size'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('active', 'Загружается'), ('complete', 'Завершена'), ('expired', 'Истекла'), ('rejected', 'Отклонена')], default='active', max_length=20),
+        ),
+    ]
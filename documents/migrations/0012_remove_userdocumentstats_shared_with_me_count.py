@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_alter_uploadsession_status'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userdocumentstats',
+            name='shared_with_me_count',
+        ),
+    ]
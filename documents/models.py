@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.files.storage import storages
 import uuid
 import os
 
@@ -12,6 +13,11 @@ def document_upload_to(instance, filename):
     return os.path.join('documents', new_filename)
 
 
+def document_storage():
+    """Хранилище файлов документов из settings.STORAGES['documents']"""
+    return storages['documents']
+
+
 class Document(models.Model):
     ACCESS_LEVELS = [
         ('private', 'Приватный'),
@@ -33,7 +39,7 @@ class Document(models.Model):
         ('deleted', 'Удален'),
     ]
 
-    file = models.FileField(upload_to=document_upload_to)
+    file = models.FileField(upload_to=document_upload_to, storage=document_storage)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -45,7 +51,7 @@ class Document(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     file_type = models.CharField(max_length=10, choices=FILE_TYPES)
-    file_size = models.PositiveIntegerField()
+    file_size = models.PositiveBigIntegerField()
     version = models.PositiveIntegerField(default=1)
     status = models.CharField(max_length=20, choices=FILE_STATUSES, default='draft')
     default_access = models.CharField(
@@ -60,6 +66,7 @@ class Document(models.Model):
             models.Index(fields=['uuid']),
             models.Index(fields=['owner']),
             models.Index(fields=['status']),
+            models.Index(fields=['owner', '-created_at', '-id'], name='document_owner_created_idx'),
         ]
         ordering = ['-created_at']
 
@@ -108,4 +115,276 @@ class DocumentAccess(models.Model):
         indexes = [
             models.Index(fields=['document', 'user']),
             models.Index(fields=['expires_at']),
+            models.Index(fields=['user', '-granted_at', '-id'], name='access_user_granted_idx'),
+        ]
+
+
+class ConversionJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='conversion_jobs',
+    )
+    mode = models.CharField(max_length=50)
+    title = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_QUEUED)
+    form_data = models.JSONField(default=dict, blank=True)
+    source_files = models.JSONField(default=list, blank=True)
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.SET_NULL,
+        related_name='conversion_jobs',
+        blank=True,
+        null=True,
+    )
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'status']),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.mode}: {self.title} ({self.status})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @property
+    def wait_time(self):
+        """Время ожидания в очереди в секундах"""
+        if not self.started_at:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+
+    @property
+    def run_time(self):
+        """Время выполнения конвертации в секундах"""
+        if not self.started_at or not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+
+class UserDocumentStats(models.Model):
+    """
+    Денормализованные счетчики документов пользователя для личного кабинета
+
+    Доступы к чужим документам не учитываются: они истекают по времени без
+    изменения записи, поэтому считаются вместе со списком (shared_documents_count).
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document_stats',
+    )
+    documents_count = models.PositiveIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user}: {self.documents_count} док., {self.total_bytes} байт"
+
+    @classmethod
+    def recalculate(cls, user_id: int) -> 'UserDocumentStats':
+        """Пересчитывает счетчики пользователя по таблице документов"""
+        owned = Document.objects.filter(owner_id=user_id).aggregate(
+            count=models.Count('id'),
+            size=models.Sum('file_size'),
+        )
+        stats, _ = cls.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'documents_count': owned['count'],
+                'total_bytes': owned['size'] or 0,
+            },
+        )
+        return stats
+
+    @classmethod
+    def for_user(cls, user) -> 'UserDocumentStats':
+        """Возвращает счетчики пользователя, создавая их при первом обращении"""
+        stats = cls.objects.filter(user=user).first()
+        return stats if stats is not None else cls.recalculate(user.id)
+
+
+class UploadSession(models.Model):
+    """Сессия загрузки файла частями с возможностью продолжения после обрыва"""
+
+    TARGET_DOCUMENT = 'document'
+    TARGET_CONVERSION = 'conversion'
+    TARGETS = [
+        (TARGET_DOCUMENT, 'Документ'),
+        (TARGET_CONVERSION, 'Конвертация'),
+    ]
+    STATUS_ACTIVE = 'active'
+    STATUS_COMPLETE = 'complete'
+    STATUS_EXPIRED = 'expired'
+    STATUS_REJECTED = 'rejected'
+    STATUSES = [
+        (STATUS_ACTIVE, 'Загружается'),
+        (STATUS_COMPLETE, 'Завершена'),
+        (STATUS_EXPIRED, 'Истекла'),
+        (STATUS_REJECTED, 'Отклонена'),
+    ]
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, default='application/octet-stream')
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    target = models.CharField(max_length=20, choices=TARGETS, default=TARGET_DOCUMENT)
+    mode = models.CharField(max_length=50, blank=True, default='')
+    title = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_ACTIVE)
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.SET_NULL,
+        related_name='upload_sessions',
+        blank=True,
+        null=True,
+    )
+    job = models.ForeignKey(
+        ConversionJob,
+        on_delete=models.SET_NULL,
+        related_name='upload_sessions',
+        blank=True,
+        null=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
         ]
+
+    def __str__(self):
+        return f"{self.filename}: {self.received}/{self.size} ({self.status})"
+
+    @property
+    def is_complete(self) -> bool:
+        return self.received == self.size
+
+
+class StoredBlob(models.Model):
+    """Файл в хранилище с адресацией по содержимому и счетчиком ссылок на него"""
+
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} ссылок)"
+
+
+class DatabaseMetricSample(models.Model):
+    """
+    Точка временного ряда метрики состояния базы.
+
+    Каждый замер добавляется в интервал (bucket) каждого разрешения: строка хранит среднее,
+    минимум, максимум и количество замеров интервала, поэтому грубые разрешения
+    не нужно пересчитывать из сырых данных.
+    """
+
+    metric = models.CharField(max_length=64)
+    # Объект метрики: таблица, база данных или состояние процесса, пустая строка для общих метрик
+    subject = models.CharField(max_length=255, blank=True, default='')
+    # Длина интервала в секундах
+    resolution = models.PositiveIntegerField()
+    timestamp = models.DateTimeField()
+    value = models.FloatField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'subject', 'resolution', 'timestamp'],
+                name='unique_database_metric_sample',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}[{self.subject}] {self.timestamp} ({self.resolution} с): {self.value}"
+
+
+class MaintenanceRun(models.Model):
+    """Обслуживание одной таблицы базы планировщиком: команда, результат, длительность и освобожденное место"""
+
+    ACTION_VACUUM_ANALYZE = 'vacuum_analyze'
+    ACTION_ANALYZE = 'analyze'
+    ACTIONS = [
+        (ACTION_VACUUM_ANALYZE, 'VACUUM (ANALYZE)'),
+        (ACTION_ANALYZE, 'ANALYZE'),
+    ]
+    STATUS_DONE = 'done'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_DONE, 'Выполнено'),
+        (STATUS_SKIPPED, 'Пропущено'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    table = models.CharField(max_length=255)
+    action = models.CharField(max_length=20, choices=ACTIONS)
+    reason = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUSES)
+    dead_tuples = models.PositiveBigIntegerField(default=0)
+    size_before = models.BigIntegerField(blank=True, null=True)
+    size_after = models.BigIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'started_at']),
+        ]
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.table} ({self.status})"
+
+    @property
+    def duration(self) -> float:
+        """Длительность обслуживания в секундах"""
+        return (self.finished_at - self.started_at).total_seconds()
+
+    @property
+    def reclaimed_bytes(self):
+        """Освобожденное место в байтах"""
+        if self.size_before is None or self.size_after is None:
+            return None
+        return self.size_before - self.size_after
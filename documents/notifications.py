@@ -0,0 +1,23 @@
+from utils.tasks_utils import run_task
+from .tasks import task_send_email
+
+
+def send_email_about_document(subject, html_message, user_email, user_id):
+    """
+    Метод для запуска таска по отправке письма на почту
+    :param subject: Заголовок письма
+    :param html_message: Текст письма в html
+    :param user_email: Почта пользователя, которому будет отправлено письмо
+    :param user_id: Id пользователя, которому будет отправлено письмо
+    """
+    run_task(
+        task=task_send_email,
+        queue='send_email',
+        task_kwargs={
+            'subject': subject,
+            'html_message': html_message,
+            'to': [user_email],
+        },
+        task_id=f'send_email_about_document_user_id_{user_id}',
+        time_limit=60,
+    )
@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .access import invalidate_document_access
+from .models import Document, DocumentAccess, User, UserDocumentStats
+
+
+def _recalculate_stats(user_id: int) -> None:
+    # Пользователь мог быть удален вместе с документами каскадом
+    if User.objects.filter(pk=user_id).exists():
+        UserDocumentStats.recalculate(user_id)
+
+
+def _shift_stats(user_id: int, documents: int = 0, size: int = 0) -> None:
+    """Атомарно изменяет счетчики пользователя; отсутствующая строка пересчитывается целиком"""
+    updated = UserDocumentStats.objects.filter(user_id=user_id).update(
+        documents_count=Greatest(F('documents_count') + documents, 0),
+        total_bytes=Greatest(F('total_bytes') + size, 0),
+    )
+    if not updated:
+        transaction.on_commit(lambda: _recalculate_stats(user_id))
+
+
+@receiver(pre_save, sender=Document)
+def remember_document_counters(sender, instance, **kwargs):
+    """Запоминает владельца, размер и файл документа до изменения"""
+    # Незафиксированный файл будет сохранен в хранилище при этом сохранении документа
+    instance._file_uploaded = bool(instance.file) and not instance.file._committed
+    if instance.pk is None:
+        instance._previous_counters = None
+        return
+
+    previous = Document.objects.filter(pk=instance.pk).values_list('owner_id', 'file_size', 'file').first()
+    instance._previous_counters = previous[:2] if previous else None
+    instance._previous_file = previous[2] if previous else None
+
+
+@receiver(post_save, sender=Document)
+def update_stats_on_document_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_counters', None)
+    if created or previous is None:
+        _shift_stats(instance.owner_id, documents=1, size=instance.file_size)
+        return
+
+    previous_owner_id, previous_size = previous
+    if previous_owner_id != instance.owner_id:
+        _shift_stats(previous_owner_id, documents=-1, size=-previous_size)
+        _shift_stats(instance.owner_id, documents=1, size=instance.file_size)
+    elif previous_size != instance.file_size:
+        _shift_stats(instance.owner_id, size=instance.file_size - previous_size)
+
+
+@receiver(post_delete, sender=Document)
+def update_stats_on_document_delete(sender, instance, **kwargs):
+    _shift_stats(instance.owner_id, documents=-1, size=-instance.file_size)
+
+
+def _release_file(storage, name: str) -> None:
+    # Файл освобождается после коммита, чтобы откат транзакции не оставил документ без файла
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=Document)
+def release_file_on_document_delete(sender, instance, **kwargs):
+    """Освобождает ссылку на файл удаленного документа"""
+    _release_file(instance.file.storage, instance.file.name)
+
+
+@receiver(post_save, sender=Document)
+def release_replaced_file(sender, instance, created, raw=False, **kwargs):
+    """
+    Освобождает ссылку на прежний файл, если документу загрузили новый
+
+    Повторная загрузка того же содержимого в ContentAddressedStorage дает то же имя,
+    но добавляет ссылку, поэтому прежняя ссылка освобождается и в этом случае.
+    """
+    previous_file = getattr(instance, '_previous_file', None)
+    replaced = getattr(instance, '_file_uploaded', False) or previous_file != instance.file.name
+    if not raw and not created and previous_file and replaced:
+        _release_file(instance.file.storage, previous_file)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=DocumentAccess)
+@receiver(post_delete, sender=DocumentAccess)
+def invalidate_access_cache(sender, instance, **kwargs):
+    """Сбрасывает кэш прав при изменении документа или выдачи доступа"""
+    document_id = instance.pk if sender is Document else instance.document_id
+    transaction.on_commit(lambda: invalidate_document_access(document_id))
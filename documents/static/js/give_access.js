@@ -1,5 +1,7 @@
 $(document).ready(function() {
     const userSearchUrl = '/documents/user-search/';
+    // Курсоры следующих страниц по строке поиска: сервер отдает страницы по курсору, а не по номеру
+    const nextCursors = {};
     $('.user-select').select2({
         ajax: {
             url: userSearchUrl,
@@ -8,11 +10,12 @@ $(document).ready(function() {
             data: function(params) {
                 return {
                     q: params.term,
-                    page: params.page
+                    cursor: params.page ? nextCursors[params.term] : ''
                 };
             },
             processResults: function(data, params) {
                 params.page = params.page || 1;
+                nextCursors[params.term] = data.pagination.cursor;
                 return {
                     results: data.results,
                     pagination: {
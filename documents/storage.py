@@ -0,0 +1,79 @@
+import hashlib
+import os
+import posixpath
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище с адресацией по SHA-256 содержимого.
+
+    Файл сохраняется под именем blobs/ab/cd/<sha256>.<расширение>, поэтому
+    одинаковые файлы хранятся один раз. Количество ссылок на файл ведется
+    в StoredBlob: delete уменьшает счетчик и удаляет файл только вместе
+    с последней ссылкой. Файлы, сохраненные до перехода на это хранилище,
+    читаются и удаляются как обычно.
+    """
+
+    BLOB_DIR = 'blobs'
+    HASH_CHUNK_SIZE = 64 * 1024
+
+    @staticmethod
+    def _blob_model():
+        # Модели загружаются позже хранилища, которое создается при объявлении Document.file
+        return apps.get_model('documents', 'StoredBlob')
+
+    @classmethod
+    def _hash(cls, content):
+        hasher = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks(cls.HASH_CHUNK_SIZE):
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            hasher.update(chunk)
+            size += len(chunk)
+        content.seek(0)
+        return hasher.hexdigest(), size
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяется содержимым в _save, одинаковые имена допустимы
+        return name
+
+    def _save(self, name, content):
+        digest, size = self._hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        blob_name = posixpath.join(self.BLOB_DIR, digest[:2], digest[2:4], f'{digest}{extension}')
+
+        StoredBlob = self._blob_model()
+        with transaction.atomic():
+            blob, _ = StoredBlob.objects.select_for_update().get_or_create(
+                name=blob_name,
+                defaults={'sha256': digest, 'size': size},
+            )
+            if not super().exists(blob_name):
+                super()._save(blob_name, content)
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+        return blob_name
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+
+        StoredBlob = self._blob_model()
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                super().delete(name)
+                return
+
+            if blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+
+            blob.delete()
+            super().delete(name)
@@ -4,10 +4,12 @@ from celery import shared_task
 from django.core.mail import send_mail
 from django.utils.html import strip_tags
 
+from utils import metrics
 from utils.pdf.generate_pdf import convert_html_to_pdf
 
 
 @shared_task(acks_late=True, bind=True)
+@metrics.timed('task_generate_pdf_from_html')
 def task_generate_pdf_from_html(self, **kwargs):
     """Таск для запуска convert_html_to_pdf"""
     try:
@@ -20,6 +22,52 @@ def task_generate_pdf_from_html(self, **kwargs):
 
 
 @shared_task(acks_late=True, bind=True)
+@metrics.timed('task_run_conversion_job')
+def task_run_conversion_job(self, job_id):
+    """Таск для выполнения задачи конвертации документа"""
+    from documents.jobs import run_conversion_job
+
+    run_conversion_job(job_id)
+
+
+@shared_task(bind=True)
+@metrics.timed('task_cleanup_expired_uploads')
+def task_cleanup_expired_uploads(self):
+    """Таск для удаления временных файлов брошенных загрузок частями"""
+    from documents.uploads import cleanup_expired_uploads
+
+    return cleanup_expired_uploads()
+
+
+@shared_task(bind=True)
+@metrics.timed('task_cleanup_stale_conversion_jobs')
+def task_cleanup_stale_conversion_jobs(self):
+    """Таск для завершения задач конвертации, процесс которых был убит по времени"""
+    from documents.jobs import cleanup_stale_conversion_jobs
+
+    return cleanup_stale_conversion_jobs()
+
+
+@shared_task(bind=True)
+@metrics.timed('task_sample_database_health')
+def task_sample_database_health(self):
+    """Таск для сохранения метрик состояния базы во временные ряды"""
+    from documents.db_health import sample_database_health
+
+    return sample_database_health()
+
+
+@shared_task(bind=True)
+@metrics.timed('task_run_database_maintenance')
+def task_run_database_maintenance(self):
+    """Таск для обслуживания таблиц базы в окне обслуживания"""
+    from documents.maintenance import run_database_maintenance
+
+    return len(run_database_maintenance())
+
+
+@shared_task(acks_late=True, bind=True)
+@metrics.timed('task_send_email')
 def task_send_email(self, subject, html_message, to):
     plain_message = strip_tags(html_message)
     send_mail(subject, plain_message, os.getenv('EMAIL_HOST_USER'), to, html_message=html_message)
@@ -1,3 +1,678 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from convertors.cache import CachedResult, ConversionCache, FileSystemCacheBackend
+from convertors.document_converters import PdfToWordConverter
+from utils.database.maintenance import (
+    ACTION_ANALYZE,
+    ACTION_VACUUM_ANALYZE,
+    MaintenanceLockTimeout,
+    PostgresMaintenanceBackend,
+    TableStats,
+    maintenance_window_end,
+    plan_maintenance,
+)
+from .access import PERMISSION_EDIT, PERMISSION_OWNER, PERMISSION_VIEW, get_permission, invalidate_document_access
+from .checks import check_document_access_cache
+from .jobs import TIME_LIMIT_ERROR, cleanup_stale_conversion_jobs, enqueue_conversion_job, run_conversion_job
+from .listing import shared_documents_count, shared_documents_page
+from .maintenance import run_database_maintenance
+from .models import ConversionJob, Document, DocumentAccess, MaintenanceRun, StoredBlob, UserDocumentStats
+from .storage import ContentAddressedStorage
+
+NOW = datetime(2026, 10, 17, 3, 0, tzinfo=dt_timezone.utc)
+POLICY = {
+    'MAX_TABLES_PER_RUN': 5,
+    'MIN_DEAD_TUPLES': 1000,
+    'DEAD_TUPLES_RATIO': 0.1,
+    'MIN_MODIFIED_TUPLES': 1000,
+    'ANALYZE_RATIO': 0.1,
+    'MIN_INTERVAL': 6 * 60 * 60,
+    'WINDOWS': ['02:00-05:00'],
+    'LOCK_TIMEOUT': 5000,
+    'STATEMENT_TIMEOUT': 60000,
+    'ENABLED': True,
+}
+
+
+def table(name, live=10000, dead=0, modified=0, operations=0, last_vacuum=None, last_analyze=None):
+    return TableStats('public', name, live, dead, modified, 8192, operations, last_vacuum, last_analyze)
+
+
+class PlanMaintenanceTests(SimpleTestCase):
+    def test_thresholds(self):
+        tasks = plan_maintenance(
+            [
+                table('bloated', dead=5000),
+                table('few_dead', dead=900),
+                table('low_ratio', live=100000, dead=5000),
+                table('stale_stats', modified=2000),
+                table('fresh_stats', modified=500),
+                table('clean'),
+            ],
+            POLICY,
+            NOW,
+        )
+        self.assertEqual(
+            [(task.table, task.action) for task in tasks],
+            [('bloated', ACTION_VACUUM_ANALYZE), ('stale_stats', ACTION_ANALYZE)],
+        )
+
+    def test_recently_maintained_tables_are_skipped(self):
+        recent = NOW - timedelta(hours=1)
+        tasks = plan_maintenance(
+            [
+                table('vacuumed', dead=5000, last_vacuum=recent),
+                table('analyzed', modified=5000, last_analyze=recent),
+                table('old', dead=5000, last_vacuum=NOW - timedelta(days=1)),
+            ],
+            POLICY,
+            NOW,
+        )
+        self.assertEqual([task.table for task in tasks], ['old'])
+
+    def test_vacuum_before_analyze_and_by_priority(self):
+        tasks = plan_maintenance(
+            [
+                table('analyze_hot', modified=9000, operations=10 ** 6),
+                table('vacuum_low', dead=2000),
+                table('vacuum_high', dead=8000),
+                table('vacuum_loaded', dead=2000, operations=10 ** 6),
+            ],
+            POLICY,
+            NOW,
+        )
+        self.assertEqual(
+            [task.table for task in tasks],
+            ['vacuum_loaded', 'vacuum_high', 'vacuum_low', 'analyze_hot'],
+        )
+
+    def test_max_tables_per_run(self):
+        stats = [table(f't{number}', dead=2000 + number) for number in range(10)]
+        tasks = plan_maintenance(stats, {**POLICY, 'MAX_TABLES_PER_RUN': 3}, NOW)
+        self.assertEqual([task.table for task in tasks], ['t9', 't8', 't7'])
+
+
+class PostgresMaintenanceBackendTests(SimpleTestCase):
+    def test_same_named_tables_keep_their_own_load(self):
+        diagnostics = mock.Mock()
+        diagnostics.fetch.return_value = {'rows': [
+            ('public', 'documents', 100, 10, 5, 8192, 7, None, None),
+            ('archive', 'documents', 200, 20, 0, 16384, 90000, None, None),
+        ]}
+
+        stats = PostgresMaintenanceBackend(diagnostics).table_stats()
+
+        diagnostics.fetch.assert_called_once_with('table_bloat')
+        self.assertEqual(
+            [(table.schema, table.table, table.operations) for table in stats],
+            [('public', 'documents', 7), ('archive', 'documents', 90000)],
+        )
+
+
+@override_settings(TIME_ZONE='UTC')
+class MaintenanceWindowTests(SimpleTestCase):
+    def at(self, hour, minute=0, day=17):
+        return datetime(2026, 10, day, hour, minute, tzinfo=dt_timezone.utc)
+
+    def test_inside_window(self):
+        self.assertEqual(maintenance_window_end(self.at(3), ['02:00-05:00']), self.at(5))
+
+    def test_outside_window(self):
+        self.assertIsNone(maintenance_window_end(self.at(5), ['02:00-05:00']))
+        self.assertIsNone(maintenance_window_end(self.at(1, 59), ['02:00-05:00']))
+
+    def test_window_crossing_midnight(self):
+        windows = ['23:00-04:00']
+        self.assertEqual(maintenance_window_end(self.at(23, 30), windows), self.at(4, day=18))
+        self.assertEqual(maintenance_window_end(self.at(1), windows), self.at(4))
+        self.assertIsNone(maintenance_window_end(self.at(12), windows))
+
+    def test_several_windows(self):
+        windows = ['01:00-02:00', '13:00-14:30']
+        self.assertEqual(maintenance_window_end(self.at(13, 15), windows), self.at(14, 30))
+        self.assertIsNone(maintenance_window_end(self.at(3), windows))
+
+
+class FakeMaintenanceBackend:
+    """Статистика и выполнение обслуживания без PostgreSQL"""
+
+    def __init__(self, stats, locked=(), acquired=True, clock=None, duration=0):
+        self.stats = stats
+        self.locked = set(locked)
+        self.acquired = acquired
+        self.clock = clock
+        self.duration = duration
+        self.executed = []
+
+    def table_stats(self):
+        return self.stats
+
+    @contextmanager
+    def exclusive(self):
+        yield self.acquired
+
+    def execute(self, task, lock_timeout, statement_timeout):
+        self.executed.append(task.table)
+        if self.clock is not None:
+            self.clock.advance(self.duration)
+        if task.table in self.locked:
+            raise MaintenanceLockTimeout('canceling statement due to lock timeout')
+        return 10000, 6000
+
+
+class FakeClock:
+    def __init__(self):
+        self.value = 1000.0
+
+    def advance(self, seconds):
+        self.value += seconds
+
+    def __call__(self):
+        return self.value
+
+
+@override_settings(TIME_ZONE='UTC', DATABASE_MAINTENANCE=POLICY)
+class RunDatabaseMaintenanceTests(TestCase):
+    def test_done_and_skipped_on_lock_timeout(self):
+        backend = FakeMaintenanceBackend(
+            [table('documents', dead=8000), table('jobs', dead=4000)],
+            locked={'jobs'},
+        )
+        runs = run_database_maintenance(backend, now=NOW)
+
+        self.assertEqual(backend.executed, ['documents', 'jobs'])
+        self.assertEqual(
+            [(run.table, run.status) for run in runs],
+            [('public.documents', MaintenanceRun.STATUS_DONE), ('public.jobs', MaintenanceRun.STATUS_SKIPPED)],
+        )
+        self.assertEqual(runs[0].reclaimed_bytes, 4000)
+        self.assertIn('lock timeout', runs[1].error)
+        self.assertEqual(MaintenanceRun.objects.count(), 2)
+
+    def test_outside_window(self):
+        backend = FakeMaintenanceBackend([table('documents', dead=8000)])
+        self.assertEqual(run_database_maintenance(backend, now=NOW.replace(hour=12)), [])
+        self.assertEqual(backend.executed, [])
+
+    def test_disabled(self):
+        backend = FakeMaintenanceBackend([table('documents', dead=8000)])
+        with self.settings(DATABASE_MAINTENANCE={**settings.DATABASE_MAINTENANCE, 'ENABLED': False}):
+            self.assertEqual(run_database_maintenance(backend, now=NOW), [])
+        self.assertEqual(backend.executed, [])
+
+    def test_other_process_holds_the_lock(self):
+        backend = FakeMaintenanceBackend([table('documents', dead=8000)], acquired=False)
+        self.assertEqual(run_database_maintenance(backend, now=NOW), [])
+        self.assertEqual(backend.executed, [])
+
+    def test_stops_when_window_closes(self):
+        clock = FakeClock()
+        backend = FakeMaintenanceBackend(
+            [table('first', dead=8000), table('second', dead=6000), table('third', dead=4000)],
+            clock=clock,
+            duration=40 * 60,
+        )
+        with mock.patch('documents.maintenance.time.monotonic', clock):
+            runs = run_database_maintenance(backend, now=NOW.replace(hour=4))
+
+        # Окно заканчивается в 05:00: после двух команд по 40 минут новые таблицы не начинаются
+        self.assertEqual(backend.executed, ['first', 'second'])
+        self.assertEqual(len(runs), 2)
+
+
+class DaemonicExecutor:
+    """Пул, который может запустить только accepted задач, как ProcessPoolExecutor в воркере Celery"""
+
+    def __init__(self, accepted=0):
+        self.accepted = accepted
+
+    def submit(self, fn, *args):
+        if self.accepted <= 0:
+            raise AssertionError('daemonic processes are not allowed to have children')
+        self.accepted -= 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@override_settings(PDF_TO_WORD_PARALLEL={'ENABLED': True, 'EXECUTOR': 'process', 'WORKERS': 2, 'WINDOW': 2})
+class PdfToWordParallelTests(SimpleTestCase):
+    PAGES = 4
+
+    def setUp(self):
+        import pymupdf
+
+        fd, self.path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        with pymupdf.open() as document:
+            for number in range(self.PAGES):
+                document.new_page().insert_text((72, 72), f'Страница {number + 1}')
+            document.save(self.path)
+
+    def load_pages(self, executor):
+        with mock.patch('convertors.document_converters.get_executor', return_value=executor):
+            return [page.number for page in PdfToWordConverter()._load_pages(self.path, self.PAGES)]
+
+    def test_sequential_when_pool_cannot_start(self):
+        self.assertEqual(self.load_pages(DaemonicExecutor()), list(range(self.PAGES)))
+
+    def test_sequential_after_pool_fails(self):
+        self.assertEqual(self.load_pages(DaemonicExecutor(accepted=1)), list(range(self.PAGES)))
+
+
+class MediaRootMixin:
+    """Файлы теста сохраняются во временную MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+
+@override_settings(CONVERSION_JOB_TIME_LIMIT=300)
+class ConversionJobTimeLimitTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user('owner', password='password')
+
+    def enqueue(self):
+        with mock.patch('documents.jobs.transaction.on_commit'):
+            job = enqueue_conversion_job(
+                owner=self.user,
+                mode='png_to_jpg',
+                title='Изображение',
+                post=QueryDict(),
+                files=MultiValueDict({'file_content': [SimpleUploadedFile('a.png', b'png', 'image/png')]}),
+            )
+        self.paths = [source['path'] for source in job.source_files]
+        self.assertTrue(all(map(default_storage.exists, self.paths)))
+        return job
+
+    def test_soft_time_limit_fails_job(self):
+        job = self.enqueue()
+        cache = mock.Mock()
+        cache.convert.side_effect = SoftTimeLimitExceeded()
+        with mock.patch('documents.jobs.get_conversion_cache', return_value=cache):
+            job = run_conversion_job(job.id)
+
+        self.assertEqual(job.status, ConversionJob.STATUS_FAILED)
+        self.assertEqual(job.error, TIME_LIMIT_ERROR)
+        self.assertFalse(any(map(default_storage.exists, self.paths)))
+
+    def test_cleanup_stale_running_jobs(self):
+        stale = self.enqueue()
+        stale_paths = self.paths
+        recent = self.enqueue()
+        ConversionJob.objects.filter(id=stale.id).update(
+            status=ConversionJob.STATUS_RUNNING,
+            started_at=timezone.now() - timedelta(seconds=301),
+        )
+        ConversionJob.objects.filter(id=recent.id).update(
+            status=ConversionJob.STATUS_RUNNING,
+            started_at=timezone.now() - timedelta(seconds=10),
+        )
+
+        self.assertEqual(cleanup_stale_conversion_jobs(), 1)
+
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((stale.status, stale.error), (ConversionJob.STATUS_FAILED, TIME_LIMIT_ERROR))
+        self.assertIsNotNone(stale.finished_at)
+        self.assertFalse(any(map(default_storage.exists, stale_paths)))
+        self.assertEqual(recent.status, ConversionJob.STATUS_RUNNING)
+        self.assertTrue(all(map(default_storage.exists, self.paths)))
+
+
+class CountingConverter:
+    """Конвертер, возвращающий входные данные и считающий вызовы"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_cache_key(self, request):
+        return hashlib.sha256(request).hexdigest()
+
+    def convert(self, file_name, request):
+        self.calls += 1
+        return SimpleUploadedFile(f'{file_name}.pdf', request, 'application/pdf')
+
+
+class FileSystemConversionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+
+    def cache_size(self):
+        return sum(
+            os.path.getsize(os.path.join(directory, name))
+            for directory, _, names in os.walk(self.location)
+            for name in names
+            if name.endswith('.bin')
+        )
+
+    def put(self, backend, key, size, age):
+        backend.set(key, CachedResult('pdf', 'application/pdf', b'x' * size))
+        content_path, _ = backend._paths(key)
+        moment = time.time() - age
+        os.utime(content_path, (moment, moment))
+
+    def test_hit_and_miss(self):
+        cache = ConversionCache(FileSystemCacheBackend(self.location, max_size=1024))
+        converter = CountingConverter()
+
+        first = cache.convert(converter, 'report', b'content')
+        second = cache.convert(converter, 'report', b'content')
+
+        self.assertEqual(converter.calls, 1)
+        self.assertEqual((second.name, second.content_type, second.read()), ('report.pdf', 'application/pdf', b'content'))
+        self.assertEqual(first.read(), b'content')
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+        cache.convert(converter, 'report', b'other')
+        self.assertEqual(converter.calls, 2)
+
+    def test_large_entries_are_not_cached(self):
+        cache = ConversionCache(FileSystemCacheBackend(self.location, max_size=1024), max_entry_size=4)
+        converter = CountingConverter()
+
+        cache.convert(converter, 'report', b'content')
+        cache.convert(converter, 'report', b'content')
+        self.assertEqual(converter.calls, 2)
+
+    def test_evicts_least_recently_used(self):
+        backend = FileSystemCacheBackend(self.location, max_size=100)
+        self.put(backend, 'aa_old', 40, age=30)
+        self.put(backend, 'bb_recent', 40, age=20)
+        # Обращение обновляет mtime, поэтому первая запись становится самой свежей
+        self.assertIsNotNone(backend.get('aa_old'))
+        self.put(backend, 'cc_new', 40, age=0)
+
+        self.assertIsNone(backend.get('bb_recent'))
+        self.assertIsNotNone(backend.get('aa_old'))
+        self.assertIsNotNone(backend.get('cc_new'))
+        self.assertLessEqual(self.cache_size(), 90)
+
+    def test_limit_is_shared_between_processes(self):
+        first = FileSystemCacheBackend(self.location, max_size=100, scan_interval=0)
+        second = FileSystemCacheBackend(self.location, max_size=100, scan_interval=0)
+        self.put(first, 'aa', 60, age=10)
+        self.put(second, 'bb', 60, age=0)
+
+        self.assertLessEqual(self.cache_size(), 100)
+        self.assertIsNone(second.get('aa'))
+
+
+class UserDocumentStatsTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='password')
+        self.other = User.objects.create_user('other', password='password')
+
+    def create_document(self, owner, content):
+        return Document.objects.create(
+            owner=owner,
+            title=f'Документ {len(content)}',
+            file=SimpleUploadedFile('document.pdf', content),
+            file_type='pdf',
+            file_size=len(content),
+        )
+
+    def counters(self, user):
+        stats = UserDocumentStats.objects.get(user=user)
+        return stats.documents_count, stats.total_bytes
+
+    def assertCounters(self, user, documents_count, total_bytes):
+        self.assertEqual(self.counters(user), (documents_count, total_bytes))
+        UserDocumentStats.recalculate(user.id)
+        self.assertEqual(self.counters(user), (documents_count, total_bytes))
+
+    def test_missing_row_is_recalculated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_document(self.owner, b'12345')
+        self.assertCounters(self.owner, 1, 5)
+
+    def test_counters_follow_documents(self):
+        UserDocumentStats.recalculate(self.owner.id)
+        UserDocumentStats.recalculate(self.other.id)
+
+        first = self.create_document(self.owner, b'12345')
+        self.create_document(self.owner, b'1234567890')
+        self.assertEqual(self.counters(self.owner), (2, 15))
+
+        first.file_size = 8
+        first.save()
+        self.assertEqual(self.counters(self.owner), (2, 18))
+
+        first.owner = self.other
+        first.save()
+        self.assertEqual(self.counters(self.owner), (1, 10))
+        self.assertEqual(self.counters(self.other), (1, 8))
+
+        first.delete()
+        self.assertCounters(self.other, 0, 0)
+        self.assertCounters(self.owner, 1, 10)
+
+    def test_shared_count_matches_shared_list(self):
+        documents = [self.create_document(self.owner, b'x' * size) for size in (1, 2, 3, 4)]
+        now = timezone.now()
+        for document, is_active, expires_at in (
+            (documents[0], True, None),
+            (documents[1], True, now + timedelta(days=1)),
+            (documents[2], True, now - timedelta(minutes=1)),
+            (documents[3], False, None),
+        ):
+            DocumentAccess.objects.create(
+                document=document,
+                user=self.other,
+                granted_by=self.owner,
+                is_active=is_active,
+                expires_at=expires_at,
+            )
+
+        page = shared_documents_page(self.other, None, 10)
+        self.assertEqual(shared_documents_count(self.other), 2)
+        self.assertEqual(len(page.items), 2)
+
+
+# В тестах кэш прав локальный: все обращения идут из одного процесса
+ACCESS_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'document_access': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'document-access-tests',
+    },
+}
+
+
+@override_settings(CACHES=ACCESS_CACHES)
+class DocumentAccessCacheTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.owner = User.objects.create_user('owner', password='password')
+        self.reader = User.objects.create_user('reader', password='password')
+        self.document = Document.objects.create(
+            owner=self.owner,
+            title='Документ',
+            file=SimpleUploadedFile('document.pdf', b'%PDF'),
+            file_type='pdf',
+            file_size=4,
+        )
+        self.cache = caches['document_access']
+        self.cache.clear()
+
+    def version_key(self):
+        return f'document_access_version:{self.document.pk}'
+
+    def grant(self, permissions):
+        with self.captureOnCommitCallbacks(execute=True):
+            return DocumentAccess.objects.create(
+                document=self.document,
+                user=self.reader,
+                granted_by=self.owner,
+                permissions=permissions,
+            )
+
+    def test_cached_permission_is_reused(self):
+        self.assertEqual(get_permission(self.owner, self.document), PERMISSION_OWNER)
+        self.assertIsNone(get_permission(self.reader, self.document))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_permission(self.reader, self.document))
+
+    def test_grant_changes_invalidate_cached_permissions(self):
+        self.assertIsNone(get_permission(self.reader, self.document))
+        access = self.grant('view')
+        self.assertEqual(get_permission(self.reader, self.document), PERMISSION_VIEW)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            access.permissions = 'edit'
+            access.save()
+        self.assertEqual(get_permission(self.reader, self.document), PERMISSION_EDIT)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            access.delete()
+        self.assertIsNone(get_permission(self.reader, self.document))
+
+    def test_missing_version_key_recomputes_permissions(self):
+        self.assertIsNone(get_permission(self.reader, self.document))
+        # Доступ выдается в обход сигналов, а ключ версии вытесняется из кэша
+        DocumentAccess.objects.bulk_create([DocumentAccess(
+            document=self.document,
+            user=self.reader,
+            granted_by=self.owner,
+            permissions='view',
+        )])
+        self.cache.delete(self.version_key())
+
+        self.assertEqual(get_permission(self.reader, self.document), PERMISSION_VIEW)
+
+    def test_invalidate_without_version_key(self):
+        invalidate_document_access(self.document.pk)
+        version = self.cache.get(self.version_key())
+        self.assertIsNotNone(version)
+
+        invalidate_document_access(self.document.pk)
+        self.assertEqual(self.cache.get(self.version_key()), version + 1)
+
+    def test_uncacheable_documents_are_computed(self):
+        with mock.patch.object(self.cache, 'add', return_value=False):
+            self.assertEqual(get_permission(self.owner, self.document), PERMISSION_OWNER)
+        self.assertIsNone(self.cache.get(self.version_key()))
+
+
+class DocumentAccessCacheCheckTests(SimpleTestCase):
+    def test_local_memory_cache_is_rejected(self):
+        with self.settings(CACHES=ACCESS_CACHES):
+            self.assertEqual([error.id for error in check_document_access_cache(None)], ['documents.E002'])
+
+    def test_missing_alias_is_rejected(self):
+        with self.settings(DOCUMENT_ACCESS_CACHE={**settings.DOCUMENT_ACCESS_CACHE, 'ALIAS': 'missing'}):
+            self.assertEqual([error.id for error in check_document_access_cache(None)], ['documents.E001'])
+
+    def test_default_settings_pass(self):
+        self.assertEqual(check_document_access_cache(None), [])
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = ContentAddressedStorage()
+        self.owner = get_user_model().objects.create_user('owner', password='password')
+
+    def ref_count(self, name):
+        return StoredBlob.objects.get(name=name).ref_count
+
+    def create_document(self, content, title='Документ'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Document.objects.create(
+                owner=self.owner,
+                title=title,
+                file=SimpleUploadedFile('document.pdf', content),
+                file_type='pdf',
+                file_size=len(content),
+            )
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('a.pdf', SimpleUploadedFile('a.pdf', b'content'))
+        second = self.storage.save('b.PDF', SimpleUploadedFile('b.PDF', b'content'))
+        other = self.storage.save('c.docx', SimpleUploadedFile('c.docx', b'content'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('blobs/'))
+        self.assertEqual(self.ref_count(first), 2)
+        self.assertEqual(self.ref_count(other), 1)
+
+    def test_blob_is_deleted_with_last_reference(self):
+        name = self.storage.save('a.pdf', SimpleUploadedFile('a.pdf', b'content'))
+        self.storage.save('b.pdf', SimpleUploadedFile('b.pdf', b'content'))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.ref_count(name), 1)
+
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+
+    def test_files_without_blob_are_deleted(self):
+        name = default_storage.save('documents/legacy.pdf', SimpleUploadedFile('legacy.pdf', b'legacy'))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_deleting_one_of_two_documents_keeps_shared_file(self):
+        first = self.create_document(b'shared content', 'Первый')
+        second = self.create_document(b'shared content', 'Второй')
+        self.assertEqual(first.file.name, second.file.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        with second.file.open('rb') as document_file:
+            self.assertEqual(document_file.read(), b'shared content')
+        self.assertEqual(self.ref_count(second.file.name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.storage.exists(second.file.name))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_reupload_of_the_same_content_keeps_one_reference(self):
+        document = self.create_document(b'content')
+        name = document.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.file = SimpleUploadedFile('document.pdf', b'content')
+            document.save()
+        self.assertEqual(document.file.name, name)
+        self.assertEqual(self.ref_count(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.file = SimpleUploadedFile('document.pdf', b'new content')
+            document.save()
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(self.ref_count(document.file.name), 1)
@@ -0,0 +1,290 @@
+import hashlib
+import hmac
+import os
+import tempfile
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from convertors.registry import get_converter_by_mode
+from utils.lru_cache import LRUCache
+from .jobs import enqueue_conversion_job, save_converted_document
+from .models import Document, UploadSession
+
+UPLOADS_STAGING_DIR = 'uploads'
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Состояние SHA-256 уже принятой части файла по (uuid сессии, смещение).
+# Если состояние вытеснено или части принимал другой процесс, оно восстанавливается с диска.
+_hashers = LRUCache(max_size=256)
+
+
+class UploadError(ValueError):
+    """Ошибка протокола загрузки частями"""
+
+
+class UploadOffsetMismatch(UploadError):
+    """Смещение части не совпадает с количеством уже принятых байт"""
+
+    def __init__(self, expected_offset: int):
+        super().__init__(f'Ожидается часть со смещением {expected_offset}')
+        self.expected_offset = expected_offset
+
+
+class StagedFile(UploadedFile):
+    """
+    Полностью загруженный файл из временной директории.
+
+    Наличие temporary_file_path позволяет FileSystemStorage переместить файл
+    на место вместо копирования содержимого.
+    """
+
+    def __init__(self, path: str, name: str, content_type: str):
+        super().__init__(
+            file=open(path, 'rb'),
+            name=name,
+            content_type=content_type,
+            size=os.path.getsize(path),
+        )
+        self._path = path
+
+    def temporary_file_path(self) -> str:
+        return self._path
+
+
+def get_staging_path(session: UploadSession) -> str:
+    """Путь к временному файлу сессии в MEDIA_ROOT"""
+    return os.path.join(settings.MEDIA_ROOT, UPLOADS_STAGING_DIR, f'{session.uuid}.part')
+
+
+def create_upload_session(
+    owner,
+    filename: str,
+    size: int,
+    title: str = '',
+    content_type: str = '',
+    target: str = UploadSession.TARGET_DOCUMENT,
+    mode: str = '',
+) -> UploadSession:
+    """
+    Создает сессию загрузки и пустой временный файл
+
+    :param owner: Пользователь, загружающий файл
+    :param filename: Имя исходного файла
+    :param size: Полный размер файла в байтах
+    :param title: Заголовок документа, по умолчанию имя файла без расширения
+    :param content_type: MIME-тип файла
+    :param target: Что сделать с файлом после загрузки: создать документ или запустить конвертацию
+    :param mode: Режим конвертации для target='conversion'
+    :raises UploadError: При некорректных параметрах
+    """
+    max_size = settings.CHUNKED_UPLOAD['MAX_SIZE']
+    if size <= 0:
+        raise UploadError('Размер файла должен быть больше нуля')
+    if size > max_size:
+        raise UploadError(f'Размер файла превышает {max_size} байт')
+    if target not in dict(UploadSession.TARGETS):
+        raise UploadError(f'Неизвестное назначение загрузки: {target}')
+    if target == UploadSession.TARGET_CONVERSION:
+        converter = get_converter_by_mode(mode)
+        if converter is None:
+            raise UploadError(f'Неизвестный режим конвертации: {mode}')
+        if converter.SOURCE_IN_POST:
+            raise UploadError(f'Режим {mode} не принимает файлы')
+
+    filename = os.path.basename(filename) or 'upload'
+    title = title or os.path.splitext(filename)[0]
+    if target == UploadSession.TARGET_DOCUMENT:
+        # Те же ограничения проверит DocumentForm при завершении, когда файл уже загружен
+        max_length = Document._meta.get_field('file').max_length
+        if len(filename) > max_length:
+            raise UploadError(f'Имя файла длиннее {max_length} символов')
+        if not title.strip():
+            raise UploadError('Не указан заголовок документа')
+
+    session = UploadSession.objects.create(
+        owner=owner,
+        filename=filename,
+        content_type=content_type or 'application/octet-stream',
+        size=size,
+        target=target,
+        mode=mode if target == UploadSession.TARGET_CONVERSION else '',
+        title=title,
+    )
+
+    path = get_staging_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return session
+
+
+def _get_hasher(session: UploadSession, path: str):
+    hasher = _hashers.get((session.uuid, session.received))
+    if hasher is not None:
+        return hasher.copy()
+
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as staged_file:
+        remaining = session.received
+        while remaining > 0:
+            chunk = staged_file.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+def _check_chunk(session: UploadSession, offset: int, length: int) -> None:
+    if session.status != UploadSession.STATUS_ACTIVE:
+        raise UploadError('Сессия загрузки уже завершена')
+    if offset != session.received:
+        raise UploadOffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise UploadError('Часть выходит за пределы объявленного размера файла')
+
+
+def write_chunk(
+    session: UploadSession,
+    offset: int,
+    stream,
+    length: int,
+    checksum: Optional[str] = None,
+) -> UploadSession:
+    """
+    Дописывает часть файла во временный файл сессии
+
+    Часть сначала читается из потока запроса блоками во временный файл и проверяется,
+    сессия блокируется только на время проверки смещения и дописывания части.
+    SHA-256 файла обновляется по мере записи.
+
+    :param session: Сессия загрузки
+    :param offset: Смещение части в файле
+    :param stream: Поток с содержимым части
+    :param length: Размер части в байтах
+    :param checksum: SHA-256 части в шестнадцатеричном виде для проверки целостности
+    :raises UploadOffsetMismatch: Если смещение не совпадает с принятым размером
+    :raises UploadError: При превышении размера или несовпадении контрольной суммы
+    """
+    if length <= 0:
+        raise UploadError('Пустая часть файла')
+    if length > settings.CHUNKED_UPLOAD['MAX_CHUNK_SIZE']:
+        raise UploadError(f"Размер части превышает {settings.CHUNKED_UPLOAD['MAX_CHUNK_SIZE']} байт")
+    # Предварительная проверка без блокировки, чтобы не принимать заведомо лишнюю часть
+    _check_chunk(session, offset, length)
+
+    path = get_staging_path(session)
+    with tempfile.TemporaryFile(dir=os.path.dirname(path)) as chunk_file:
+        chunk_hasher = hashlib.sha256()
+        written = 0
+        while written < length:
+            data = stream.read(min(COPY_CHUNK_SIZE, length - written))
+            if not data:
+                break
+            chunk_file.write(data)
+            chunk_hasher.update(data)
+            written += len(data)
+
+        if written != length or (
+            checksum and not hmac.compare_digest(chunk_hasher.hexdigest(), checksum.lower())
+        ):
+            # Клиент повторит недописанную или поврежденную часть с того же смещения
+            raise UploadError('Часть получена не полностью или не совпадает контрольная сумма')
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            _check_chunk(session, offset, length)
+
+            file_hasher = _get_hasher(session, path)
+            chunk_file.seek(0)
+            with open(path, 'r+b') as staged_file:
+                staged_file.seek(offset)
+                for data in iter(lambda: chunk_file.read(COPY_CHUNK_SIZE), b''):
+                    staged_file.write(data)
+                    file_hasher.update(data)
+
+            session.received = offset + length
+            session.save(update_fields=['received', 'updated_at'])
+            _hashers.set((session.uuid, session.received), file_hasher)
+
+    return session
+
+
+def finalize_upload(session: UploadSession, sha256: Optional[str] = None) -> UploadSession:
+    """
+    Завершает загрузку: создает документ или ставит задачу конвертации
+
+    Временный файл перемещается в хранилище без повторного чтения в память.
+    Если файл не принят как документ, сессия отклоняется и временный файл удаляется.
+
+    :param session: Сессия загрузки
+    :param sha256: Ожидаемый SHA-256 всего файла
+    :raises UploadError: Если файл загружен не полностью, не совпала контрольная сумма или файл отклонен
+    """
+    rejection = None
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != UploadSession.STATUS_ACTIVE:
+            raise UploadError('Сессия загрузки уже завершена')
+        if not session.is_complete:
+            raise UploadOffsetMismatch(session.received)
+
+        path = get_staging_path(session)
+        digest = _get_hasher(session, path).hexdigest()
+        if sha256 and not hmac.compare_digest(digest, sha256.lower()):
+            raise UploadError('Контрольная сумма файла не совпадает')
+
+        staged_file = StagedFile(path, session.filename, session.content_type)
+        try:
+            with transaction.atomic():
+                if session.target == UploadSession.TARGET_CONVERSION:
+                    converter = get_converter_by_mode(session.mode)
+                    session.job = enqueue_conversion_job(
+                        owner=session.owner,
+                        mode=session.mode,
+                        title=session.title,
+                        post=QueryDict(),
+                        files=MultiValueDict({converter.SOURCE_FIELD: [staged_file]}),
+                    )
+                else:
+                    session.document = save_converted_document(session.owner, session.title, staged_file)
+        except ValueError as e:
+            # Повторное завершение с тем же файлом тоже не пройдет проверку
+            rejection = UploadError(str(e))
+        finally:
+            staged_file.close()
+
+        session.sha256 = digest
+        session.status = UploadSession.STATUS_COMPLETE if rejection is None else UploadSession.STATUS_REJECTED
+        session.save(update_fields=['sha256', 'status', 'document', 'job', 'updated_at'])
+
+    _remove_staged_file(path)
+    if rejection is not None:
+        raise rejection
+    return session
+
+
+def _remove_staged_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_expired_uploads() -> int:
+    """Удаляет временные файлы сессий, в которые давно не приходили части"""
+    deadline = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD['EXPIRES_AFTER'])
+    expired = UploadSession.objects.filter(status=UploadSession.STATUS_ACTIVE, updated_at__lt=deadline)
+
+    session_ids = []
+    for session in expired.only('id', 'uuid').iterator():
+        _remove_staged_file(get_staging_path(session))
+        session_ids.append(session.id)
+    UploadSession.objects.filter(id__in=session_ids).update(status=UploadSession.STATUS_EXPIRED)
+    return len(session_ids)
@@ -15,6 +15,9 @@ urlpatterns = [
     path('give-access/<uuid:document_uuid>/', views.give_access, name='give_access'),
     path('user-search/', views.user_search, name='user_search'),
     path('document/<uuid:uuid>/', views.document_detail, name='document_detail'),
+    path('document/<uuid:uuid>/download/', views.download_document, name='download_document'),
+    path('job/<uuid:uuid>/', views.conversion_job_detail, name='conversion_job_detail'),
+    path('job/<uuid:uuid>/status/', views.conversion_job_status, name='conversion_job_status'),
     path('profile/', views.profile, name='profile'),
     path(
         '<uuid:document_uuid>/discussion/<int:participant_id>/',
@@ -0,0 +1,189 @@
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+
+from utils.lru_cache import LRUCache
+
+from .listing import KeysetPage
+
+User = get_user_model()
+
+# Виртуальная таблица FTS5 для поиска пользователей в SQLite (создается миграцией)
+SQLITE_FTS_TABLE = 'documents_user_search'
+# Запросы короче длины триграммы ищутся только по префиксу
+TRIGRAM_MIN_LENGTH = 3
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class UserSearchResult(NamedTuple):
+    id: int
+    username: str
+    email: str
+
+
+def encode_user_cursor(result: UserSearchResult) -> str:
+    return f'{result.id}:{result.username}'
+
+
+def decode_user_cursor(cursor: str):
+    """
+    Декодирует курсор страницы поиска
+
+    :raises ValueError: Если курсор поврежден
+    """
+    pk, separator, username = cursor.partition(':')
+    if not separator or not pk.isdigit():
+        raise ValueError('Некорректный курсор')
+    return username, int(pk)
+
+
+class UserSearchBackend:
+    """
+    Поиск пользователей по имени и email с постраничной выдачей по курсору.
+
+    Результаты упорядочены по (username, id), следующая страница начинается
+    сразу после последней записи предыдущей, запрос COUNT(*) не выполняется.
+    Пустой запрос во всех реализациях возвращает пустую страницу.
+    """
+
+    def search(self, query: str, exclude_id: Optional[int], cursor: Optional[str], limit: int) -> KeysetPage:
+        after = decode_user_cursor(cursor) if cursor else None
+        query = query.strip()
+        if not query:
+            return KeysetPage([], None)
+
+        rows = self._fetch(query, exclude_id, after, limit + 1)
+        next_cursor = encode_user_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return KeysetPage(rows[:limit], next_cursor)
+
+    def _fetch(self, query: str, exclude_id, after, limit: int) -> List[UserSearchResult]:
+        queryset = User.objects.filter(self._match(query), is_active=True)
+        if exclude_id is not None:
+            queryset = queryset.exclude(id=exclude_id)
+        if after is not None:
+            username, pk = after
+            queryset = queryset.filter(Q(username__gt=username) | Q(username=username, id__gt=pk))
+
+        return [
+            UserSearchResult(*row)
+            for row in queryset.order_by('username', 'id').values_list('id', 'username', 'email')[:limit]
+        ]
+
+    def _match(self, query: str) -> Q:
+        return Q(username__icontains=query) | Q(email__icontains=query)
+
+
+class PostgresTrigramUserSearchBackend(UserSearchBackend):
+    """
+    Поиск в PostgreSQL по GIN-индексам pg_trgm
+
+    Подстрочный поиск (ILIKE '%q%') использует триграммные индексы на UPPER(username)
+    и UPPER(email). Для запросов короче триграммы выполняется поиск по префиксу,
+    который обслуживается btree-индексами text_pattern_ops.
+    """
+
+    def _match(self, query: str) -> Q:
+        if len(query) < TRIGRAM_MIN_LENGTH:
+            return Q(username__istartswith=query) | Q(email__istartswith=query)
+        return super()._match(query)
+
+
+class SqliteFtsUserSearchBackend(UserSearchBackend):
+    """
+    Поиск в SQLite по таблице FTS5 с префиксными индексами
+
+    Каждое слово запроса ищется как префикс слова в имени пользователя или email
+    (email разбивается на слова по '@' и '.'). Запрос без слов, например '@',
+    ищется подстрокой, как в общей реализации.
+    """
+
+    def _fetch(self, query: str, exclude_id, after, limit: int) -> List[UserSearchResult]:
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return super()._fetch(query, exclude_id, after, limit)
+
+        match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        user_table = connection.ops.quote_name(User._meta.db_table)
+        sql = [
+            f'SELECT u.id, u.username, u.email FROM {SQLITE_FTS_TABLE} AS s '
+            f'JOIN {user_table} AS u ON u.id = s.rowid '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %s AND u.is_active'
+        ]
+        params = [match]
+        if exclude_id is not None:
+            sql.append('AND u.id != %s')
+            params.append(exclude_id)
+        if after is not None:
+            sql.append('AND (u.username > %s OR (u.username = %s AND u.id > %s))')
+            params.extend([after[0], after[0], after[1]])
+        sql.append('ORDER BY u.username, u.id LIMIT %s')
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [UserSearchResult(*row) for row in cursor.fetchall()]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_results_cache = None
+
+
+def get_user_search_backend() -> UserSearchBackend:
+    """Выбирает реализацию поиска по используемой базе данных"""
+    global _backend
+
+    with _backend_lock:
+        if _backend is None:
+            if connection.vendor == 'postgresql':
+                _backend = PostgresTrigramUserSearchBackend()
+            elif connection.vendor == 'sqlite' and SQLITE_FTS_TABLE in connection.introspection.table_names():
+                _backend = SqliteFtsUserSearchBackend()
+            else:
+                _backend = UserSearchBackend()
+
+        return _backend
+
+
+def _get_results_cache() -> LRUCache:
+    global _results_cache
+
+    with _backend_lock:
+        if _results_cache is None:
+            _results_cache = LRUCache(
+                max_size=settings.USER_SEARCH['CACHE_SIZE'],
+                ttl=settings.USER_SEARCH['CACHE_TTL'],
+            )
+        return _results_cache
+
+
+def search_users(query: str, exclude_id: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
+    """
+    Ищет пользователей для выдачи доступа
+
+    Результаты недавних запросов хранятся в LRU-кэше процесса: виджет
+    автодополнения повторяет одни и те же префиксы при наборе и удалении символов.
+
+    :param query: Строка поиска
+    :param exclude_id: Id пользователя, которого нужно исключить из выдачи
+    :param cursor: Курсор следующей страницы из предыдущего ответа
+    :return: Ответ в формате select2 с курсором следующей страницы
+    """
+    limit = settings.USER_SEARCH['PAGE_SIZE']
+    key = (query, exclude_id, cursor, limit)
+    cache = _get_results_cache()
+    response = cache.get(key)
+    if response is None:
+        page = get_user_search_backend().search(query, exclude_id, cursor, limit)
+        response = {
+            'results': [{'id': user.id, 'text': f'{user.username} ({user.email})'} for user in page.items],
+            'pagination': {'more': page.has_next, 'cursor': page.next_cursor},
+        }
+        cache.set(key, response)
+
+    return response
@@ -1,24 +1,26 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 
-from convertors.document_converters import (
-    HtmlToPdfConverter,
-    WordToPdfConverter,
-    ImageToPdfConverter,
-    ImageToGrayscaleConverter, ImageToDistortConverter, PngToJpgConverter, BmpToJpgConverter
-)
+from convertors.registry import get_converter_registry
+from utils import metrics
 from utils.pdf.generate_pdf import convert_word_to_pdf_v2
-from utils.tasks_utils import run_task
+from .access import PERMISSION_OWNER, get_permission, has_permission, resolve_permissions
+from .db_health import DEFAULT_PERIOD, PERIODS, build_charts, load_series, missing_index_candidates
+from .downloads import document_response
 from .forms import DocumentForm, LoginForm, UserRegistrationForm, GiveAccessForm
-from .models import Document, DocumentAccess
-from .tasks import task_send_email
+from .jobs import enqueue_conversion_job
+from .listing import owned_documents_page, shared_documents_count, shared_documents_page
+from .models import ConversionJob, Document, MaintenanceRun, UserDocumentStats
+from .notifications import send_email_about_document
+from .user_search import search_users
 
 User = get_user_model()
 
@@ -26,103 +28,165 @@ User = get_user_model()
 @login_required
 def profile(request):
     """Функция для вывода личного кабинета пользователя"""
-    user = get_object_or_404(User, username=request.user.username)
-    documents = Document.objects.filter(owner=user)
-    accessed_documents = DocumentAccess.objects.filter(user=request.user).prefetch_related('document')
+    page_size = settings.PROFILE_PAGE_SIZE
+    try:
+        documents = owned_documents_page(request.user, request.GET.get('cursor'), page_size)
+        accessed_documents = shared_documents_page(request.user, request.GET.get('shared_cursor'), page_size)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    permissions = resolve_permissions(request.user, [access.document for access in accessed_documents.items])
+    for access in accessed_documents.items:
+        access.effective_permission = permissions[access.document_id]
 
     return render(
         request,
         'registration/profile.html',
-        {'user': user, 'documents': documents, 'accessed_documents': accessed_documents},
+        {
+            'user': request.user,
+            'documents': documents,
+            'accessed_documents': accessed_documents,
+            'stats': UserDocumentStats.for_user(request.user),
+            'shared_count': shared_documents_count(request.user),
+        },
     )
 
 
 @login_required
 def document_detail(request, uuid):
     """Выводит детальную информацию о документе"""
-    document = get_object_or_404(Document, uuid=uuid)
-    return render(request, 'document/document_detail.html', {'document': document})
-
+    document = get_object_or_404(Document.objects.select_related('owner'), uuid=uuid)
+    permission = get_permission(request.user, document)
+    if permission is None:
+        raise Http404
+    return render(request, 'document/document_detail.html', {'document': document, 'permission': permission})
 
-def database_info(request):  # ToDo: добавить шаблон
-    """Выводит информацию о состоянии базы"""
-    return render(request, 'database_info.html')
 
-
-def get_converter_by_mode(mode: str):
-    """Получить конвертер из скрытого html тега"""
-    return {
-        'html': HtmlToPdfConverter(),
-        'word': WordToPdfConverter(),
-        'image': ImageToPdfConverter(),
-        'image_to_grayscale': ImageToGrayscaleConverter(),
-        'png_to_jpg': PngToJpgConverter(),
-        'bmp_to_jpg': BmpToJpgConverter(),
-        'image_distort': ImageToDistortConverter(),
-    }.get(mode)
+@require_http_methods(["GET", "HEAD"])
+def download_document(request, uuid):
+    """Отдает файл документа с поддержкой докачки; ?inline=1 открывает файл в браузере"""
+    document = get_object_or_404(Document, uuid=uuid)
+    if not has_permission(request.user, document):
+        raise Http404
+    return document_response(request, document, as_attachment=not request.GET.get('inline'))
 
 
-def send_email_about_document(subject, html_message, user_email, user_id):
+@staff_member_required
+def database_info(request):
     """
-    Метод для запуска таска по отправке письма на почту
-    :param subject: Заголовок письма
-    :param html_message: Текст письма в html
-    :param user_email: Почта пользователя, которому будет отправлено письмо
-    :param user_id: Id пользователя, которому будет отправлено письмо
+    Выводит состояние базы и графики метрик за период ?period=
+
+    Доступно только персоналу. ?force=1 обновляет текущие результаты без кэша.
     """
-    run_task(
-        task=task_send_email,
-        queue='send_email',
-        task_kwargs={
-            'subject': subject,
-            'html_message': html_message,
-            'to': [user_email],
-        },
-        task_id=f'send_email_about_document_user_id_{user_id}',
-        time_limit=60,
-    )
+    from utils.database.postgresql import get_database_diagnostics
+
+    period = request.GET.get('period', DEFAULT_PERIOD)
+    if period not in PERIODS:
+        return HttpResponseBadRequest(f'Неизвестный период: {period}')
+
+    try:
+        diagnostics = get_database_diagnostics().collect(force=bool(request.GET.get('force')) and request.user.is_staff)
+        error = None
+    except Exception as e:
+        diagnostics, error = None, str(e) or e.__class__.__name__
+
+    series = load_series(period)
+    missing_indexes = missing_index_candidates(diagnostics and diagnostics['queries'], series)
+
+    if request.accepts('application/json') and not request.accepts('text/html'):
+        return JsonResponse(
+            {'diagnostics': diagnostics, 'missing_indexes': missing_indexes, 'error': error},
+            status=503 if error else 200,
+        )
+
+    return render(request, 'database_info.html', {
+        'diagnostics': diagnostics,
+        'error': error,
+        'period': period,
+        'periods': list(PERIODS),
+        'charts': build_charts(series),
+        'missing_indexes': missing_indexes,
+        'maintenance_runs': MaintenanceRun.objects.all()[:10],
+    })
 
 
 @login_required  # ToDo: оптимизировать
+@metrics.timed('upload_document')
 def upload_document(request):
     if request.method == 'POST':
-        upload_type = request.POST.get('upload_type')
+        with metrics.stage('upload_read') as stage:
+            # Тело запроса разбирается при первом обращении к POST и FILES
+            upload_type = request.POST.get('upload_type')
+            stage.add_bytes('in', metrics.request_size(request))
+
         if upload_type == 'direct':
-            form = DocumentForm(request.POST, request.FILES)
-            document = form.save(commit=False)
-            document.owner = request.user
-            document.file_size = document.file.size
-            document.file_type = document.file.name.split('.')[-1].lower()
-            document.save()
+            with metrics.stage('upload_save', mode='direct') as stage:
+                form = DocumentForm(request.POST, request.FILES)
+                document = form.save(commit=False)
+                document.owner = request.user
+                document.file_size = document.file.size
+                document.file_type = document.file.name.split('.')[-1].lower()
+                document.save()
+                stage.add_bytes('out', document.file_size)
             return redirect('document_detail', uuid=document.uuid)
 
         mode = request.POST.get('mode')
-        document_title = request.POST.get('document_title', 'document')
-        convertor = get_converter_by_mode(mode)
-        pdf_file = convertor.convert(file_name=document_title, request=request)
-        form = DocumentForm({'title': document_title}, {'file': pdf_file})
-        if form.is_valid():
-            document = form.save(commit=False)
-            document.owner = request.user
-            document.file_size = document.file.size
-            document.file_type = document.file.name.split('.')[-1]
-            document.save()
-            if request.user.email:
-                send_email_about_document(
-                    subject='Документ загружен',
-                    html_message='Ваш документ был загружен',
-                    user_email=request.user.email,
-                    user_id=request.user.id,
+        document_title = request.POST.get('document_title') or 'document'
+        # Режим из запроса становится меткой метрики, поэтому неизвестные режимы объединяются
+        mode_label = mode if mode in get_converter_registry() else 'unknown'
+        try:
+            with metrics.stage('upload_save', mode=mode_label):
+                job = enqueue_conversion_job(
+                    owner=request.user,
+                    mode=mode,
+                    title=document_title,
+                    post=request.POST,
+                    files=request.FILES,
                 )
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
 
-            return redirect('document_detail', uuid=document.uuid)
-        else:
-            print(form.errors)
+        if request.accepts('application/json') and not request.accepts('text/html'):
+            return JsonResponse({'job_id': str(job.uuid), 'status': job.status}, status=202)
+
+        return redirect('conversion_job_detail', uuid=job.uuid)
     else:
         form = DocumentForm()
     return render(request, 'document/upload_document.html', {'form': form})
 
 
+@login_required
+def conversion_job_detail(request, uuid):
+    """Выводит страницу ожидания задачи конвертации"""
+    job = get_object_or_404(ConversionJob, uuid=uuid, owner=request.user)
+    if job.status == ConversionJob.STATUS_DONE and job.document_id:
+        return redirect('document_detail', uuid=job.document.uuid)
+
+    return render(request, 'document/conversion_job.html', {'job': job})
+
+
+@login_required
+@require_http_methods(["GET"])
+def conversion_job_status(request, uuid):
+    """Возвращает статус задачи конвертации для опроса со страницы ожидания"""
+    job = get_object_or_404(
+        ConversionJob.objects.select_related('document'),
+        uuid=uuid,
+        owner=request.user,
+    )
+    return JsonResponse({
+        'job_id': str(job.uuid),
+        'status': job.status,
+        'error': job.error,
+        'document_url': (
+            reverse('document_detail', kwargs={'uuid': job.document.uuid})
+            if job.document_id else None
+        ),
+        'wait_time': job.wait_time,
+        'run_time': job.run_time,
+    })
+
+
 def get_pdf_from_word(word_file, pdf_file_name, pdf_title):
     # pdf_bytes = convert_word_to_pdf(word_file, pdf_file_name, pdf_title)
     pdf_bytes = convert_word_to_pdf_v2(word_file, pdf_file_name, pdf_title)
@@ -135,8 +199,10 @@ def get_pdf_from_word(word_file, pdf_file_name, pdf_title):
 
 
 def delete_document(request, document_uuid):
-    document = Document.objects.filter(uuid=document_uuid).first()
-    # os.remove(os.path.join(settings.MEDIA_ROOT, 'documents',  f'{document.title}.{document.file_type}'))
+    document = get_object_or_404(Document, uuid=document_uuid)
+    if not has_permission(request.user, document, PERMISSION_OWNER):
+        raise Http404
+    # Файл освобождается сигналом: blob удаляется вместе с последней ссылкой на него
     document.delete()
 
     return redirect('profile')
@@ -179,26 +245,15 @@ def give_access(request, document_uuid):
 
 @require_http_methods(["GET"])
 def user_search(request):
-    search = request.GET.get('q', '')
-    page = int(request.GET.get('page', 1))
-
-    users = User.objects.exclude(id=request.user.id).filter(
-        Q(username__icontains=search) |
-        Q(email__icontains=search)
-    ).order_by('username')
-
-    paginator = Paginator(users, 100)
-    page_obj = paginator.get_page(page)
-
-    results = [{
-        'id': user.id,
-        'text': f"{user.username} ({user.email})"
-    } for user in page_obj]
-
-    return JsonResponse({
-        'results': results,
-        'pagination': {'more': page_obj.has_next()}
-    })
+    """Возвращает пользователей для автодополнения при выдаче доступа"""
+    try:
+        return JsonResponse(search_users(
+            request.GET.get('q', ''),
+            exclude_id=request.user.id,
+            cursor=request.GET.get('cursor') or None,
+        ))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
 
 def base_page(request):
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -140,6 +141,19 @@ LOGOUT_URL = 'logout'
 # MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    # Файлы документов хранятся по SHA-256 содержимого со счетчиком ссылок
+    'documents': {
+        'BACKEND': 'documents.storage.ContentAddressedStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -158,8 +172,222 @@ SPECTACULAR_SETTINGS = {
 
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-expired-uploads': {
+        'task': 'documents.tasks.task_cleanup_expired_uploads',
+        'schedule': 60 * 60,
+    },
+    'cleanup-stale-conversion-jobs': {
+        'task': 'documents.tasks.task_cleanup_stale_conversion_jobs',
+        'schedule': 15 * 60,
+    },
+    'sample-database-health': {
+        'task': 'documents.tasks.task_sample_database_health',
+        'schedule': int(os.getenv('DATABASE_HEALTH_SAMPLE_INTERVAL', 60)),
+        # Пропущенные замеры не выполняются пачкой после простоя воркеров
+        'options': {'expires': int(os.getenv('DATABASE_HEALTH_SAMPLE_INTERVAL', 60))},
+    },
+    'run-database-maintenance': {
+        'task': 'documents.tasks.task_run_database_maintenance',
+        # Вне окон обслуживания таск сразу завершается
+        'schedule': int(os.getenv('DATABASE_MAINTENANCE_INTERVAL', 15 * 60)),
+        'options': {'expires': int(os.getenv('DATABASE_MAINTENANCE_INTERVAL', 15 * 60))},
+    },
+}
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS')
+
+WKHTMLTOPDF_PATH = os.getenv('WKHTMLTOPDF_PATH', r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
+# Пул прогретых процессов wkhtmltopdf для рендеринга HTML в PDF
+WKHTMLTOPDF_POOL = {
+    'WORKERS': int(os.getenv('WKHTMLTOPDF_WORKERS', 2)),
+    'MAX_QUEUE': int(os.getenv('WKHTMLTOPDF_MAX_QUEUE', 16)),
+    # Время рендеринга отсчитывается после получения процесса, ожидание в очереди ограничено отдельно
+    'JOB_TIMEOUT': int(os.getenv('WKHTMLTOPDF_JOB_TIMEOUT', 60)),
+    'QUEUE_TIMEOUT': int(os.getenv('WKHTMLTOPDF_QUEUE_TIMEOUT', 60)),
+    'MAX_JOBS_PER_WORKER': int(os.getenv('WKHTMLTOPDF_MAX_JOBS_PER_WORKER', 200)),
+}
+
+# Конвертация DOCX в PDF: 'html' (HTML + wkhtmltopdf), 'office' (пул LibreOffice) или 'word' (COM, только Windows)
+WORD_TO_PDF_BACKEND = os.getenv('WORD_TO_PDF_BACKEND', 'html')
+# Пул headless LibreOffice под управлением unoserver
+OFFICE_POOL = {
+    'UNOSERVER_PATH': os.getenv('OFFICE_UNOSERVER_PATH', 'unoserver'),
+    'UNOCONVERT_PATH': os.getenv('OFFICE_UNOCONVERT_PATH', 'unoconvert'),
+    'WORKERS': int(os.getenv('OFFICE_POOL_WORKERS', 2)),
+    'MAX_QUEUE': int(os.getenv('OFFICE_POOL_MAX_QUEUE', 8)),
+    # Таймауты конвертации, ожидания свободного экземпляра и запуска нового считаются отдельно
+    'JOB_TIMEOUT': int(os.getenv('OFFICE_POOL_JOB_TIMEOUT', 120)),
+    'QUEUE_TIMEOUT': int(os.getenv('OFFICE_POOL_QUEUE_TIMEOUT', 120)),
+    'START_TIMEOUT': int(os.getenv('OFFICE_POOL_START_TIMEOUT', 60)),
+    'MAX_JOBS_PER_WORKER': int(os.getenv('OFFICE_POOL_MAX_JOBS_PER_WORKER', 100)),
+}
+
+# Кэш результатов конвертации: 'filesystem', 'django' или None для отключения
+CONVERSION_CACHE = {
+    'BACKEND': os.getenv('CONVERSION_CACHE_BACKEND', 'filesystem'),
+    # Директория вне исходного кода, может использоваться несколькими процессами
+    'LOCATION': os.getenv(
+        'CONVERSION_CACHE_LOCATION',
+        os.path.join(tempfile.gettempdir(), 'document_flow', 'conversions'),
+    ),
+    # Общий лимит директории, записи других процессов учитываются с задержкой до SCAN_INTERVAL секунд
+    'MAX_SIZE': int(os.getenv('CONVERSION_CACHE_MAX_SIZE', 512 * 1024 * 1024)),
+    'SCAN_INTERVAL': int(os.getenv('CONVERSION_CACHE_SCAN_INTERVAL', 60)),
+    # Большие результаты (например, многостраничные PDF) не кэшируются, чтобы не читать их в память
+    'MAX_ENTRY_SIZE': int(os.getenv('CONVERSION_CACHE_MAX_ENTRY_SIZE', 32 * 1024 * 1024)),
+    'ALIAS': 'default',
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+# Параллельная подготовка страниц при конвертации изображений в PDF.
+# В воркерах Celery с пулом prefork может потребоваться EXECUTOR = 'thread'.
+IMAGE_TO_PDF_PARALLEL = {
+    'ENABLED': os.getenv('IMAGE_TO_PDF_PARALLEL', 'false').lower() == 'true',
+    'EXECUTOR': os.getenv('IMAGE_TO_PDF_EXECUTOR', 'process'),
+    'WORKERS': int(os.getenv('IMAGE_TO_PDF_WORKERS', os.cpu_count() or 1)),
+    # Максимальное количество страниц, одновременно находящихся в обработке
+    'WINDOW': int(os.getenv('IMAGE_TO_PDF_WINDOW', 2 * (os.cpu_count() or 1))),
+}
+
+# Параллельный разбор страниц при конвертации PDF в DOCX.
+# Конвертация выполняется в воркерах Celery, где пул prefork не позволяет запускать
+# процессы, поэтому для них нужен EXECUTOR = 'thread'
+PDF_TO_WORD_PARALLEL = {
+    'ENABLED': os.getenv('PDF_TO_WORD_PARALLEL', 'false').lower() == 'true',
+    'EXECUTOR': os.getenv('PDF_TO_WORD_EXECUTOR', 'process'),
+    'WORKERS': int(os.getenv('PDF_TO_WORD_WORKERS', os.cpu_count() or 1)),
+    # Максимальное количество страниц, одновременно находящихся в обработке
+    'WINDOW': int(os.getenv('PDF_TO_WORD_WINDOW', 2 * (os.cpu_count() or 1))),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий для всех процессов кэш прав на документы, например
+    # django.core.cache.backends.redis.RedisCache и redis://127.0.0.1:6379/1.
+    # По умолчанию DummyCache: кэш прав выключен, пока не настроен общий кэш
+    'document_access': {
+        'BACKEND': os.getenv('DOCUMENT_ACCESS_CACHE_BACKEND', 'django.core.cache.backends.dummy.DummyCache'),
+        'LOCATION': os.getenv('DOCUMENT_ACCESS_CACHE_LOCATION', ''),
+    },
+}
+
+# Кэш эффективных прав пользователей на документы. ALIAS должен указывать на общий
+# кэш (Redis, Memcached): сброс прав в локальном кэше процесса не виден другим процессам,
+# поэтому LocMemCache отклоняется проверкой documents.E002 при запуске
+DOCUMENT_ACCESS_CACHE = {
+    'ALIAS': os.getenv('DOCUMENT_ACCESS_CACHE_ALIAS', 'document_access'),
+    'TIMEOUT': int(os.getenv('DOCUMENT_ACCESS_CACHE_TIMEOUT', 300)),
+}
+
+# Поиск пользователей для выдачи доступа
+USER_SEARCH = {
+    'PAGE_SIZE': int(os.getenv('USER_SEARCH_PAGE_SIZE', 20)),
+    'CACHE_SIZE': int(os.getenv('USER_SEARCH_CACHE_SIZE', 256)),
+    'CACHE_TTL': int(os.getenv('USER_SEARCH_CACHE_TTL', 30)),
+}
+
+# Количество документов на странице личного кабинета
+PROFILE_PAGE_SIZE = int(os.getenv('PROFILE_PAGE_SIZE', 50))
+
+# Загрузка больших файлов частями через API
+CHUNKED_UPLOAD = {
+    'MAX_SIZE': int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', 5 * 1024 * 1024 * 1024)),
+    'MAX_CHUNK_SIZE': int(os.getenv('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024)),
+    'EXPIRES_AFTER': int(os.getenv('CHUNKED_UPLOAD_EXPIRES_AFTER', 24 * 60 * 60)),
+}
+
+# Отдача файлов документов: SENDFILE_BACKEND '' (поток из Django), 'xsendfile' (Apache, lighttpd)
+# или 'xaccel' (nginx, ACCEL_REDIRECT_PREFIX должен указывать на internal location с MEDIA_ROOT)
+DOWNLOADS = {
+    'SENDFILE_BACKEND': os.getenv('DOWNLOADS_SENDFILE_BACKEND', ''),
+    'ACCEL_REDIRECT_PREFIX': os.getenv('DOWNLOADS_ACCEL_REDIRECT_PREFIX', '/protected-media/'),
+    'CHUNK_SIZE': int(os.getenv('DOWNLOADS_CHUNK_SIZE', 64 * 1024)),
+}
+
+# Дополнительные конвертеры: {'режим': 'package.module.ConverterClass'}, None отключает режим.
+# Сторонние пакеты также могут регистрировать конвертеры через entry points 'document_flow.converters'
+DOCUMENT_CONVERTERS = {}
+
+# Пакетная конвертация через API
+BATCH_CONVERT = {
+    'WORKERS': int(os.getenv('BATCH_CONVERT_WORKERS', 4)),
+    # Пул процессов для конвертеров с BATCH_EXECUTOR = 'process' (обработка изображений)
+    'PROCESS_WORKERS': int(os.getenv('BATCH_CONVERT_PROCESS_WORKERS', os.cpu_count() or 1)),
+    'MAX_ITEMS': int(os.getenv('BATCH_CONVERT_MAX_ITEMS', 1000)),
+    'MAX_ARCHIVE_SIZE': int(os.getenv('BATCH_CONVERT_MAX_ARCHIVE_SIZE', 1024 * 1024 * 1024)),
+}
+
+# Ограничение времени выполнения задачи конвертации в секундах. По мягкому ограничению
+# задача завершается ошибкой и удаляет свои файлы, жесткое убивает процесс воркера
+CONVERSION_JOB_TIME_LIMIT = int(os.getenv('CONVERSION_JOB_TIME_LIMIT', 300))
+CONVERSION_JOB_SOFT_TIME_LIMIT = int(os.getenv('CONVERSION_JOB_SOFT_TIME_LIMIT', CONVERSION_JOB_TIME_LIMIT * 9 // 10))
+
+# Диагностика PostgreSQL на странице database_info: пул соединений и кэш результатов
+DATABASE_DIAGNOSTICS = {
+    # Соединение из DATABASES, параметры которого используются для подключения
+    'ALIAS': os.getenv('DATABASE_DIAGNOSTICS_ALIAS', 'default'),
+    # Постоянно открытые соединения в каждом процессе, обратившемся к диагностике (веб-сервер,
+    # воркеры Celery). Запросы состояния распределяются по этим соединениям и выполняются
+    # на них параллельно, подготовленные запросы сохраняются между обновлениями.
+    # Соединения сверх них открываются на время запросов и закрываются после
+    'MIN_CONNECTIONS': int(os.getenv('DATABASE_DIAGNOSTICS_MIN_CONNECTIONS', 2)),
+    'MAX_CONNECTIONS': int(os.getenv('DATABASE_DIAGNOSTICS_MAX_CONNECTIONS', 5)),
+    # Время жизни результатов в секундах
+    'CACHE_TTL': float(os.getenv('DATABASE_DIAGNOSTICS_CACHE_TTL', 10)),
+    # Ограничение времени выполнения запроса в миллисекундах
+    'STATEMENT_TIMEOUT': int(os.getenv('DATABASE_DIAGNOSTICS_STATEMENT_TIMEOUT', 5000)),
+}
+
+# История метрик состояния базы для страницы database_info
+DATABASE_HEALTH = {
+    # Количество самых нагруженных таблиц, для которых сохраняются метрики
+    'TOP_TABLES': int(os.getenv('DATABASE_HEALTH_TOP_TABLES', 20)),
+    # Таблица считается кандидатом на индекс при доле последовательных сканирований не меньше порога
+    'SEQ_SCAN_RATIO_THRESHOLD': float(os.getenv('DATABASE_HEALTH_SEQ_SCAN_RATIO_THRESHOLD', 0.5)),
+    'MIN_SEQ_SCANS': int(os.getenv('DATABASE_HEALTH_MIN_SEQ_SCANS', 1000)),
+    # Разрешения временных рядов в секундах и срок хранения точек каждого из них
+    'RETENTION': {
+        60: int(os.getenv('DATABASE_HEALTH_RETENTION_1M', 2 * 24 * 60 * 60)),
+        15 * 60: int(os.getenv('DATABASE_HEALTH_RETENTION_15M', 14 * 24 * 60 * 60)),
+        60 * 60: int(os.getenv('DATABASE_HEALTH_RETENTION_1H', 90 * 24 * 60 * 60)),
+        24 * 60 * 60: int(os.getenv('DATABASE_HEALTH_RETENTION_1D', 2 * 365 * 24 * 60 * 60)),
+    },
+}
+
+# Обслуживание таблиц вместо VACUUM FULL всей базы: VACUUM (ANALYZE) и ANALYZE выбранных таблиц
+DATABASE_MAINTENANCE = {
+    'ENABLED': os.getenv('DATABASE_MAINTENANCE_ENABLED', 'true').lower() == 'true',
+    # Окна наименьшей нагрузки в TIME_ZONE через запятую, например '01:00-05:00,13:00-14:00'
+    'WINDOWS': [
+        window.strip()
+        for window in os.getenv('DATABASE_MAINTENANCE_WINDOWS', '02:00-05:00').split(',')
+        if window.strip()
+    ],
+    # Время ожидания блокировки таблицы и ограничение длительности команды в миллисекундах
+    'LOCK_TIMEOUT': int(os.getenv('DATABASE_MAINTENANCE_LOCK_TIMEOUT', 5000)),
+    'STATEMENT_TIMEOUT': int(os.getenv('DATABASE_MAINTENANCE_STATEMENT_TIMEOUT', 30 * 60 * 1000)),
+    'MAX_TABLES_PER_RUN': int(os.getenv('DATABASE_MAINTENANCE_MAX_TABLES_PER_RUN', 5)),
+    # Пороги VACUUM (ANALYZE): количество и доля мертвых строк
+    'MIN_DEAD_TUPLES': int(os.getenv('DATABASE_MAINTENANCE_MIN_DEAD_TUPLES', 1000)),
+    'DEAD_TUPLES_RATIO': float(os.getenv('DATABASE_MAINTENANCE_DEAD_TUPLES_RATIO', 0.1)),
+    # Пороги ANALYZE: количество и доля строк, измененных с последнего анализа
+    'MIN_MODIFIED_TUPLES': int(os.getenv('DATABASE_MAINTENANCE_MIN_MODIFIED_TUPLES', 1000)),
+    'ANALYZE_RATIO': float(os.getenv('DATABASE_MAINTENANCE_ANALYZE_RATIO', 0.1)),
+    # Таблицы, обслуженные за это количество секунд, пропускаются
+    'MIN_INTERVAL': int(os.getenv('DATABASE_MAINTENANCE_MIN_INTERVAL', 6 * 60 * 60)),
+}
+
+# Метрики этапов загрузки и конвертации: эндпоинт /metrics и структурированные логи
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', 'false').lower() == 'true',
+    # Писать каждый этап в лог utils.metrics с полями в extra['metrics']
+    'LOG': os.getenv('METRICS_LOG', 'false').lower() == 'true',
+    # Токен для заголовка Authorization: Bearer, пустой токен открывает доступ без авторизации
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
@@ -0,0 +1,178 @@
+import math
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.utils import timezone
+
+ACTION_VACUUM_ANALYZE = 'vacuum_analyze'
+ACTION_ANALYZE = 'analyze'
+# Команды обслуживания, {} заменяется на имя таблицы со схемой
+COMMANDS = {
+    ACTION_VACUUM_ANALYZE: 'VACUUM (ANALYZE) {}',
+    ACTION_ANALYZE: 'ANALYZE {}',
+}
+# Ключ advisory-блокировки, не дающей запускать обслуживание параллельно
+ADVISORY_LOCK_KEY = 0x646F63666C6F77
+
+
+class MaintenanceLockTimeout(Exception):
+    """Таблица занята другими транзакциями дольше lock_timeout"""
+
+
+class TableStats(NamedTuple):
+    """Статистика таблицы для выбора обслуживания"""
+    schema: str
+    table: str
+    live_tuples: int
+    dead_tuples: int
+    modified_since_analyze: int
+    size: int
+    operations: int = 0
+    last_vacuum: Optional[datetime] = None
+    last_analyze: Optional[datetime] = None
+
+
+class MaintenanceTask(NamedTuple):
+    """Запланированное обслуживание таблицы"""
+    schema: str
+    table: str
+    action: str
+    reason: str
+    priority: float
+    dead_tuples: int
+
+    @property
+    def name(self) -> str:
+        return f'{self.schema}.{self.table}'
+
+
+def _is_recent(moment: Optional[datetime], now: datetime, interval: float) -> bool:
+    return moment is not None and (now - moment).total_seconds() < interval
+
+
+def plan_maintenance(stats: Iterable[TableStats], policy: Dict[str, Any], now: datetime) -> List[MaintenanceTask]:
+    """
+    Выбирает таблицы, которым нужно обслуживание, в порядке важности
+
+    VACUUM (ANALYZE) назначается таблицам, в которых мертвых строк не меньше MIN_DEAD_TUPLES
+    и доли DEAD_TUPLES_RATIO, ANALYZE - таблицам, в которых с последнего анализа изменилось
+    не меньше MIN_MODIFIED_TUPLES строк и доли ANALYZE_RATIO. Таблицы, обслуженные
+    (в том числе autovacuum) за последние MIN_INTERVAL секунд, пропускаются.
+    Внутри каждого вида обслуживания раньше идут таблицы с большей долей мертвых
+    или измененных строк с поправкой на нагрузку (количество изменений строк таблицы).
+
+    :param stats: Статистика таблиц
+    :param policy: Настройки DATABASE_MAINTENANCE
+    :param now: Текущее время
+    :return: Не более MAX_TABLES_PER_RUN задач
+    """
+    tasks = []
+    for table in stats:
+        total = table.live_tuples + table.dead_tuples
+        load = math.log10(10 + table.operations)
+
+        dead_ratio = table.dead_tuples / total if total else 0
+        if (
+            table.dead_tuples >= policy['MIN_DEAD_TUPLES']
+            and dead_ratio >= policy['DEAD_TUPLES_RATIO']
+            and not _is_recent(table.last_vacuum, now, policy['MIN_INTERVAL'])
+        ):
+            tasks.append(MaintenanceTask(
+                table.schema,
+                table.table,
+                ACTION_VACUUM_ANALYZE,
+                f'мертвых строк {table.dead_tuples} ({dead_ratio:.0%})',
+                dead_ratio * load,
+                table.dead_tuples,
+            ))
+            continue
+
+        modified_ratio = table.modified_since_analyze / table.live_tuples if table.live_tuples else 0
+        if (
+            table.modified_since_analyze >= policy['MIN_MODIFIED_TUPLES']
+            and modified_ratio >= policy['ANALYZE_RATIO']
+            and not _is_recent(table.last_analyze, now, policy['MIN_INTERVAL'])
+        ):
+            tasks.append(MaintenanceTask(
+                table.schema,
+                table.table,
+                ACTION_ANALYZE,
+                f'изменено строк с последнего анализа {table.modified_since_analyze} ({modified_ratio:.0%})',
+                modified_ratio * load,
+                table.dead_tuples,
+            ))
+
+    # Очистка освобождает место и тоже обновляет статистику, поэтому выполняется раньше анализа
+    tasks.sort(key=lambda task: (task.action == ACTION_VACUUM_ANALYZE, task.priority), reverse=True)
+    return tasks[:policy['MAX_TABLES_PER_RUN']]
+
+
+def parse_window(window: str) -> Tuple[dt_time, dt_time]:
+    """Разбирает окно вида 'ЧЧ:ММ-ЧЧ:ММ'"""
+    start, end = (dt_time.fromisoformat(part.strip()) for part in window.split('-'))
+    return start, end
+
+
+def maintenance_window_end(now: datetime, windows: Iterable[str]) -> Optional[datetime]:
+    """
+    Конец окна обслуживания, в которое попадает now
+
+    Окна задаются в часовом поясе проекта и могут переходить через полночь, например '23:00-04:00'.
+
+    :param now: Текущее время
+    :param windows: Окна вида 'ЧЧ:ММ-ЧЧ:ММ'
+    :return: Время окончания окна или None, если now вне окон
+    """
+    local = timezone.localtime(now)
+    moment = local.time().replace(tzinfo=None)
+    for window in windows:
+        start, end = parse_window(window)
+        if start <= end:
+            active, days = start <= moment < end, 0
+        elif moment >= start:
+            active, days = True, 1
+        else:
+            active, days = moment < end, 0
+
+        if active:
+            end_date = local.date() + timedelta(days=days)
+            return timezone.make_aware(datetime.combine(end_date, end), local.tzinfo)
+    return None
+
+
+class PostgresMaintenanceBackend:
+    """Статистика и выполнение обслуживания через DatabaseDiagnostics"""
+
+    def __init__(self, diagnostics):
+        self.diagnostics = diagnostics
+
+    def table_stats(self) -> List[TableStats]:
+        """
+        Статистика пользовательских таблиц
+
+        Количество изменений берется из той же строки pg_stat_user_tables, поэтому
+        одноименные таблицы разных схем не получают нагрузку друг друга.
+        """
+        return [TableStats(*row) for row in self.diagnostics.fetch('table_bloat')['rows']]
+
+    @contextmanager
+    def exclusive(self):
+        """Возвращает True, если другие процессы сейчас не выполняют обслуживание"""
+        with self.diagnostics.advisory_lock(ADVISORY_LOCK_KEY) as acquired:
+            yield acquired
+
+    def execute(self, task: MaintenanceTask, lock_timeout: int, statement_timeout: int) -> Tuple[int, int]:
+        """
+        Выполняет обслуживание таблицы
+
+        :return: Размер таблицы до и после в байтах
+        :raises MaintenanceLockTimeout: Если таблица занята дольше lock_timeout
+        """
+        return self.diagnostics.maintain_table(
+            task.schema,
+            task.table,
+            COMMANDS[task.action],
+            lock_timeout,
+            statement_timeout,
+        )
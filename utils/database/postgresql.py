@@ -1,133 +1,353 @@
+import asyncio
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2 import sql
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+SQL_DIR = Path(__file__).resolve().parent
+# Запросы состояния базы: имя подготовленного запроса и файл в SQL_DIR
+HEALTH_QUERIES = {
+    'db_load': 'db_load.sql',
+    'process_distribution': 'process_distribution.sql',
+    'active_transactions_and_queries_duration': 'active_transactions_and_queries_duration.sql',
+    'most_loaded_tables': 'most_loaded_tables.sql',
+    'index_vs_seq_scan_ratio': 'index_vs_seq_scan_ratio.sql',
+}
+# Запросы планировщика обслуживания таблиц
+MAINTENANCE_QUERIES = {
+    'table_bloat': 'table_bloat.sql',
+}
 
 
-class DBInterface:
+def load_queries(files: Dict[str, str] = HEALTH_QUERIES, directory: Path = SQL_DIR) -> Dict[str, str]:
     """
-    Интерфейс для подключения и работы с PostgreSQL.
-    Обеспечивает автоматическое управление ресурсами через протокол контекстного менеджера.
+    Читает SQL-запросы из директории модуля
+
+    :param files: Имена запросов и файлов
+    :param directory: Директория с .sql файлами
+    :return: Текст запроса по имени без завершающей точки с запятой
     """
-    
-    def __enter__(self):
-        """
-        Открывает соединение с базой данных и возвращает объект DBInterface.
+    queries = {}
+    for name, file_name in files.items():
+        with open(directory / file_name, encoding='utf-8') as sql_file:
+            queries[name] = sql_file.read().strip().rstrip(';')
+    return queries
 
-        :return: Экземпляр DBInterface с открытым соединением.
-        """
-        self.connection = psycopg2.connect(
-            dbname="review_recipient",
-            user="postgres",
-            password="123",
-            host="localhost",
-            port="5432"
-        )
-        self.cursor = self.connection.cursor()
-        return self
 
-    def execute(self, query):
-        """
-        Выполняет SQL-запрос и возвращает первую строку результата.
+class DiagnosticsConnection(psycopg2.extensions.connection):
+    """Соединение пула, помнящее подготовленные на нем запросы"""
 
-        :param query: SQL-запрос в виде строки.
-        :return: Первая строка результата выполнения запроса.
-        """
-        self.cursor.execute(query)
-        return self.cursor.fetchall()
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
 
-    def execute_autocommit_query(self, query):
-        """
-        Выполняет SQL-запрос в режиме autocommit (без использования транзакции).
 
-        :param query: SQL-запрос в виде строки.
-        :return: Сообщение об успешном выполнении запроса или описание ошибки.
+class DatabaseDiagnostics:
+    """
+    Сервис диагностики PostgreSQL.
+
+    Соединения берутся из пула, запросы читаются из файлов один раз и подготавливаются
+    (PREPARE) на каждом соединении при первом использовании. Запросы состояния
+    распределяются по min_connections постоянным соединениям и выполняются на них
+    параллельно, поэтому соединения и подготовленные запросы переживают вызовы collect.
+    Результат кэшируется на cache_ttl секунд: одновременные обращения во время
+    обновления ждут его, а не запускают свое.
+    """
+
+    def __init__(
+        self,
+        connection_params: Dict[str, Any],
+        min_connections: int = 2,
+        max_connections: int = 5,
+        cache_ttl: float = 10,
+        statement_timeout: int = 5000,
+    ):
         """
-        original_autocommit = self.connection.autocommit
+        :param connection_params: Параметры psycopg2.connect (dbname, user, password, host, port)
+        :param min_connections: Количество постоянно открытых соединений и параллельно выполняемых
+            запросов collect, соединения сверх него закрываются при возврате в пул вместе
+            с подготовленными запросами
+        :param max_connections: Максимальное количество соединений и параллельных запросов
+        :param cache_ttl: Время жизни результата collect в секундах, 0 отключает кэш
+        :param statement_timeout: Ограничение времени выполнения запроса в миллисекундах
+        """
+        self.queries = load_queries({**HEALTH_QUERIES, **MAINTENANCE_QUERIES})
+        self.cache_ttl = cache_ttl
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            min_connections,
+            max_connections,
+            connection_factory=DiagnosticsConnection,
+            options=f'-c statement_timeout={int(statement_timeout)}',
+            **connection_params,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='db-diagnostics')
+        self._cache: Optional[Dict[str, Dict]] = None
+        self._cached_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._async_refresh_lock = asyncio.Lock()
+
+    @contextmanager
+    def connection(self, autocommit: bool = False):
+        """Берет соединение из пула и возвращает его после использования"""
+        connection = self._pool.getconn()
         try:
-            self.connection.autocommit = True
-            self.cursor.execute(query)
-            return f'{query} выполнен успешно'
-        except Exception as e:
-            return f'Ошибка выполнения VACUUM FULL: {e}'
+            connection.autocommit = autocommit
+            yield connection
         finally:
-            self.connection.autocommit = original_autocommit
+            broken = bool(connection.closed)
+            if not broken and not connection.autocommit:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self._pool.putconn(connection, close=broken)
 
-    def vacuum_full(self):
+    def execute(self, query: str) -> List[tuple]:
         """
-        Выполняет команду VACUUM FULL для полной очистки и оптимизации базы данных.
+        Выполняет произвольный SQL-запрос на соединении из пула
 
-        :return: Сообщение об успешном выполнении команды или описание ошибки.
+        :param query: SQL-запрос в виде строки
+        :return: Строки результата
         """
-        return self.execute_autocommit_query('VACUUM FULL;')
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetchall()
 
-    def analyze(self):
+    def fetch(self, name: str) -> Dict[str, Any]:
         """
-        Выполняет команду ANALYZE для обновления статистики планировщика запросов.
+        Выполняет подготовленный запрос состояния
 
-        :return: Сообщение об успешном выполнении команды или описание ошибки.
+        :param name: Имя запроса из HEALTH_QUERIES или MAINTENANCE_QUERIES
+        :return: Колонки, строки и время выполнения в миллисекундах
         """
-        return self.execute_autocommit_query('ANALYZE;')
+        with self.connection() as connection:
+            return self._fetch_on(connection, name)
 
-    def fetch_db_load(self):
-        """
-        Получает общий объём транзакций.
+    def _fetch_on(self, connection: DiagnosticsConnection, name: str) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        with connection.cursor() as cursor:
+            if name not in connection.prepared:
+                cursor.execute(f'PREPARE {name} AS {self.queries[name]}')
+                connection.prepared.add(name)
+            cursor.execute(f'EXECUTE {name}')
+            columns = [column.name for column in cursor.description]
+            rows = cursor.fetchall()
 
-        Возвращает сумму xact_commit и xact_rollback – суммарное количество транзакций,
-        выполненных с момента сброса статистических данных (stats_reset).
+        return {
+            'columns': columns,
+            'rows': rows,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 2),
+            'error': None,
+        }
 
-        :return: Результат выполнения SQL-запроса из файла db_load.sql.
-        """
-        with open('db_load.sql', 'r') as sql_file:
-            query = sql_file.read()
+    @staticmethod
+    def _error_result(error: psycopg2.Error) -> Dict[str, Any]:
+        return {'columns': [], 'rows': [], 'duration_ms': None, 'error': str(error).strip()}
+
+    def _fetch_group(self, names: List[str]) -> List[Dict[str, Any]]:
+        """Выполняет запросы по очереди на одном соединении, ошибка запроса не прерывает остальные"""
+        try:
+            with self.connection() as connection:
+                results = []
+                for name in names:
+                    try:
+                        results.append(self._fetch_on(connection, name))
+                    except psycopg2.Error as e:
+                        results.append(self._error_result(e))
+                        if not connection.closed:
+                            # Следующие запросы не выполнятся в прерванной транзакции
+                            connection.rollback()
+                return results
+        except psycopg2.Error as e:
+            return [self._error_result(e) for _ in names]
 
-        return self.execute(query)
+    def _query_groups(self) -> List[List[str]]:
+        parallel = max(1, min(self.min_connections, self.max_connections, len(HEALTH_QUERIES)))
+        names = list(HEALTH_QUERIES)
+        return [names[index::parallel] for index in range(parallel)]
 
-    def fetch_process_distribution(self):
+    def _store(self, groups: List[List[str]], results: List[List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        by_name = {
+            name: result
+            for names, group_results in zip(groups, results)
+            for name, result in zip(names, group_results)
+        }
+        self._cache = {
+            'collected_at': timezone.now(),
+            'queries': {name: by_name[name] for name in HEALTH_QUERIES},
+        }
+        self._cached_at = time.monotonic()
+        return self._cache
+
+    def collect(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
         """
-        Получает информацию по распределению работы серверных процессов.
+        Выполняет все запросы состояния на min_connections соединениях параллельно, используя кэш результата
+
+        Ошибка одного запроса не прерывает остальные и возвращается в его поле error.
 
-        :return: Результат выполнения SQL-запроса из файла process_distribution.sql.
+        :param force: Не использовать кэш
+        :return: Результаты fetch по имени запроса и время получения в collected_at
         """
-        with open('process_distribution.sql', 'r') as sql_file:
-            query = sql_file.read()
+        if not force and self._is_fresh():
+            return self._cache
+
+        with self._refresh_lock:
+            if not force and self._is_fresh():
+                return self._cache
 
-        return self.execute(query)
+            groups = self._query_groups()
+            return self._store(groups, list(self._executor.map(self._fetch_group, groups)))
 
-    def fetch_active_transactions_and_queries_duration(self):
+    async def acollect(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
         """
-        Получает длительность текущих активных транзакций и запросов.
+        Асинхронный вариант collect, запросы выполняются в потоках сервиса
 
-        :return: Результат выполнения SQL-запроса из файла active_transactions_and_queries_duration.sql.
+        Цикл событий не блокируется: группы запросов ожидаются через run_in_executor.
         """
-        with open('active_transactions_and_queries_duration.sql', 'r') as sql_file:
-            query = sql_file.read()
+        if not force and self._is_fresh():
+            return self._cache
 
-        return self.execute(query)
+        async with self._async_refresh_lock:
+            if not force and self._is_fresh():
+                return self._cache
 
-    def fetch_most_loaded_tables(self):
-        """
-        Получает список таблиц с наибольшей нагрузкой.
+            loop = asyncio.get_running_loop()
+            groups = self._query_groups()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self._executor, self._fetch_group, names)
+                for names in groups
+            ))
+            return self._store(groups, list(results))
+
+    def _is_fresh(self) -> bool:
+        return self._cache is not None and time.monotonic() - self._cached_at < self.cache_ttl
 
-        :return: Результат выполнения SQL-запроса из файла most_loaded_tables.sql.
+    @contextmanager
+    def advisory_lock(self, key: int):
         """
-        with open('most_loaded_tables.sql', 'r') as sql_file:
-            query = sql_file.read()
+        Берет сессионную advisory-блокировку на отдельном соединении без ожидания
 
-        return self.execute(query)
+        :param key: Ключ блокировки
+        :return: Контекстный менеджер, возвращающий True, если блокировка получена
+        """
+        with self.connection(autocommit=True) as connection, connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+            acquired = cursor.fetchone()[0]
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
 
-    def fetch_index_vs_seq_scan_ratio(self):
+    def maintain_table(
+        self,
+        schema: str,
+        table: str,
+        command: str,
+        lock_timeout: int,
+        statement_timeout: int,
+    ) -> Tuple[int, int]:
         """
-        Получает соотношение между количеством индексных и последовательных сканирований таблиц.
+        Выполняет команду обслуживания одной таблицы вне транзакции
 
-        :return: Результат выполнения SQL-запроса из файла index_vs_seq_scan_ratio.sql.
+        :param schema: Схема таблицы
+        :param table: Имя таблицы
+        :param command: Команда с местом для имени таблицы, например 'VACUUM (ANALYZE) {}'
+        :param lock_timeout: Время ожидания блокировки таблицы в миллисекундах
+        :param statement_timeout: Ограничение времени выполнения команды в миллисекундах
+        :return: Размер таблицы с индексами до и после выполнения в байтах
+        :raises MaintenanceLockTimeout: Если таблицу не удалось заблокировать за lock_timeout
         """
-        with open('index_vs_seq_scan_ratio.sql', 'r') as sql_file:
-            query = sql_file.read()
+        from utils.database.maintenance import MaintenanceLockTimeout
+
+        identifier = sql.Identifier(schema, table)
+        with self.connection(autocommit=True) as connection, connection.cursor() as cursor:
+            name = identifier.as_string(connection)
+            cursor.execute('SET lock_timeout = %s', [f'{int(lock_timeout)}ms'])
+            cursor.execute('SET statement_timeout = %s', [f'{int(statement_timeout)}ms'])
+            try:
+                cursor.execute('SELECT pg_total_relation_size(%s::regclass)', [name])
+                size_before = cursor.fetchone()[0]
+                cursor.execute(sql.SQL(command).format(identifier))
+                cursor.execute('SELECT pg_total_relation_size(%s::regclass)', [name])
+                size_after = cursor.fetchone()[0]
+            except psycopg2.errors.LockNotAvailable as e:
+                raise MaintenanceLockTimeout(str(e).strip()) from e
+            finally:
+                if not connection.closed:
+                    # Возвращает значения из параметров подключения пула
+                    cursor.execute('RESET lock_timeout; RESET statement_timeout')
+
+        return size_before, size_after
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        if not self._pool.closed:
+            self._pool.closeall()
+
+
+def connection_params(alias: str) -> Dict[str, Any]:
+    """
+    Параметры psycopg2.connect из настроек соединения Django
+
+    :param alias: Имя соединения в settings.DATABASES
+    :return: Параметры подключения
+    """
+    database = settings.DATABASES[alias]
+    if database['ENGINE'] != 'django.db.backends.postgresql':
+        raise ImproperlyConfigured(f'Соединение {alias} не использует PostgreSQL')
+
+    params = {
+        'dbname': database.get('NAME'),
+        'user': database.get('USER'),
+        'password': database.get('PASSWORD'),
+        'host': database.get('HOST'),
+        'port': database.get('PORT'),
+    }
+    return {key: value for key, value in params.items() if value}
+
+
+_diagnostics = None
+_diagnostics_pid = None
+_diagnostics_lock = threading.Lock()
+
+
+def get_database_diagnostics() -> DatabaseDiagnostics:
+    """Возвращает сервис диагностики текущего процесса, создавая его при первом обращении"""
+    global _diagnostics, _diagnostics_pid
 
-        return self.execute(query)
+    with _diagnostics_lock:
+        # Соединения родителя нельзя использовать после fork
+        if _diagnostics is None or _diagnostics_pid != os.getpid():
+            diagnostics_settings = settings.DATABASE_DIAGNOSTICS
+            _diagnostics = DatabaseDiagnostics(
+                connection_params(diagnostics_settings['ALIAS']),
+                min_connections=diagnostics_settings['MIN_CONNECTIONS'],
+                max_connections=diagnostics_settings['MAX_CONNECTIONS'],
+                cache_ttl=diagnostics_settings['CACHE_TTL'],
+                statement_timeout=diagnostics_settings['STATEMENT_TIMEOUT'],
+            )
+            _diagnostics_pid = os.getpid()
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.cursor.close()
-        self.connection.close()
+        return _diagnostics
 
 
-with DBInterface() as db:
-    print(db.fetch_most_loaded_tables())
+@atexit.register
+def _close_diagnostics():
+    if _diagnostics is not None and _diagnostics_pid == os.getpid():
+        _diagnostics.close()
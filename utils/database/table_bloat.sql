@@ -0,0 +1,12 @@
+SELECT
+   stat.schemaname,
+   stat.relname,
+   stat.n_live_tup,
+   stat.n_dead_tup,
+   stat.n_mod_since_analyze,
+   class.relpages::bigint * current_setting('block_size')::bigint AS estimated_size,
+   stat.n_tup_upd + stat.n_tup_ins + stat.n_tup_del AS operations,
+   GREATEST(stat.last_vacuum, stat.last_autovacuum) AS last_vacuum,
+   GREATEST(stat.last_analyze, stat.last_autoanalyze) AS last_analyze
+FROM pg_stat_user_tables stat
+JOIN pg_class class ON class.oid = stat.relid;
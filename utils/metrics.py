@@ -0,0 +1,289 @@
+import functools
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы длительности этапов в секундах
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Метрика с набором меток, значения хранятся по кортежу значений меток"""
+
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    TYPE = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными корзинами, суммой и количеством наблюдений"""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+
+        names = self.labelnames + ('le',)
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', _format_labels(names, key + (_format_value(bound),)), cumulative
+            yield f'{self.name}_bucket', _format_labels(names, key + ('+Inf',)), count
+            yield f'{self.name}_sum', _format_labels(self.labelnames, key), total
+            yield f'{self.name}_count', _format_labels(self.labelnames, key), count
+
+
+class MetricsRegistry:
+    """Метрики процесса и их вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def clear(self) -> None:
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        lines = []
+        for metric in sorted(self._metrics.values(), key=lambda metric: metric.name):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.TYPE}')
+            lines.extend(
+                f'{name}{labels} {_format_value(value)}'
+                for name, labels, value in metric.samples()
+            )
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'documentflow_stage_duration_seconds',
+    'Длительность этапов загрузки и конвертации документов',
+    ('stage', 'mode', 'outcome'),
+))
+STAGE_BYTES = REGISTRY.register(Counter(
+    'documentflow_stage_bytes_total',
+    'Объем данных на входе (in) и выходе (out) этапов',
+    ('stage', 'mode', 'direction'),
+))
+
+
+def is_enabled() -> bool:
+    return settings.METRICS['ENABLED']
+
+
+class Stage:
+    """
+    Измерение одного этапа: длительность, объем данных и результат
+
+    Этапы могут быть вложенными, вложенный этап без режима наследует режим внешнего.
+    """
+
+    _context = threading.local()
+
+    def __init__(self, name: str, mode: Optional[str] = None, **fields):
+        self.name = name
+        self.mode = mode
+        self.fields = fields
+        self.bytes = {}
+        self._started_at = 0.0
+        self._outer_mode = None
+
+    def add_bytes(self, direction: str, amount: Optional[int]) -> None:
+        """
+        Учитывает объем данных этапа
+
+        :param direction: 'in' или 'out'
+        :param amount: Количество байт, None не учитывается
+        """
+        if amount:
+            self.bytes[direction] = self.bytes.get(direction, 0) + amount
+
+    def __enter__(self) -> 'Stage':
+        self._outer_mode = getattr(self._context, 'mode', None)
+        if self.mode is None:
+            self.mode = self._outer_mode or ''
+        self._context.mode = self.mode
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration = time.perf_counter() - self._started_at
+        self._context.mode = self._outer_mode
+        outcome = 'ok' if exc_type is None else 'error'
+
+        STAGE_DURATION.observe(duration, stage=self.name, mode=self.mode, outcome=outcome)
+        for direction, amount in self.bytes.items():
+            STAGE_BYTES.inc(amount, stage=self.name, mode=self.mode, direction=direction)
+
+        if settings.METRICS['LOG']:
+            record = {
+                'stage': self.name,
+                'mode': self.mode,
+                'outcome': outcome,
+                'duration_ms': round(duration * 1000, 3),
+                **{f'bytes_{direction}': amount for direction, amount in self.bytes.items()},
+                **self.fields,
+            }
+            logger.info(
+                ' '.join(f'{key}={value}' for key, value in record.items()),
+                extra={'metrics': record},
+            )
+
+
+class _DisabledStage:
+    """Пустой этап, который используется при выключенных метриках"""
+
+    def add_bytes(self, direction: str, amount: Optional[int]) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+
+def stage(name: str, mode: Optional[str] = None, **fields):
+    """
+    Контекстный менеджер для измерения этапа
+
+    При выключенных метриках возвращает общий пустой объект без замеров времени.
+
+    :param name: Имя этапа, например 'convert' или 'render'
+    :param mode: Режим конвертации, по умолчанию режим внешнего этапа
+    :param fields: Дополнительные поля структурированного лога (в метки не попадают)
+    :return: Этап с методом add_bytes
+    """
+    if not settings.METRICS['ENABLED']:
+        return _DISABLED_STAGE
+    return Stage(name, mode, **fields)
+
+
+def timed(name: str, mode: Optional[str] = None):
+    """Декоратор, измеряющий вызов функции как этап name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, mode):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_size(request) -> int:
+    """
+    Объем исходных данных запроса конвертации: загруженные файлы и текстовые поля
+
+    :param request: Объект запроса с полями POST и FILES
+    :return: Размер в байтах
+    """
+    size = sum(
+        uploaded_file.size or 0
+        for _, uploaded_files in request.FILES.lists()
+        for uploaded_file in uploaded_files
+    )
+    size += sum(
+        len(value.encode())
+        for _, values in request.POST.lists()
+        for value in values
+        if isinstance(value, str)
+    )
+    return size
+
+
+def metrics_view(request):
+    """
+    Отдает метрики процесса в текстовом формате Prometheus
+
+    Метрики хранятся в памяти процесса, поэтому каждый процесс веб-сервера
+    и воркер Celery собираются отдельно. Если задан METRICS['TOKEN'],
+    запрос должен содержать заголовок Authorization: Bearer <токен>.
+    """
+    if not settings.METRICS['ENABLED']:
+        return HttpResponseNotFound()
+
+    token = settings.METRICS['TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -1,5 +1,7 @@
 import simplejson
 
+from utils import metrics
+
 
 def run_task(
     task,
@@ -8,6 +10,7 @@ def run_task(
     queue=None,
     task_id=None,
     time_limit=None,
+    soft_time_limit=None,
 ):
     task_args = task_args or []
     task_kwargs = task_kwargs or {}
@@ -18,10 +21,12 @@ def run_task(
     except simplejson.errors.JSONDecodeError:
         raise TypeError('Only simple types task arguments permitted')
 
-    task.apply_async(
-        args=[],
-        kwargs=task_kwargs,
-        queue=queue,
-        task_id=task_id,
-        time_limit=time_limit,
-    )
\ No newline at end of file
+    with metrics.stage(f'enqueue_{queue}'):
+        task.apply_async(
+            args=[],
+            kwargs=task_kwargs,
+            queue=queue,
+            task_id=task_id,
+            time_limit=time_limit,
+            soft_time_limit=soft_time_limit,
+        )
\ No newline at end of file